@@ -0,0 +1,5 @@
+"""Benchmarks for Surgeo (not shipped with the package).
+
+Each module can be run directly, e.g. ``python -m benchmarks.normalize``.
+
+"""
@@ -0,0 +1,310 @@
+"""Benchmark every model and geography level, stage by stage.
+
+Run with ``python -m benchmarks.models [--rows N ...] [--json PATH]
+[--compare PATH]``. Each model scores the same synthetic people (see
+benchmarks.synthetic) at each row count. The time of each stage is
+reported separately:
+
+- construct: creating the model with an empty table registry
+- normalize: factorizing and normalizing the input values
+- join: finding and gathering the table rows of the values
+- combine: combining the components and building the result frame
+- total: one end-to-end get_probabilities() call
+- write: writing the result with the CLI's writer
+
+The stages are timed by running the model's own helpers one after another,
+and their result is checked against get_probabilities() and score_arrays().
+A digest of the probabilities is saved with the timings, so that a later
+run with --compare can also check that its output has not changed.
+
+"""
+
+import argparse
+import hashlib
+import json
+import pathlib
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import surgeo
+from surgeo.app import table_io
+from surgeo.models.base_model import clear_table_registry
+from surgeo.models.kernels import combine_probabilities
+
+from benchmarks.synthetic import sample_people
+
+
+ROW_COUNTS = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+TRACT_COLUMNS = ['state', 'county', 'tract']
+
+# Each case's model, its arguments, and the (kind, columns, index
+# attribute) of each component, in get_probabilities() argument order
+CASES = {
+    'first': ('FirstNameModel', {}, [
+        ('name', 'first_name', '_RACE_GIVEN_FIRST_NAME_INDEX'),
+    ]),
+    'surname': ('SurnameModel', {}, [
+        ('name', 'surname', '_RACE_GIVEN_SURNAME_INDEX'),
+    ]),
+    'geocode_zcta': ('GeocodeModel', {'geo_level': 'ZCTA'}, [
+        ('zcta', 'zcta5', '_RACE_GIVEN_ZCTA_INDEX'),
+    ]),
+    'geocode_tract': ('GeocodeModel', {'geo_level': 'TRACT'}, [
+        ('tract', TRACT_COLUMNS, '_RACE_GIVEN_TRACT_INDEX'),
+    ]),
+    'surgeo_zcta': ('SurgeoModel', {'geo_level': 'ZCTA'}, [
+        ('name', 'surname', '_RACE_GIVEN_SURNAME_INDEX'),
+        ('zcta', 'zcta5', '_ZCTA_GIVEN_RACE_INDEX'),
+    ]),
+    'surgeo_tract': ('SurgeoModel', {'geo_level': 'TRACT'}, [
+        ('name', 'surname', '_RACE_GIVEN_SURNAME_INDEX'),
+        ('tract', TRACT_COLUMNS, '_RACE_GIVEN_TRACT_INDEX'),
+    ]),
+    'bifsg': ('BIFSGModel', {}, [
+        ('name', 'first_name', '_FIRST_NAME_GIVEN_RACE_INDEX'),
+        ('name', 'surname', '_RACE_GIVEN_SURNAME_INDEX'),
+        ('zcta', 'zcta5', '_ZCTA_GIVEN_RACE_INDEX'),
+    ]),
+}
+
+
+def timed(function, repeat):
+    """Best-of-repeat seconds of a call, and the result of the last call"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def normalize(model, kind, values):
+    """Factorize one component into row codes and normalized unique keys"""
+    if kind == 'name':
+        codes, normalized = model._factorize_names(values)
+        return codes, normalized.to_numpy()
+    if kind == 'zcta':
+        codes, _, keys = model._factorize_zctas(values)
+        return codes, keys
+    _, row_keys = model._factorize_tracts(values)
+    return pd.factorize(row_keys)
+
+
+def join(model, index, codes, keys):
+    """Gather the (N, 6) table rows of one normalized component"""
+    positions = index.positions(keys)[codes]
+    return model._take_races(index, positions, model.races)
+
+
+def combine(model, factors, frame_index):
+    """Combine the component rows into the result frame"""
+    if len(factors) > 1:
+        probs = combine_probabilities(
+            factors,
+            log_space=getattr(model, 'log_space', False),
+        )
+    else:
+        probs = factors[0]
+    return model._probs_frame(probs, model.races, frame_index, 'full', False)
+
+
+def score(model, inputs, tract):
+    """One end-to-end get_probabilities() call"""
+    if tract and len(inputs) == 1:
+        return model.get_probabilities_tract(*inputs)
+    return model.get_probabilities(*inputs)
+
+
+def digest(probs):
+    """A hash of the bytes of (N, 6) float64 probabilities"""
+    probs = np.ascontiguousarray(probs, dtype=np.float64)
+    return hashlib.sha256(probs.tobytes()).hexdigest()
+
+
+def run_case(name, people, dtype, repeat, write_suffix, temp_dir):
+    """Time one case on the given people, returning its result record"""
+    model_name, kwargs, components = CASES[name]
+    model_type = getattr(surgeo, model_name)
+
+    def construct():
+        clear_table_registry()
+        return model_type(dtype=dtype, **kwargs)
+
+    seconds = {}
+    seconds['construct'], model = timed(construct, repeat)
+    inputs = [people[columns] for _, columns, _ in components]
+    indexes = [getattr(model, attribute) for _, _, attribute in components]
+    seconds['normalize'], normalized = timed(
+        lambda: [
+            normalize(model, kind, values)
+            for (kind, _, _), values in zip(components, inputs)
+        ],
+        repeat,
+    )
+    seconds['join'], factors = timed(
+        lambda: [
+            join(model, index, codes, keys)
+            for index, (codes, keys) in zip(indexes, normalized)
+        ],
+        repeat,
+    )
+    seconds['combine'], staged = timed(
+        lambda: combine(model, factors, people.index),
+        repeat,
+    )
+    tract = any(kind == 'tract' for kind, _, _ in components)
+    seconds['total'], result = timed(
+        lambda: score(model, inputs, tract),
+        repeat,
+    )
+    if write_suffix is not None:
+        output_path = pathlib.Path(temp_dir) / f'output{write_suffix}'
+        seconds['write'], _ = timed(
+            lambda: table_io.write_table(result, output_path),
+            repeat,
+        )
+        output_path.unlink()
+    # The stages, the frame, and the arrays must all give the same output
+    races = model.races
+    probs = result[races].to_numpy(dtype=np.float64)
+    array_probs, _ = model.score_arrays(*[
+        tuple(values[column].to_numpy() for column in values.columns)
+        if isinstance(values, pd.DataFrame) else values.to_numpy()
+        for values in inputs
+    ])
+    equivalent = (
+        np.array_equal(probs, staged[races].to_numpy(np.float64), equal_nan=True)
+        and np.array_equal(probs, array_probs.astype(np.float64), equal_nan=True)
+    )
+    model.close()
+    return {
+        'case': name,
+        'rows': len(people),
+        'seconds': seconds,
+        'rows_per_second': len(people) / seconds['total'],
+        'matched': float(np.mean(~np.isnan(probs).any(axis=1))),
+        'equivalent': bool(equivalent),
+        'digest': digest(probs),
+    }
+
+
+def compare(results, baseline_path):
+    """Print each result's speedup and output change against a baseline"""
+    baseline = json.loads(pathlib.Path(baseline_path).read_text())
+    if (baseline['seed'], baseline['dtype']) != (results['seed'], results['dtype']):
+        print('The baseline was run with another seed or dtype.')
+        return True
+    prior = {(record['case'], record['rows']): record for record in baseline['results']}
+    unchanged = True
+    print(f'{"case":<14} {"rows":>10} {"speedup":>8} {"output":>9}')
+    for record in results['results']:
+        old = prior.get((record['case'], record['rows']))
+        if old is None:
+            continue
+        same = old['digest'] == record['digest']
+        unchanged &= same
+        speedup = old['seconds']['total'] / record['seconds']['total']
+        print(
+            f'{record["case"]:<14} {record["rows"]:>10,} {speedup:>8.2f} '
+            f'{"same" if same else "CHANGED":>9}'
+        )
+    return unchanged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--rows',
+        type=int,
+        nargs='+',
+        default=ROW_COUNTS,
+        help='The row counts to score (default: 1e3 to 1e7)',
+    )
+    parser.add_argument(
+        '--cases',
+        nargs='+',
+        choices=list(CASES),
+        default=list(CASES),
+        help='The models and geography levels to score (default: all)',
+    )
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--dtype',
+        choices=['float64', 'float32', 'uint16'],
+        default='float64',
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=3,
+        help='Report the best of this many runs of each stage',
+    )
+    parser.add_argument(
+        '--write',
+        choices=['csv', 'parquet', 'arrow', 'none'],
+        default='csv',
+        help='The output format the write stage is timed with',
+    )
+    parser.add_argument('--json', help='Save the results to this JSON file')
+    parser.add_argument(
+        '--compare',
+        help='Compare speed and output with the JSON results of an earlier run',
+    )
+    args = parser.parse_args(argv)
+    write_suffix = None if args.write == 'none' else f'.{args.write}'
+    results = {
+        'surgeo_version': surgeo.VERSION,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.platform(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'seed': args.seed,
+        'dtype': args.dtype,
+        'write': args.write,
+        'results': [],
+    }
+    stages = ['construct', 'normalize', 'join', 'combine', 'total', 'write']
+    print(
+        f'{"case":<14} {"rows":>10} '
+        + ' '.join(f'{stage:>9}' for stage in stages)
+        + f' {"rows / s":>12} {"same":>5}'
+    )
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for rows in args.rows:
+            people = sample_people(rows, args.seed)
+            for name in args.cases:
+                record = run_case(
+                    name,
+                    people,
+                    args.dtype,
+                    args.repeat,
+                    write_suffix,
+                    temp_dir,
+                )
+                results['results'].append(record)
+                timings = ' '.join(
+                    f'{record["seconds"].get(stage, float("nan")):>9.4f}'
+                    for stage in stages
+                )
+                print(
+                    f'{name:<14} {rows:>10,} {timings} '
+                    f'{record["rows_per_second"]:>12,.0f} '
+                    f'{"yes" if record["equivalent"] else "NO":>5}'
+                )
+    if args.json:
+        pathlib.Path(args.json).write_text(json.dumps(results, indent=2))
+    ok = all(record['equivalent'] for record in results['results'])
+    if args.compare:
+        ok &= compare(results, args.compare)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Benchmark the name normalizer against the chained pandas routine.
+
+Run with ``python -m benchmarks.normalize [rows] [distinct]``. Both
+routines are timed on the same names, with and without repetition, and
+the cost is reported per million rows.
+
+"""
+
+import string
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from surgeo.models.base_model import BaseModel
+from surgeo.utility import normalize
+
+
+def chained_names(names: pd.Series) -> pd.Series:
+    """The chained pandas routine the normalizer replaced"""
+    translation_table = str.maketrans(
+        '',
+        '',
+        string.digits + string.punctuation + string.whitespace,
+    )
+    output = (
+        names.fillna('')
+             .astype(str)
+             .astype(object)
+             .str.translate(translation_table)
+             .str.upper()
+             .str.replace(r'\s?J\.*?R\.*\s*?$', '', regex=True)
+             .str.replace(r'\s?S\.*?R\.*\s*?$', '', regex=True)
+             .str.replace(r'\s?III\s*?$',      '', regex=True)
+             .str.replace(r'\s?IV\s*?$',       '', regex=True)
+    )
+    return output
+
+
+def sample_names(rows, distinct, seed=0):
+    """Draw messy names from the bundled first name table"""
+    generator = np.random.default_rng(seed)
+    pool = BaseModel()._get_prob_race_given_first_name().index.to_numpy()
+    pool = generator.choice(pool, distinct).astype(object)
+    # Dirty a share of them the way real inputs are dirty
+    suffixes = np.array(['', '', '', ' Jr.', ' SR', ' III', ' iv'], dtype=object)
+    dirty = (
+        pd.Series(pool).str.title() +
+        generator.choice(suffixes, distinct)
+    ).to_numpy()
+    return pd.Series(generator.choice(dirty, rows))
+
+
+def time_per_million(function, names, repeat=3):
+    """Best-of-repeat seconds per million rows"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(names)
+        best = min(best, time.perf_counter() - start)
+    return best / len(names) * 1_000_000
+
+
+def main(rows=1_000_000, distinct=50_000):
+    cases = {
+        'repeated': sample_names(rows, distinct),
+        'distinct': sample_names(rows, rows),
+    }
+    routines = {
+        'chained pandas': chained_names,
+        'normalize.names': normalize.names,
+    }
+    print(f'{"input":<10} {"routine":<16} {"s / 1M rows":>12}')
+    for case_name, names in cases.items():
+        for routine_name, routine in routines.items():
+            cost = time_per_million(routine, names)
+            print(f'{case_name:<10} {routine_name:<16} {cost:>12.3f}')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
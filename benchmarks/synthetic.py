@@ -0,0 +1,128 @@
+"""Generate synthetic people to benchmark the models with.
+
+Run with ``python -m benchmarks.synthetic rows output`` to write a sample
+to any file the CLI can read. ``sample_people()`` draws each person's race
+from national shares and then their surname, first name, ZCTA, and census
+tract given that race from the bundled tables, so the inputs repeat and
+co-occur roughly as a real portfolio's do. The draws depend only on the
+seed.
+
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+from surgeo.models.base_model import BaseModel
+
+
+# Approximate 2010 national shares of the race columns of the tables
+RACE_SHARES = {
+    'white': 0.637,
+    'black': 0.122,
+    'api': 0.048,
+    'native': 0.007,
+    'multiple': 0.023,
+    'hispanic': 0.163,
+}
+
+COLUMNS = ['first_name', 'surname', 'zcta5', 'state', 'county', 'tract']
+
+
+def given_race(table, prior=None):
+    """Turn a table's race columns into P(row | race) for each race
+
+    Tables of P(race | row) are inverted with Bayes' rule using the prior
+    weight of each row (uniform if None).
+    """
+    weights = table[list(RACE_SHARES)].fillna(0).to_numpy(dtype=np.float64)
+    if prior is not None:
+        weights = weights * prior[:, np.newaxis]
+    return weights / weights.sum(axis=0)
+
+
+def sample_people(rows, seed=0, dirty=0.05):
+    """Draw a dataframe of synthetic people
+
+    Parameters
+    ----------
+    rows : int
+        The number of people
+    seed : int, optional
+        The seed of the random draws. Defaults to 0.
+    dirty : float, optional
+        The share of values written the way messy inputs are (mixed case,
+        suffixes, dropped leading zeros, missing). Defaults to 0.05.
+
+    Returns
+    -------
+    pd.DataFrame
+        String columns of first_name, surname, zcta5, state, county, and
+        tract
+
+    """
+    generator = np.random.default_rng(seed)
+    base = BaseModel()
+    surnames = base._get_prob_race_given_surname()
+    first_names = base._get_prob_first_name_given_race()
+    zctas = base._get_prob_zcta_given_race()
+    tracts = base._get_prob_race_given_tract()
+    # The first name and ZCTA tables already are P(row | race). The surname
+    # list is ordered by frequency, so weight it by rank; tracts are drawn
+    # to similar populations, so weight them evenly.
+    rank_prior = 1 / np.arange(1, len(surnames) + 1)
+    tables = [
+        (first_names.index.to_numpy(), given_race(first_names)),
+        (surnames.index.to_numpy(), given_race(surnames, rank_prior)),
+        (zctas.index.to_numpy(), given_race(zctas)),
+        (np.arange(len(tracts)), given_race(tracts)),
+    ]
+    shares = np.array(list(RACE_SHARES.values()))
+    races = generator.choice(len(shares), rows, p=shares / shares.sum())
+    # Draw each race's people from that race's distributions
+    drawn = [np.empty(rows, dtype=object) for _ in tables]
+    for race in range(len(shares)):
+        people = np.flatnonzero(races == race)
+        for values, (keys, probs) in zip(drawn, tables):
+            values[people] = keys[
+                generator.choice(len(keys), len(people), p=probs[:, race])
+            ]
+    tract_parts = tracts.index.to_frame(index=False).take(drawn[3].astype(np.int64))
+    people = pd.DataFrame({
+        'first_name': drawn[0],
+        'surname': drawn[1],
+        'zcta5': drawn[2],
+        'state': tract_parts['state'].to_numpy(),
+        'county': tract_parts['county'].to_numpy(),
+        'tract': tract_parts['tract'].to_numpy(),
+    }, dtype=object)
+    return _dirty(people, generator, dirty)
+
+
+def _dirty(people, generator, share):
+    """Write a share of the values the way messy inputs are"""
+    rows = len(people)
+    suffixes = np.array([' Jr.', ' SR', ' III', ' iv', '-'], dtype=object)
+    for column in ['first_name', 'surname']:
+        messy = generator.random(rows) < share
+        people.loc[messy, column] = (
+            people.loc[messy, column].str.title()
+            + generator.choice(suffixes, messy.sum())
+        )
+    # ZIP codes read as numbers lose their leading zeros
+    messy = generator.random(rows) < share
+    people.loc[messy, 'zcta5'] = people.loc[messy, 'zcta5'].str.lstrip('0')
+    # Some values are missing entirely
+    for column in ['first_name', 'surname', 'zcta5']:
+        people.loc[generator.random(rows) < share / 5, column] = None
+    return people
+
+
+def main(rows=100_000, output_path='synthetic.csv', seed=0):
+    from surgeo.app import table_io
+    table_io.write_table(sample_people(int(rows), int(seed)), output_path)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
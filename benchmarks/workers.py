@@ -0,0 +1,114 @@
+"""Benchmark scoring across 1 to N worker processes.
+
+Run with ``python -m benchmarks.workers [rows] [max_workers]``. Each model
+scores the same synthetic inputs with n_jobs from 1 up to max_workers
+(doubling each time). The pool is started by an untimed warm-up call, so
+the timings show steady-state throughput rather than process start-up.
+
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import surgeo
+from surgeo.models.base_model import BaseModel
+
+
+def sample_inputs(rows, seed=0):
+    """Draw names and ZCTAs from the bundled tables"""
+    generator = np.random.default_rng(seed)
+    base = BaseModel()
+    surnames = base._get_prob_race_given_surname().index.to_numpy()
+    first_names = base._get_prob_first_name_given_race().index.to_numpy()
+    zctas = base._get_prob_zcta_given_race().index.to_numpy()
+    return pd.DataFrame({
+        'first_name': generator.choice(first_names, rows),
+        'surname': generator.choice(surnames, rows),
+        'zcta5': generator.choice(zctas, rows),
+    })
+
+
+def worker_counts(max_workers):
+    """1, 2, 4, ... up to and including max_workers"""
+    counts = []
+    count = 1
+    while count < max_workers:
+        counts.append(count)
+        count *= 2
+    return counts + [max_workers]
+
+
+def time_scoring(score, n_jobs, repeat=3):
+    """Best-of-repeat seconds for one scoring call"""
+    # Warm up (starts the worker pool)
+    score(n_jobs)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        score(n_jobs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(rows=1_000_000, max_workers=None):
+    max_workers = max_workers or os.cpu_count() or 1
+    data = sample_inputs(rows)
+    cases = {
+        'surname': (
+            surgeo.SurnameModel(),
+            lambda model, n_jobs: model.get_probabilities(
+                data['surname'],
+                n_jobs=n_jobs,
+            ),
+        ),
+        'first': (
+            surgeo.FirstNameModel(),
+            lambda model, n_jobs: model.get_probabilities(
+                data['first_name'],
+                n_jobs=n_jobs,
+            ),
+        ),
+        'geocode': (
+            surgeo.GeocodeModel(),
+            lambda model, n_jobs: model.get_probabilities(
+                data['zcta5'],
+                n_jobs=n_jobs,
+            ),
+        ),
+        'surgeo': (
+            surgeo.SurgeoModel(),
+            lambda model, n_jobs: model.get_probabilities(
+                data['surname'],
+                data['zcta5'],
+                n_jobs=n_jobs,
+            ),
+        ),
+        'bifsg': (
+            surgeo.BIFSGModel(),
+            lambda model, n_jobs: model.get_probabilities(
+                data['first_name'],
+                data['surname'],
+                data['zcta5'],
+                n_jobs=n_jobs,
+            ),
+        ),
+    }
+    print(f'{"model":<8} {"workers":>7} {"seconds":>9} {"rows / s":>12} {"speedup":>8}')
+    for case_name, (model, score) in cases.items():
+        baseline = None
+        for n_jobs in worker_counts(max_workers):
+            seconds = time_scoring(lambda jobs: score(model, jobs), n_jobs)
+            baseline = baseline or seconds
+            print(
+                f'{case_name:<8} {n_jobs:>7} {seconds:>9.3f} '
+                f'{rows / seconds:>12,.0f} {baseline / seconds:>8.2f}'
+            )
+        model.close()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
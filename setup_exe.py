@@ -3,6 +3,10 @@ from cx_Freeze import setup
 from cx_Freeze import Executable
 
 OPTIONS = {
+    # The models are imported lazily, so include the package explicitly
+    'build_exe': {
+        'packages': ['surgeo'],
+    },
     'bdist_msi': {
         "add_to_path": True,
         "target_name": "surgeo",
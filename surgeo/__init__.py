@@ -1,9 +1,46 @@
 """Surgeo is a Bayesian Improved Geocoding Surname Analysis module."""
 
-from  surgeo.models.bifsg_model import BIFSGModel
-from surgeo.models.first_name_model import FirstNameModel
-from surgeo.models.geocode_model import GeocodeModel
-from surgeo.models.surname_model import SurnameModel
-from surgeo.models.surgeo_model import SurgeoModel
+import importlib
 
 VERSION = '1.1.1'
+
+# The models are imported on first access (e.g. ``surgeo.BIFSGModel``) so
+# that importing the package, or running ``surgeo --help``, does not pay
+# for importing pandas and numpy.
+_LAZY_ATTRIBUTES = {
+    'AsyncScorer': 'surgeo.models.async_scorer',
+    'BIFSGModel': 'surgeo.models.bifsg_model',
+    'FirstNameModel': 'surgeo.models.first_name_model',
+    'GeocodeModel': 'surgeo.models.geocode_model',
+    'score_batches': 'surgeo.models.batches',
+    'SurnameModel': 'surgeo.models.surname_model',
+    'SurgeoModel': 'surgeo.models.surgeo_model',
+}
+
+# Modules exposed at the top level (e.g. ``surgeo.normalize``)
+_LAZY_MODULES = {
+    'kernels': 'surgeo.models.kernels',
+    'normalize': 'surgeo.utility.normalize',
+}
+
+__all__ = ['VERSION'] + list(_LAZY_ATTRIBUTES) + list(_LAZY_MODULES)
+
+
+def __getattr__(name):
+    """Import lazily loaded attributes on first access"""
+    if name in _LAZY_MODULES:
+        value = importlib.import_module(_LAZY_MODULES[name])
+    elif name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name])
+        value = getattr(module, name)
+    else:
+        raise AttributeError(
+            f'module {__name__!r} has no attribute {name!r}'
+        )
+    # Cache on the module so later lookups skip this function
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -5,19 +5,20 @@ import sys
 
 import surgeo
 
-from surgeo.app.surgeo_cli import SurgeoCLI
-from surgeo.app.surgeo_gui import SurgeoGUI
-
 
 class SurgeoCommonEntry(object):
     """An entry point for both the GUI and CLI Surgeo applications
 
     This class simply gets the number of args sent to the entry point. If
-    there is a single argument, the GUI is run. If addtional arguments are
-    supplied, the CLI is run. The CLI will then parse the arguments as
+    there is a single argument, the GUI is run. If the first argument is
+    "serve", the HTTP scoring service is run (see surgeo_server). If
+    addtional arguments are supplied, the CLI is run. The CLI will then parse the arguments as
     nothing it is not necessary to pass the arguments from the common entry
     to the CLI.
 
+    The applications are imported only once one has been chosen, so the
+    CLI never imports tkinter.
+
     """
 
     def main(self):
@@ -33,10 +34,17 @@ class SurgeoCommonEntry(object):
         arg_count = len(sys.argv)
         # If 1, run GUI.
         if arg_count == 1:
+            from surgeo.app.surgeo_gui import SurgeoGUI
             gui = SurgeoGUI()
             gui.main()
+        # If "serve", run the HTTP service with the remaining arguments
+        elif sys.argv[1] == 'serve':
+            from surgeo.app.surgeo_server import SurgeoServeCLI
+            serve_cli = SurgeoServeCLI(sys.argv[2:])
+            serve_cli.main()
         # Else, run CLI
         else:
+            from surgeo.app.surgeo_cli import SurgeoCLI
             cli = SurgeoCLI()
             cli.main()
 
@@ -0,0 +1,198 @@
+"""Module containing the sidecar index behind the CLI's incremental mode.
+
+An incremental run keeps a sidecar file next to its output. The sidecar
+holds a 64-bit hash of each distinct row's input columns (names and
+geography), mapped to the output row the run produced for it. The next
+run hashes its input the same way, carries forward the output of every
+row whose hash is in the sidecar, and scores only the new or changed rows.
+
+The sidecar also records the options the results depend on (model type,
+input columns, precision, output mode, and surgeo version) and the
+SHA-256 checksum of every data file the models read. If any of those
+differ, the sidecar is ignored and every row is scored again.
+
+Sidecars are NumPy ``.npz`` files written without pickles: numeric
+columns are stored as they are, and text and categorical columns as
+strings with a missing-value mask.
+
+"""
+
+import json
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+from surgeo.utility import table_cache
+
+
+# Increment whenever the sidecar layout changes
+FORMAT_VERSION = 1
+
+
+def row_hashes(df, columns):
+    """Hash the values of the given columns of each row to a uint64
+
+    The column names and dtypes are mixed in, so a row read with another
+    dtype (e.g. a ZIP code of 501 rather than "00501"), whose output would
+    echo it differently, does not match.
+    """
+    hashes = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+    signature = '|'.join(f'{column}:{df[column].dtype}' for column in columns)
+    salt = pd.util.hash_array(np.array([signature], dtype=object))[0]
+    return hashes ^ salt
+
+
+class IncrementalIndex(object):
+    """Prior results keyed by row hash, plus the results of this run
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        The sidecar file (it need not exist yet)
+    options : dict
+        The JSON-serializable options the results depend on. A sidecar
+        written with other options is ignored.
+
+    """
+
+    def __init__(self, path, options):
+        self.path = pathlib.Path(path)
+        self.options = options
+        self._prior_hashes = np.empty(0, dtype=np.uint64)
+        self._prior_output = None
+        self._prior_checksums = {}
+        self._hashes = []
+        self._frames = []
+        self._data_files = set()
+        self._load()
+
+    def __len__(self):
+        return len(self._prior_hashes)
+
+    def lookup(self, hashes):
+        """Find prior results for row hashes
+
+        Returns a boolean array that is True for each hash with a prior
+        result, and a dataframe of those results in row order.
+        """
+        positions = np.searchsorted(self._prior_hashes, hashes)
+        clipped = np.minimum(positions, max(len(self._prior_hashes) - 1, 0))
+        found = np.zeros(len(hashes), dtype=bool)
+        if len(self._prior_hashes):
+            found = self._prior_hashes[clipped] == hashes
+        if not found.any():
+            return found, None
+        carried = self._prior_output.iloc[clipped[found]]
+        return found, carried.reset_index(drop=True)
+
+    def record(self, hashes, output, data_files=()):
+        """Keep the output of this run's rows (and the files they used)"""
+        self._hashes.append(np.asarray(hashes, dtype=np.uint64))
+        self._frames.append(output.reset_index(drop=True))
+        self._data_files.update(str(path) for path in data_files)
+
+    def save(self):
+        """Write this run's rows (one per distinct hash) to the sidecar"""
+        if not self._frames:
+            return
+        hashes = np.concatenate(self._hashes)
+        output = pd.concat(self._frames, ignore_index=True)
+        # Keep the first row of each distinct hash, in hash order
+        hashes, first_rows = np.unique(hashes, return_index=True)
+        output = output.iloc[first_rows].reset_index(drop=True)
+        # A run that scored nothing read no data files itself, but its
+        # rows still depend on those of the run it copied them from
+        checksums = dict(self._prior_checksums)
+        for path in self._data_files:
+            checksums[path] = table_cache.checksum(path)
+        meta = {
+            'format_version': FORMAT_VERSION,
+            'options': self.options,
+            'checksums': dict(sorted(checksums.items())),
+        }
+        arrays, meta['columns'] = _to_arrays(output)
+        arrays['hashes'] = hashes
+        arrays['meta'] = np.array(json.dumps(meta))
+        # Write then rename, so a failed run leaves the old sidecar intact
+        temporary_path = self.path.with_name(self.path.name + '.tmp')
+        with open(temporary_path, 'wb') as sidecar_file:
+            np.savez(sidecar_file, **arrays)
+        temporary_path.replace(self.path)
+
+    def _load(self):
+        """Read the prior results, unless missing, stale, or corrupt"""
+        if not self.path.exists():
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as sidecar:
+                meta = json.loads(str(sidecar['meta']))
+                if not self._is_current(meta):
+                    return
+                hashes = sidecar['hashes']
+                output = _from_arrays(sidecar, meta['columns'])
+        except (OSError, KeyError, ValueError):
+            return
+        self._prior_hashes = hashes
+        self._prior_output = output
+        self._prior_checksums = meta.get('checksums', {})
+
+    def _is_current(self, meta):
+        """Check a sidecar's options and data file checksums"""
+        if meta.get('format_version') != FORMAT_VERSION:
+            return False
+        if meta.get('options') != self.options:
+            return False
+        for path, digest in meta.get('checksums', {}).items():
+            try:
+                if table_cache.checksum(path) != digest:
+                    return False
+            except OSError:
+                return False
+        return True
+
+
+def _to_arrays(df):
+    """Flatten an output frame into arrays and column descriptions"""
+    arrays = {}
+    columns = []
+    for position, (name, values) in enumerate(df.items()):
+        key = f'column_{position}'
+        description = {'name': str(name), 'dtype': str(values.dtype)}
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            description['kind'] = 'category'
+            description['categories'] = [
+                str(category) for category in values.cat.categories
+            ]
+            arrays[key] = values.cat.codes.to_numpy()
+        elif pd.api.types.is_numeric_dtype(values.dtype):
+            description['kind'] = 'numeric'
+            arrays[key] = values.to_numpy()
+        else:
+            description['kind'] = 'text'
+            missing = values.isna().to_numpy()
+            text = values.astype(object).where(~missing, '')
+            arrays[key] = np.array([str(value) for value in text], dtype=str)
+            arrays[f'{key}_missing'] = missing
+        columns.append(description)
+    return arrays, columns
+
+
+def _from_arrays(sidecar, columns):
+    """Rebuild an output frame from a sidecar's arrays"""
+    data = {}
+    for position, description in enumerate(columns):
+        key = f'column_{position}'
+        values = sidecar[key]
+        if description['kind'] == 'category':
+            data[description['name']] = pd.Categorical.from_codes(
+                values,
+                categories=description['categories'],
+            )
+        elif description['kind'] == 'numeric':
+            data[description['name']] = values
+        else:
+            text = pd.Series(values.astype(object))
+            text = text.where(~sidecar[f'{key}_missing'])
+            data[description['name']] = text.astype(description['dtype'])
+    return pd.DataFrame(data)
@@ -1,20 +1,15 @@
 """Script containing a basic command line program."""
 
 import argparse
+import contextlib
 import pathlib
 import sys
+import time
 import traceback
 
-import pandas as pd
-
 import surgeo
 
 from surgeo.utility.surgeo_exception import SurgeoException
-from surgeo.models.bifsg_model import BIFSGModel
-from surgeo.models.first_name_model import FirstNameModel
-from surgeo.models.geocode_model import GeocodeModel
-from surgeo.models.surgeo_model import SurgeoModel
-from surgeo.models.surname_model import SurnameModel
 
 
 class SurgeoCLI(object):
@@ -26,6 +21,10 @@ class SurgeoCLI(object):
     file. It uses the "main()" function and then uses other methods as
     helpers.
 
+    Pandas and the models are only imported once the arguments have been
+    parsed (the models through the lazy ``surgeo`` namespace), so that
+    ``surgeo --help`` and argument errors return immediately.
+
     Example
     -------
         .. code-block::
@@ -39,12 +38,19 @@ class SurgeoCLI(object):
                           [--state_column STATE_COLUMN]
                           [--county_column COUNTY_COLUMN]
                           [--tract_column TRACT_COLUMN]
+                          [--chunksize CHUNKSIZE]
+                          [--workers WORKERS]
+                          [--dtype {float64,float32,uint16}]
+                          [--output-mode {full,top}] [--entropy]
+                          [--incremental SIDECAR]
+                          [--profile [{time,memory}]]
+                          [--max-memory MAX_MEMORY]
                           input output type
 
             Get Surgeo arguments.
 
-            input                 Input CSV or XLSX of data.
-            output                Output CSV or XLSX of data.
+            input                 Input CSV, XLSX, Parquet, or Arrow file of data.
+            output                Output CSV, XLSX, Parquet, or Arrow file of data.
             type                  The model type being run ("first", "sur", "geo", "bifsg", or "surgeo")
 
             optional arguments:
@@ -59,9 +65,26 @@ class SurgeoCLI(object):
             --state_column STATE_COLUMN input column containing two digit FIPS state code
             --county_column input column containing three digit FIPS County Code
             --tract_column input column containing six digit tract code
+            --chunksize CHUNKSIZE
+                                Stream the input through the model CHUNKSIZE rows at a time
+            --workers WORKERS   Score across this many worker processes (-1 for every core)
+            --dtype {float64,float32,uint16}
+                                Precision of the lookup tables (and float32 output unless float64)
+            --output-mode {full,top}
+                                Write every race's probability (full) or only the most likely race (top)
+            --entropy           With --output-mode top, also write each row's normalized entropy
+            --incremental SIDECAR
+                                Reuse the results in SIDECAR for unchanged rows and update it
+            --profile [{time,memory}]
+                                Write a JSON report of each stage's time, rows, and memory next to the output
+            --max-memory MAX_MEMORY
+                                Stream the input in the largest chunks that keep memory use under this (e.g. 2G)
 
     """
 
+    # Rows of the input sample the memory needed per row is measured on
+    CALIBRATION_ROWS = 10_000
+
     def __init__(self):
         # Parse args
         args = self._get_parsed_args()
@@ -76,9 +99,22 @@ class SurgeoCLI(object):
         self._county_col = args.county_column
         self._tract_col = args.tract_column
         self._ct = args.ct
+        self._chunksize = args.chunksize
+        self._workers = args.workers
+        self._dtype = args.dtype
+        self._output_mode = args.output_mode
+        self._entropy = args.entropy
+        self._incremental_path = args.incremental
+        self._incremental = None
+        self._profile = args.profile
+        self._profiler = None
+        self._max_memory = args.max_memory
+        self._memory_plan = None
         self._zcta_col_default = 'zcta5'
         self._first_col_default = 'first_name'
         self._sur_col_default = 'name'
+        # Models are created once and reused for every chunk
+        self._models = {}
 
     def main(self):
         """This is the public interface function for this CLI.
@@ -96,6 +132,43 @@ class SurgeoCLI(object):
         6. Writes the resulting data to a new CSV based to output path
            specified by user.
 
+        Parquet (.parquet) and Arrow (.arrow/.feather) files are also
+        accepted for input and output. Only the columns the model needs are
+        read, and names, ZIP codes, and tract codes are read from CSV and
+        Excel files as text (see table_io.read_inputs()). XLSX files are
+        streamed, and an output longer than one sheet continues on further
+        sheets.
+
+        If a chunksize is given, steps 2-6 are repeated for each chunk of
+        the input and each result is appended to the output, so
+        memory use is bounded by the chunk size rather than the file size.
+        The output is identical to that of an unchunked run.
+
+        With an output mode of "top", only the most likely race, its
+        probability, and (optionally) the normalized entropy are written
+        instead of all six probabilities.
+
+        If more than one worker is requested, the rows (of each chunk) are
+        scored in contiguous blocks across a pool of worker processes that
+        is started once for the whole run.
+
+        With an incremental sidecar, rows whose input columns match a row
+        of the previous run are copied from the sidecar rather than scored,
+        and the sidecar is then rewritten with this run's rows. A sidecar
+        from a run with other options or other data files is ignored.
+
+        With profiling on, the time, rows, and (unless only timing) the
+        memory allocated of loading, scoring (stage by stage), and writing
+        are written to a JSON report named after the output, e.g.
+        ``output.csv.profile.json``.
+
+        With a memory budget, the memory needed per row is measured on a
+        sample of the input (see surgeo.models.memory), and the input is
+        streamed in the largest chunks that fit in what the loaded tables
+        leave of the budget. The process's measured peak memory is printed
+        once the run is done. Worker processes have their own memory,
+        which is not included.
+
         Raises
         ------
         surgeo.utility.SurgeoException
@@ -104,49 +177,270 @@ class SurgeoCLI(object):
             inappropriate outputs are not specified.
 
         """
-        input_df = self._load_df()
-        processed_df = self._process_df(input_df)
-        self._write_df(processed_df)
-
-    def _load_df(self):
-        """This creates a dataframe based on self._input_path"""
-        suffix = self._input_path.suffix
-        # If it's excel, read_excel()
-        if suffix == '.xlsx' or suffix == 'xls':
-            # xlrd doesn't support xlsx as of 2021-01-23
-            df = pd.read_excel(self._input_path, engine='openpyxl')
-        # If CSV, read read_csv()
-        elif suffix == '.csv':
-            df = pd.read_csv(
+        if self._profile is not None:
+            from surgeo.utility.profiling import StageProfiler
+            self._profiler = StageProfiler(
+                trace_memory=self._profile == 'memory',
+            )
+            self._profiler.start()
+        start = time.perf_counter()
+        try:
+            if self._incremental_path is not None:
+                self._load_incremental()
+            if self._max_memory is not None:
+                self._plan_memory()
+            if self._chunksize is not None:
+                self._stream_df()
+            else:
+                with self._stage('load') as record:
+                    input_df = self._load_df()
+                    self._set_rows(record, input_df)
+                with self._stage('score', len(input_df)):
+                    processed_df = self._score_df(input_df)
+                with self._stage('write', len(processed_df)):
+                    self._write_df(processed_df)
+            if self._incremental is not None:
+                self._incremental.save()
+        finally:
+            # Stop any worker processes
+            for model in self._models.values():
+                model.close()
+            if self._profiler is not None:
+                self._profiler.stop()
+        if self._profiler is not None:
+            self._write_profile(time.perf_counter() - start)
+        if self._memory_plan is not None:
+            self._report_memory()
+
+    def _plan_memory(self):
+        """Pick the chunksize that keeps the run within the memory budget"""
+        import tempfile
+        from surgeo.app import table_io
+        from surgeo.models import memory
+        if self._chunksize is not None:
+            raise SurgeoException('Use either --chunksize or --max-memory.')
+        budget = memory.parse_bytes(self._max_memory)
+
+        def read_sample():
+            chunks = table_io.iter_inputs(
                 self._input_path,
-                skip_blank_lines=False,
+                self.CALIBRATION_ROWS,
+                self._input_columns(),
             )
-        # If path is unrecognized, throw error
-        else:
-            raise SurgeoException(
-                f'File ending for "{self._input_path}" not '
-                'recognized. Please use .csv or .xlsx.'
+            return next(iter(chunks))
+
+        sample = read_sample()
+        if sample.empty:
+            self._chunksize = self.CALIBRATION_ROWS
+            return
+        # Create the model first, so its tables are not counted per row
+        self._process_df(sample.iloc[:1])
+        model = next(iter(self._models.values()))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            sample_path = pathlib.Path(temp_dir) / (
+                'sample' + self._output_path.suffix
             )
-        return df
+
+            def process_sample():
+                table_io.write_table(
+                    self._process_df(read_sample()),
+                    sample_path,
+                )
+
+            planner = memory.MemoryPlanner(model)
+            planner.calibrate_with(process_sample, len(sample))
+        in_use = memory.current_rss()
+        self._chunksize = planner.chunksize(budget, in_use)
+        self._memory_plan = {
+            'max_memory': budget,
+            'in_use': in_use,
+            'bytes_per_row': planner.bytes_per_row,
+            'chunksize': self._chunksize,
+        }
+
+    def _report_memory(self):
+        """Print the chunksize picked and the peak memory of the run"""
+        from surgeo.models import memory
+        plan = self._memory_plan
+        peak = memory.peak_rss()
+        measured = 'unknown' if peak is None else memory.format_bytes(peak)
+        print(
+            f'Scored in chunks of {plan["chunksize"]:,} rows. '
+            f'Peak memory: {measured} '
+            f'(budget {memory.format_bytes(plan["max_memory"])}).'
+        )
+
+    def _stream_df(self):
+        """Process and write the input one chunk at a time"""
+        from surgeo.app import table_io
+        if self._chunksize < 1:
+            raise SurgeoException('The chunksize must be a positive integer.')
+        chunks = table_io.iter_inputs(
+            self._input_path,
+            self._chunksize,
+            self._input_columns(),
+        )
+        chunks = iter(chunks)
+        with table_io.TableWriter(self._output_path) as writer:
+            while True:
+                with self._stage('load') as record:
+                    chunk = next(chunks, None)
+                    self._set_rows(record, chunk)
+                if chunk is None:
+                    break
+                with self._stage('score', len(chunk)):
+                    processed_df = self._score_df(chunk)
+                with self._stage('write', len(processed_df)):
+                    writer.write(processed_df)
+
+    def _stage(self, name, rows=None):
+        """A context manager timing one stage of the run when profiling"""
+        if self._profiler is None:
+            return contextlib.nullcontext()
+        return self._profiler.stage(name, rows)
+
+    @staticmethod
+    def _set_rows(record, df):
+        """Fill in the rows of a stage record once a frame is loaded"""
+        if record is not None and df is not None:
+            record['rows'] = len(df)
+
+    def _write_profile(self, seconds):
+        """Write the profiling report next to the output"""
+        import json
+        from surgeo.models import memory
+        report = self._profiler.report(
+            surgeo_version=surgeo.VERSION,
+            input=str(self._input_path),
+            output=str(self._output_path),
+            model_type=self._model_type,
+            census_tract=self._ct,
+            chunksize=self._chunksize,
+            workers=self._workers,
+            dtype=self._dtype,
+            output_mode=self._output_mode,
+            rows=sum(
+                record['rows'] for record in self._profiler.records
+                if record['stage'] == 'score'
+            ),
+            seconds=seconds,
+            peak_rss_bytes=memory.peak_rss(),
+            memory_plan=self._memory_plan,
+        )
+        report_path = self._output_path.with_name(
+            self._output_path.name + '.profile.json'
+        )
+        report_path.write_text(json.dumps(report, indent=2))
+
+    def _load_incremental(self):
+        """Read the sidecar of prior results for an incremental run"""
+        from surgeo.app.incremental import IncrementalIndex
+        options = {
+            'surgeo_version': surgeo.VERSION,
+            'model_type': self._model_type,
+            'input_columns': self._input_columns(),
+            'census_tract': self._ct,
+            'dtype': self._dtype,
+            'output_mode': self._output_mode,
+            'entropy': self._entropy,
+        }
+        self._incremental = IncrementalIndex(self._incremental_path, options)
+
+    def _score_df(self, df):
+        """Process a dataframe, reusing prior results when incremental"""
+        if self._incremental is None:
+            return self._process_df(df)
+        import numpy as np
+        import pandas as pd
+        from surgeo.app.incremental import row_hashes
+        columns = [
+            column for column in self._input_columns() if column in df.columns
+        ]
+        hashes = row_hashes(df, columns)
+        found, carried = self._incremental.lookup(hashes)
+        if carried is not None and found.all():
+            result = carried.set_axis(df.index)
+        else:
+            scored = self._process_df(df[~found])
+            if carried is None:
+                result = scored
+            else:
+                # Put the carried and scored rows back in input order
+                positions = np.concatenate(
+                    [np.flatnonzero(found), np.flatnonzero(~found)]
+                )
+                result = pd.concat(
+                    [carried, scored.reset_index(drop=True)],
+                    ignore_index=True,
+                )
+                result = result.iloc[np.argsort(positions, kind='stable')]
+                result = result.set_axis(df.index)
+        data_files = [
+            path for model in self._models.values() for path in model.data_files
+        ]
+        self._incremental.record(hashes, result, data_files)
+        return result
+
+    def _input_columns(self):
+        """The input columns the selected model may read
+
+        Only these are read from Parquet and Arrow inputs.
+        """
+        zcta = [self._zcta_col or self._zcta_col_default]
+        if self._state_col is not None:
+            tract = [self._state_col, self._county_col, self._tract_col]
+        else:
+            tract = ['state', 'county', 'tract']
+        geo = zcta + tract if self._ct else zcta
+        surname = [self._sur_col or self._sur_col_default]
+        first_name = [self._first_col or self._first_col_default]
+        columns = {
+            'first' : first_name,
+            'sur'   : surname,
+            'geo'   : geo,
+            'bifsg' : zcta + surname + first_name,
+            'surgeo': geo + surname,
+        }
+        return columns.get(self._model_type)
+
+    def _get_model(self, model_name, *args):
+        """Create a model on first use and reuse it afterwards"""
+        key = (model_name,) + args
+        if key not in self._models:
+            model_type = getattr(surgeo, model_name)
+            with self._stage('construct'):
+                self._models[key] = model_type(*args, dtype=self._dtype)
+            self._models[key].profiler = self._profiler
+        return self._models[key]
+
+    def _score_kwargs(self):
+        """Keyword arguments passed to every get_probabilities() call"""
+        return {
+            'n_jobs': self._workers,
+            'output': self._output_mode,
+            'entropy': self._entropy,
+        }
+
+    def _load_df(self):
+        """This creates a dataframe based on self._input_path"""
+        from surgeo.app import table_io
+        return table_io.read_inputs(self._input_path, self._input_columns())
 
     def _run_geo(self, df):
         """Method called from self._process_df() to get geo results"""
         if self._ct:
-            model = GeocodeModel("TRACT")
+            model = self._get_model('GeocodeModel', 'TRACT')
         else:
-            model = GeocodeModel("ZCTA")
-        # If an optional name is specified, select that column and run
-        if self._zcta_col is not None and not self._ct:
-            model = GeocodeModel()
+            model = self._get_model('GeocodeModel', 'ZCTA')
         # TODO: if they supply a name not found in CSV ... more specific error?
         # If an optional name is specified, select that column and run
         if self._zcta_col is not None:
             target = df[self._zcta_col]
-            result = model.get_probabilities(target)
+            result = model.get_probabilities(target, **self._score_kwargs())
         # Otherwise use 'zcta5' (and raise error if need be.)
         elif self._state_col is not None and self._ct:
             target = df[[self._state_col, self._county_col, self._tract_col]]
-            result = model.get_probabilities_tract(target)
+            result = model.get_probabilities_tract(target, **self._score_kwargs())
         elif self._ct:
             try:
                 target = df[['state', 'column', 'tract']]
@@ -155,7 +449,7 @@ class SurgeoCLI(object):
         else:
             try:
                 target = df[self._zcta_col_default]
-                result = model.get_probabilities(target)
+                result = model.get_probabilities(target, **self._score_kwargs())
             except KeyError:
                 raise SurgeoException(f'No "{self._zcta_col_default}" column '
                                        'and no column specified.')
@@ -164,17 +458,17 @@ class SurgeoCLI(object):
     def _run_sur(self, df):
         """This runs a surname model for a given dataframe"""
         # Instantiate model
-        model = SurnameModel()
+        model = self._get_model('SurnameModel')
         # If target is specified, get probabilities based on that target
         # TODO: if they supply a name not found in CSV ... more specific error?
         if self._sur_col is not None:
             target = df[self._sur_col]
-            result = model.get_probabilities(target)
+            result = model.get_probabilities(target, **self._score_kwargs())
         # Otherwise use "name" as default (will throw error if unfound)
         else:
             try:
                 target = df[self._sur_col_default]
-                result = model.get_probabilities(target)
+                result = model.get_probabilities(target, **self._score_kwargs())
             except KeyError:
                 raise SurgeoException(f'No "{self._sur_col_default}" column '
                                        'and no column specified.')
@@ -183,17 +477,17 @@ class SurgeoCLI(object):
     def _run_first(self, df):
         """This runs a first name model for a given dataframe"""
         # Instantiate model
-        model = FirstNameModel()
+        model = self._get_model('FirstNameModel')
         # If target is specified, get probabilities based on that 
         # TODO: if they supply a name not found in CSV ... more specific error?
         if self._first_col is not None:
             target = df[self._first_col]
-            result = model.get_probabilities(target)
+            result = model.get_probabilities(target, **self._score_kwargs())
         # Otherwise use "name" as default (will throw error if unfound)
         else:
             try:
                 target = df[self._first_col_default]
-                result = model.get_probabilities(target)
+                result = model.get_probabilities(target, **self._score_kwargs())
             except KeyError:
                 raise SurgeoException(f'No "{self._first_col_default}" column '
                                        'and no column specified.')
@@ -206,22 +500,22 @@ class SurgeoCLI(object):
         if self._zcta_col is not None and not self._ct:
             try:
                 geo_target = df[self._zcta_col]
-                model = SurgeoModel()
+                model = self._get_model('SurgeoModel', 'ZCTA')
             except KeyError:
                 raise SurgeoException(f'Column "{self._zcta_col}"" not found.')
         elif self._ct and self._state_col is not None:
             try:
                 geo_target = df[[self._state_col, self._county_col, self._tract_col]]
-                model = SurgeoModel(geo_level='TRACT')
+                model = self._get_model('SurgeoModel', 'TRACT')
             except KeyError:
                 raise SurgeoException(f'Columns for state, county, and tract not found.')
         elif self._ct:
             geo_target = df[['state','county','tract']]
-            model = SurgeoModel(geo_level='TRACT')
+            model = self._get_model('SurgeoModel', 'TRACT')
         # Otherwise use zcta5 for ZIP target
         else:
             geo_target = df[self._zcta_col_default]
-            model = SurgeoModel()
+            model = self._get_model('SurgeoModel', 'ZCTA')
         # If Surname target spcified, check for accuracy
         if self._sur_col is not None:
             sur_target = df[self._sur_col]
@@ -233,13 +527,13 @@ class SurgeoCLI(object):
         else:
             sur_target = df[self._sur_col_default]
         # Get probabilities
-        result = model.get_probabilities(sur_target, geo_target)
+        result = model.get_probabilities(sur_target, geo_target, **self._score_kwargs())
         return result
 
     def _run_bifsg(self, df):
         """Runs a BIFSG model for a given dataframe"""
         # Instantiate model
-        model = BIFSGModel()
+        model = self._get_model('BIFSGModel')
         # If ZIP target is specified, check accuracy
         if self._zcta_col is not None:
             try:
@@ -270,7 +564,7 @@ class SurgeoCLI(object):
         else:
             first_target = df[self._first_col_default]
         # Get probabilities
-        result = model.get_probabilities(first_target, sur_target, geo_target)
+        result = model.get_probabilities(first_target, sur_target, geo_target, **self._score_kwargs())
         return result
 
     def _process_df(self, df):
@@ -297,20 +591,9 @@ class SurgeoCLI(object):
         return result_df
 
     def _write_df(self, df):
-        """Write to CSV or XLSX depending on file suffix"""
-        suffix = self._output_path.suffix
-        # If excel, write to Excel
-        if suffix == '.xlsx':
-            df.to_excel(self._output_path, index=False)
-        # If CSV write to CSV
-        elif suffix == '.csv':
-            df.to_csv(self._output_path, index=False)
-        # Otherwise throw error.
-        else:
-            raise SurgeoException(
-                f'"{self._output_path}" is not a valid. '
-                f'Please specify a path ending in ".csv" or ".xlsx".'
-            )
+        """Write to CSV, XLSX, Parquet, or Arrow depending on file suffix"""
+        from surgeo.app import table_io
+        table_io.write_table(df, self._output_path)
 
     def _get_parsed_args(self):
         """Create an argument parser and parse CLI arguments"""
@@ -319,12 +602,12 @@ class SurgeoCLI(object):
         # Add input file path argument
         parser.add_argument(
             'input',
-            help='Input CSV or XLSX of data.',
+            help='Input CSV, XLSX, Parquet, or Arrow file of data.',
         )
         # Output file path argument
         parser.add_argument(
             'output',
-            help='Output CSV or XLSX of data.',
+            help='Output CSV, XLSX, Parquet, or Arrow file of data.',
         )
         # Model type argument
         parser.add_argument(
@@ -368,6 +651,78 @@ class SurgeoCLI(object):
             help='The input column to analyze as first name',
             dest='first_name_column'
         )
+        # Optional streaming argument
+        parser.add_argument(
+            '--chunksize',
+            type=int,
+            help='Stream a CSV, XLSX, Parquet, or Arrow input through the model this many rows at a time',
+            dest='chunksize'
+        )
+        # Optional worker process count argument
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='The number of worker processes to score with (-1 for every core)',
+            dest='workers'
+        )
+        # Optional precision argument
+        parser.add_argument(
+            '--dtype',
+            choices=['float64', 'float32', 'uint16'],
+            default='float64',
+            help='The precision of the lookup tables: float64 (default), '
+                 'float32, or quantized uint16. Probabilities are written '
+                 'as float32 unless float64 is used.',
+            dest='dtype'
+        )
+        # Optional compact output argument
+        parser.add_argument(
+            '--output-mode',
+            '--output_mode',
+            choices=['full', 'top'],
+            default='full',
+            help='Write the probability of every race (full, the default) '
+                 'or only the most likely race and its probability (top)',
+            dest='output_mode'
+        )
+        parser.add_argument(
+            '--entropy',
+            action='store_true',
+            help='With --output-mode top, also write the normalized entropy '
+                 'of each row (0 is one certain race, 1 all races equally likely)',
+            dest='entropy'
+        )
+        # Optional incremental sidecar argument
+        parser.add_argument(
+            '--incremental',
+            metavar='SIDECAR',
+            help='Copy the results of rows unchanged since the run that '
+                 'wrote this sidecar file instead of scoring them, then '
+                 'update it with this run\'s results',
+            dest='incremental'
+        )
+        # Optional profiling argument
+        parser.add_argument(
+            '--profile',
+            nargs='?',
+            const='memory',
+            choices=['time', 'memory'],
+            help='Write a JSON report of the time, rows, and memory '
+                 'allocated of each stage next to the output (OUTPUT.profile.json). '
+                 'Tracing memory slows the run down; "--profile time" only '
+                 'records times and rows.',
+            dest='profile'
+        )
+        # Optional memory budget argument
+        parser.add_argument(
+            '--max-memory',
+            '--max_memory',
+            help='Stream a CSV, XLSX, Parquet, or Arrow input in the largest chunks '
+                 'that keep the memory used under this size (e.g. 512M or 2G) '
+                 'and print the peak memory used',
+            dest='max_memory'
+        )
         # Parse args and return
         parsed_args = parser.parse_args()
         return parsed_args
@@ -1,7 +1,10 @@
 """Script containing a basic GUI program."""
 
+import contextlib
 import pathlib
+import queue
 import sys
+import threading
 import traceback
 
 import tkinter as tk
@@ -9,10 +12,12 @@ import tkinter.ttk as ttk
 import tkinter.filedialog as filedialog
 import tkinter.messagebox as messagebox
 
+
 import pandas as pd
 
 import surgeo
 
+from surgeo.app import table_io
 from surgeo.utility.surgeo_exception import SurgeoException
 from surgeo.models.bifsg_model import BIFSGModel
 from surgeo.models.first_name_model import FirstNameModel
@@ -21,6 +26,14 @@ from surgeo.models.surgeo_model import SurgeoModel
 from surgeo.models.surname_model import SurnameModel
 
 
+# The file types that are read and written a chunk at a time
+CHUNKED_SUFFIXES = (
+    table_io.CSV_SUFFIXES
+    + table_io.XLSX_SUFFIXES
+    + table_io.PARQUET_SUFFIXES
+    + table_io.ARROW_SUFFIXES
+)
+
 class SurgeoGUI(object):
     """A GUI application class to function as an executable
 
@@ -33,14 +46,34 @@ class SurgeoGUI(object):
     It also has various helper functions to integrate the surgeo logic
     within the program.
 
-    It currently supports .xlsx, .xls, and .csv inputs; it currently
-    supports .xlsx and .csv outputs.
+    It currently supports .xlsx, .xls, .csv, .parquet, .arrow, and
+    .feather inputs; it currently supports .xlsx, .csv, .parquet, .arrow,
+    and .feather outputs (Parquet and Arrow files require pyarrow).
+
+    The data is loaded, scored, and written on a worker thread, a chunk of
+    rows at a time, so the window stays responsive. The worker puts its
+    progress on a queue that the Tk event loop polls to update the progress
+    bar; a run can be cancelled between chunks. Models are created on
+    first use and kept for later runs.
 
     """
 
+    # Rows loaded, scored, and written at a time
+    CHUNKSIZE = 50_000
+
+    # Milliseconds between checks of the worker's progress
+    POLL_MS = 100
+
     def __init__(self):
         # Create dictionary to track all objects and populate with root
         self._objects = {'root': tk.Tk()}
+        # Models are created once and reused for every run
+        self._models = {}
+        # The running worker thread, its cancel flag, and its messages
+        self._worker = None
+        self._cancel = None
+        self._messages = None
+        self._show_msgbox = True
         # https://cx-freeze.readthedocs.io/en/latest/faq.html#using-data-files
         # If it's frozen, we can't use __file__
         if getattr(sys, 'frozen', False):
@@ -71,7 +104,7 @@ class SurgeoGUI(object):
         self._objects['frame'] = tk.Frame(master=self._objects['root'])
         # Set title and window size
         self._objects['root'].title(f"Surgeo v.{surgeo.VERSION}")
-        self._objects['root'].minsize(700, 160)
+        self._objects['root'].minsize(700, 190)
         # Bind enter to a function that starts the analysis
         self._objects['root'].bind('<Return>', self._execute)
         # Add icon
@@ -92,7 +125,9 @@ class SurgeoGUI(object):
             filetypes=(
                 ('CSV files' , '*.csv' ),
                 ('Excel XLSX', '*.xlsx'),
-                ('Excel XLS' , '*.xls' )
+                ('Excel XLS' , '*.xls' ),
+                ('Parquet'   , '*.parquet'),
+                ('Arrow'     , '*.arrow *.feather'),
             )
         )
         # Populate variable (in turn, updates screen)
@@ -104,6 +139,8 @@ class SurgeoGUI(object):
         files = (
             ('CSV files' , '*.csv' ),
             ('Excel XLSX', '*.xlsx'),
+            ('Parquet'   , '*.parquet'),
+            ('Arrow'     , '*.arrow'),
         )
         # Get filename from dialog
         output_filename = filedialog.asksaveasfilename(
@@ -277,14 +314,41 @@ class SurgeoGUI(object):
         )
         execute_button.grid(row=6, column=2, padx=10, pady=3, sticky='w')
         self._objects['execute_button'] = execute_button
+        # Progress bar of the rows written
+        progress_bar = ttk.Progressbar(
+            root,
+            orient='horizontal',
+            mode='determinate',
+            length=480,
+        )
+        progress_bar.grid(row=6, column=1, padx=10, pady=3, sticky='w')
+        self._objects['progress_bar'] = progress_bar
+        #######################################################################
+        # Row 8 STATUS AND CANCEL
+        #######################################################################
+        # Status of the current run (rows read, scored, and written)
+        status_var = tk.StringVar()
+        self._objects['status_var'] = status_var
+        status_label = ttk.Label(root, textvariable=status_var)
+        status_label.grid(row=7, column=1, padx=10, sticky='w')
+        self._objects['status_label'] = status_label
+        # Cancel button (only enabled while running)
+        cancel_button = ttk.Button(
+            root,
+            text='Cancel',
+            command=self._cancel_execution,
+            state='disabled',
+        )
+        cancel_button.grid(row=7, column=2, padx=10, pady=3, sticky='w')
+        self._objects['cancel_button'] = cancel_button
 
-    def _check_inputs(self, df):
+    def _check_inputs(self, df, job):
         """Take DF and raise error if improper column names given"""
         # Create shortnames for variables
-        first_name_var = self._objects['first_name_var'].get()
-        surname_var = self._objects['surname_var'].get()
-        zip_var = self._objects['zip_var'].get()
-        model_var = self._objects['model_var'].get()
+        first_name_var = job['first_name_var']
+        surname_var = job['surname_var']
+        zip_var = job['zip_var']
+        model_var = job['model_var']
         # If it's first name, make sure column is there. Otherwise error.
         if model_var == 'First Name':
             if first_name_var not in df.columns:
@@ -323,99 +387,240 @@ class SurgeoGUI(object):
                 raise SurgeoException(f'{surname_var} not in input data. '
                                       f'Columns are: {df.columns}.')
 
-    def _load_df(self, input_path):
-        """This creates a dataframe based on self._input_path"""
-        path = pathlib.Path(input_path)
-        suffix = path.suffix
-        # If it's excel, read_excel()
-        if suffix == '.xlsx' or suffix == 'xls':
-            df = pd.read_excel(path, engine='openpyxl')
-        # If CSV, read read_csv()
-        elif suffix == '.csv':
-            df = pd.read_csv(path, skip_blank_lines=False)
-        # If path is unrecognized, throw error
-        else:
-            raise SurgeoException(
-                f'File ending for "{path}" not '
-                'recognized. Please use .csv or .xlsx.'
+    def _get_job(self):
+        """Read the user inputs for a run (on the main thread)"""
+        return {
+            # Input path from file selection
+            'input_var': self._objects['input_var'].get(),
+            # Output path from file selection
+            'output_var': self._objects['output_var'].get(),
+            # First name column header from text field
+            'first_name_var': self._objects['first_name_var'].get(),
+            # Surname column header from text field
+            'surname_var': self._objects['surname_var'].get(),
+            # ZCTA column header from text field
+            'zip_var': self._objects['zip_var'].get(),
+            # Model being run from drop down window
+            'model_var': self._objects['model_var'].get(),
+        }
+
+    def _iter_df(self, job):
+        """Read the input a chunk at a time (XLS files in one chunk)"""
+        input_path = pathlib.Path(job['input_var'])
+        # Only the entered column headers are read, as text
+        columns = [job['first_name_var'], job['surname_var'], job['zip_var']]
+        if input_path.suffix.lower() not in CHUNKED_SUFFIXES:
+            yield table_io.read_inputs(input_path, columns)
+            return
+        yield from table_io.iter_inputs(input_path, self.CHUNKSIZE, columns)
+
+    def _get_model(self, model_type):
+        """Create a model on first use and reuse it afterwards"""
+        if model_type not in self._models:
+            self._models[model_type] = model_type()
+        return self._models[model_type]
+
+    def _process_df(self, input_df, job):
+        """Score a chunk of the input with the selected model"""
+        first_name_var = job['first_name_var']
+        surname_var = job['surname_var']
+        zip_var = job['zip_var']
+        model_var = job['model_var']
+        # If BIFSG, run the BIFSG model and assign result to df
+        if model_var == 'BIFSG':
+            bifsg = self._get_model(BIFSGModel)
+            output_df = bifsg.get_probabilities(
+                input_df[first_name_var],
+                input_df[surname_var],
+                input_df[zip_var]
             )
-        return df
+        # If first name, run the first name model assign result to df
+        elif model_var == 'First Name':
+            first = self._get_model(FirstNameModel)
+            output_df = first.get_probabilities(input_df[first_name_var])
+        # If geo, run the geo model assign result to df
+        elif model_var == 'Geocode':
+            geo = self._get_model(GeocodeModel)
+            output_df = geo.get_probabilities(input_df[zip_var])
+        # If sur, run the sur model and assign result to df
+        elif model_var == 'Surname':
+            sur = self._get_model(SurnameModel)
+            output_df = sur.get_probabilities(input_df[surname_var])
+        # If surgeo, run the surgeo model and assign to df
+        else: # model_var == 'Surgeo (Surname + Geocode)':
+            surgeo = self._get_model(SurgeoModel)
+            # Note that surgeo takes two input columns unlike others
+            output_df = surgeo.get_probabilities(
+                input_df[surname_var],
+                input_df[zip_var]
+            )
+        return output_df
+
+    def _run(self, job, cancel, messages):
+        """Load, score, and write the data (on the worker thread)
+
+        Only the messages queue is used to talk to the window: a
+        ('progress', counts) message after each step, and then one of
+        ('done', rows), ('cancelled', rows), or ('error', traceback). A
+        cancelled or failed run removes its partial output.
+        """
+        output_path = pathlib.Path(job['output_var'])
+        written = False
+        # This large try block captures any errors for error window
+        try:
+            progress = {
+                'read': 0,
+                'scored': 0,
+                'written': 0,
+                'total': table_io.estimate_rows(job['input_var']),
+            }
+            suffix = output_path.suffix.lower()
+            # Parquet, Arrow, and CSV output is written a chunk at a time;
+            # anything else is collected and written at the end
+            if suffix in CHUNKED_SUFFIXES:
+                writer = table_io.TableWriter(output_path)
+            else:
+                writer = None
+            output_dfs = []
+            with contextlib.ExitStack() as stack:
+                if writer is not None:
+                    stack.enter_context(writer)
+                for input_df in self._iter_df(job):
+                    # Stop between chunks if cancelled
+                    if cancel.is_set():
+                        break
+                    progress['read'] += len(input_df)
+                    messages.put(('progress', dict(progress)))
+                    # Ensure the inputs are OK
+                    if not progress['scored']:
+                        self._check_inputs(input_df, job)
+                    output_df = self._process_df(input_df, job)
+                    progress['scored'] += len(output_df)
+                    messages.put(('progress', dict(progress)))
+                    if cancel.is_set():
+                        break
+                    written = True
+                    if writer is not None:
+                        writer.write(output_df)
+                    else:
+                        output_dfs.append(output_df)
+                    progress['written'] += len(output_df)
+                    messages.put(('progress', dict(progress)))
+            if cancel.is_set():
+                self._remove_output(output_path, written)
+                messages.put(('cancelled', progress['written']))
+                return
+            if writer is None:
+                output_df = pd.concat(output_dfs, ignore_index=True)
+                written = True
+                # If output is .xlsx, write that format
+                if suffix in table_io.WRITE_SUFFIXES:
+                    table_io.write_table(output_df, output_path)
+                # Otherwise write to CSV
+                else:
+                    output_df.to_csv(output_path, index=False)
+            messages.put(('done', progress['written']))
+        except Exception:
+            self._remove_output(output_path, written)
+            messages.put(('error', traceback.format_exc()))
+
+    @staticmethod
+    def _remove_output(output_path, written):
+        """Delete the output of a run that did not finish"""
+        if written and output_path.exists():
+            output_path.unlink()
 
     def _execute(self, event=None, show_msgbox=True):
-        """This takes all the user inputs and runs the analysis.
+        """This takes all the user inputs and starts the analysis.
 
         It can be triggered by the enter key (in which case it supplied an
         event), or it can be triggered by clicking the "Execute" button.
         The outcome in either event is identical.
 
+        The analysis runs on a worker thread, which is returned (None if a
+        run is already in progress). Its progress is shown as the Tk event
+        loop polls it (see _poll()).
+
         """
+        if self._worker is not None:
+            return None
+        job = self._get_job()
+        self._cancel = threading.Event()
+        self._messages = queue.Queue()
+        self._show_msgbox = show_msgbox
+        self._worker = threading.Thread(
+            target=self._run,
+            args=(job, self._cancel, self._messages),
+            daemon=True,
+        )
+        # Only one run at a time
+        self._objects['execute_button'].state(['disabled'])
+        self._objects['cancel_button'].state(['!disabled'])
+        self._objects['progress_bar']['value'] = 0
+        self._objects['status_var'].set('Loading...')
+        self._worker.start()
+        self._objects['root'].after(self.POLL_MS, self._poll)
+        return self._worker
 
-        # Get tkinter variables and stuff strings in short names.
-        # Input path from file selection
-        input_var = self._objects['input_var'].get()
-        # Output path from file selection
-        output_var = self._objects['output_var'].get()
-        # Surname column header from text field
-        first_name_var = self._objects['first_name_var'].get()
-        # Surname column header from text field
-        surname_var = self._objects['surname_var'].get()
-        # ZCTA column header from text field
-        zip_var = self._objects['zip_var'].get()
-        # Model being run from drop down window
-        model_var = self._objects['model_var'].get()
-        # Output path suffix (to determine if .csv or .xlsx)
-        suffix = pathlib.Path(output_var).suffix
-        # This large try block captures any errors for error window
-        try:
-            # Load the dataframe
-            input_df = self._load_df(input_var)
-            # Ensure the inputs are OK
-            self._check_inputs(input_df)
-            # If first name, run the first name model assign result to df
-            if model_var == 'BIFSG':
-                bifsg = BIFSGModel()
-                output_df = bifsg.get_probabilities(
-                    input_df[first_name_var],
-                    input_df[surname_var],
-                    input_df[zip_var]
-                )
-            # If first name, run the first name model assign result to df
-            elif model_var == 'First Name':
-                first = FirstNameModel()
-                output_df = first.get_probabilities(input_df[first_name_var])
-            # If geo, run the geo model assign result to df
-            elif model_var == 'Geocode':
-                geo = GeocodeModel()
-                output_df = geo.get_probabilities(input_df[zip_var])
-            # If sur, run the sur model and assign result to df
-            elif model_var == 'Surname':
-                sur = SurnameModel()
-                output_df = sur.get_probabilities(input_df[surname_var])
-            # If surgeo, run the surgeo model and assign to df
-            else: # model_var == 'Surgeo (Surname + Geocode)':
-                surgeo = SurgeoModel()
-                # Note that surgeo takes two input columns unlike others
-                output_df = surgeo.get_probabilities(
-                    input_df[surname_var],
-                    input_df[zip_var]
-                )
-            # If output is .xlsx, write to Excel
-            if suffix == '.xlsx':
-                output_df.to_excel(output_var, index=False)
-            # Otherwise write to CSV
+    def _cancel_execution(self):
+        """Stop the run after the chunk in progress (button triggered)"""
+        if self._worker is not None:
+            self._cancel.set()
+            self._objects['status_var'].set('Cancelling...')
+
+    def _poll(self):
+        """Show the messages the worker has put on the queue so far"""
+        if self._worker is None:
+            return
+        while True:
+            try:
+                kind, value = self._messages.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                self._show_progress(value)
             else:
-                output_df.to_csv(output_var, index=False)
+                self._finish(kind, value)
+                return
+        # Check again later
+        self._objects['root'].after(self.POLL_MS, self._poll)
+
+    def _show_progress(self, progress):
+        """Update the progress bar and status with the rows so far"""
+        # The row count of a CSV file is only an estimate
+        total = max(progress['total'] or 0, progress['read'])
+        progress_bar = self._objects['progress_bar']
+        progress_bar['maximum'] = max(total, 1)
+        progress_bar['value'] = progress['written']
+        self._objects['status_var'].set(
+            f'{progress["read"]:,} read, {progress["scored"]:,} scored, '
+            f'{progress["written"]:,} written of {total:,} rows'
+        )
+
+    def _finish(self, kind, value):
+        """Show the outcome of a run and allow another one"""
+        self._worker = None
+        self._objects['execute_button'].state(['!disabled'])
+        self._objects['cancel_button'].state(['disabled'])
+        if kind == 'done':
+            progress_bar = self._objects['progress_bar']
+            progress_bar['value'] = progress_bar['maximum']
+            self._objects['status_var'].set(f'{value:,} items written.')
             # Show message on success
-            if show_msgbox:
+            if self._show_msgbox:
                 messagebox.showinfo(
                     'Success',
-                    f'{len(output_df)} items successfully written.'
+                    f'{value} items successfully written.'
                 )
-        except Exception:
+        elif kind == 'cancelled':
+            self._objects['status_var'].set('Cancelled.')
+            if self._show_msgbox:
+                messagebox.showinfo('Cancelled', 'The run was cancelled.')
+        else:
             # Show error box on fail
-            err = traceback.format_exc()
-            if show_msgbox:
-                messagebox.showerror('Error', err)
+            self._objects['status_var'].set('Failed.')
+            if self._show_msgbox:
+                messagebox.showerror('Error', value)
 
 
 if __name__ == '__main__':
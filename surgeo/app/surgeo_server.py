@@ -0,0 +1,577 @@
+"""Script containing a local HTTP scoring service."""
+
+import argparse
+import collections
+import concurrent.futures
+import http.server
+import io
+import json
+import queue
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+import pandas as pd
+
+import surgeo
+
+from surgeo.models.base_model import OUTPUT_MODES
+from surgeo.utility.surgeo_exception import SurgeoException
+
+
+# The model class and input columns of each model type (as in the CLI)
+MODEL_TYPES = {
+    'first' : ('FirstNameModel', ['first_name']),
+    'sur'   : ('SurnameModel', ['name']),
+    'geo'   : ('GeocodeModel', ['zcta5']),
+    'surgeo': ('SurgeoModel', ['name', 'zcta5']),
+    'bifsg' : ('BIFSGModel', ['first_name', 'name', 'zcta5']),
+}
+
+# The geography columns that replace "zcta5" at the census tract level
+TRACT_COLUMNS = ['state', 'county', 'tract']
+
+
+class SurgeoServer(object):
+    """A local HTTP service that scores batches of rows with loaded models
+
+    The models are created on first use and kept for the life of the
+    server, so a request pays only for scoring. Requests that arrive
+    within a short window of each other (for the same model) are
+    coalesced into one vectorized get_probabilities() call, and each
+    request gets its own rows of the result back.
+
+    Endpoints:
+
+    * ``POST /score/<type>`` -- score the rows in the body, where type is
+      "first", "sur", "geo", "bifsg", or "surgeo". The body is either JSON
+      (a list of records, or ``{"records": [...]}``) or CSV (with a
+      ``text/csv`` content type), using the CLI's default column names
+      ("first_name", "name", "zcta5", and "state"/"county"/"tract"). The
+      response uses the same format. The query parameters
+      ``census_tract=true`` and ``output=top`` (optionally with
+      ``entropy=true``) select tract geography and the compact output.
+    * ``GET /metrics`` -- request, row, and batch counts, p50/p99 request
+      latency, and throughput as JSON.
+    * ``GET /health`` -- returns ``{"status": "ok"}``.
+
+    Parameters
+    ----------
+    host : str, optional
+        The interface to listen on. Defaults to "127.0.0.1".
+    port : int, optional
+        The port to listen on (0 picks a free port). Defaults to 8000.
+    batch_window : float, optional
+        How long (in seconds) to wait for more requests to join a batch.
+        Defaults to 0.005.
+    max_batch : int, optional
+        Score a batch as soon as it has this many rows. Defaults to 10000.
+    dtype : str, optional
+        The precision of the lookup tables (see the models)
+    cache_entries : int, optional
+        Give the BISG and BIFSG models a result cache of this many entries
+
+    Example
+    -------
+        .. code-block::
+
+            $ surgeo serve --port 8000
+
+            $ curl -d '[{"name": "DIAZ", "zcta5": "65201"}]' \\
+                   localhost:8000/score/surgeo
+
+    """
+
+    def __init__(self,
+                 host='127.0.0.1',
+                 port=8000,
+                 batch_window=0.005,
+                 max_batch=10_000,
+                 dtype='float64',
+                 cache_entries=None):
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.dtype = dtype
+        self.cache_entries = cache_entries
+        self.metrics = ServerMetrics()
+        self._batchers = {}
+        self._lock = threading.Lock()
+        self._http = _HTTPServer((host, port), _ScoreHandler)
+        self._http.surgeo_server = self
+
+    @property
+    def address(self):
+        """The (host, port) the server is listening on"""
+        return self._http.server_address[:2]
+
+    def serve_forever(self):
+        """Handle requests until shutdown() is called"""
+        try:
+            self._http.serve_forever()
+        finally:
+            self.close()
+
+    def shutdown(self):
+        """Stop serve_forever() (from another thread)"""
+        self._http.shutdown()
+
+    def close(self):
+        """Stop the batchers and release the socket"""
+        with self._lock:
+            batchers = list(self._batchers.values())
+            self._batchers.clear()
+        for batcher in batchers:
+            batcher.close()
+        self._http.server_close()
+
+    def score(self, model_type, df, census_tract=False, output='full',
+              entropy=False):
+        """Score a dataframe in the next batch of its model
+
+        Parameters
+        ----------
+        model_type : str
+            "first", "sur", "geo", "bifsg", or "surgeo"
+        df : pd.DataFrame
+            The rows to score, with the model's input columns
+        census_tract : bool, optional
+            Use state/county/tract columns instead of "zcta5"
+        output : str, optional
+            "full" or "top" (see the models' get_probabilities())
+        entropy : bool, optional
+            Add the normalized entropy to "top" output
+
+        Returns
+        -------
+        pd.DataFrame
+            The model's results for the rows
+
+        """
+        start = time.perf_counter()
+        batcher = self._get_batcher(model_type, census_tract, output, entropy)
+        # An empty JSON batch has no columns at all
+        if df.empty and not len(df.columns):
+            df = pd.DataFrame(columns=batcher.columns)
+        missing = [column for column in batcher.columns if column not in df]
+        if missing:
+            raise SurgeoException(
+                f'Columns {missing} not found. Got: {list(df.columns)}.'
+            )
+        result = batcher.submit(df[batcher.columns]).result()
+        self.metrics.record_request(len(df), time.perf_counter() - start)
+        return result
+
+    def _get_batcher(self, model_type, census_tract, output, entropy):
+        """Get the batcher of a model and output mode, creating it once"""
+        if model_type not in MODEL_TYPES:
+            raise SurgeoException(
+                f'"{model_type}" is not valid model type. '
+                f'Please use one of {list(MODEL_TYPES)}.'
+            )
+        if census_tract and model_type not in ('geo', 'surgeo'):
+            raise SurgeoException(
+                f'Census tracts are not supported by the "{model_type}" model.'
+            )
+        # Checked here so that a bad request can't fail a whole batch
+        if output not in OUTPUT_MODES:
+            raise SurgeoException(
+                f'output must be one of {", ".join(OUTPUT_MODES)}, '
+                f'not {output!r}.'
+            )
+        key = (model_type, bool(census_tract), output, bool(entropy))
+        with self._lock:
+            if key not in self._batchers:
+                self._batchers[key] = _MicroBatcher(
+                    self._create_model(model_type, census_tract),
+                    model_type,
+                    census_tract,
+                    {'output': output, 'entropy': bool(entropy)},
+                    self.batch_window,
+                    self.max_batch,
+                    self.metrics,
+                )
+            return self._batchers[key]
+
+    def _create_model(self, model_type, census_tract):
+        """Create a model (the lookup tables are shared between models)"""
+        model_name, _ = MODEL_TYPES[model_type]
+        model_class = getattr(surgeo, model_name)
+        kwargs = {'dtype': self.dtype}
+        if model_type in ('geo', 'surgeo'):
+            kwargs['geo_level'] = 'TRACT' if census_tract else 'ZCTA'
+        if model_type in ('surgeo', 'bifsg') and self.cache_entries:
+            kwargs['cache_entries'] = self.cache_entries
+        return model_class(**kwargs)
+
+
+class ServerMetrics(object):
+    """Thread-safe request, row, and latency counters for /metrics
+
+    Latency percentiles and throughput are computed over the most recent
+    requests (at most history of them, within the last window seconds).
+    """
+
+    def __init__(self, history=10_000, window=60.0):
+        self.window = window
+        self._started = time.monotonic()
+        self._recent = collections.deque(maxlen=history)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.rows = 0
+        self.errors = 0
+        self.batches = 0
+        self.batch_rows = 0
+
+    def record_request(self, rows, seconds):
+        """Count a scored request and its latency"""
+        with self._lock:
+            self.requests += 1
+            self.rows += rows
+            self._recent.append((time.monotonic(), seconds, rows))
+
+    def record_error(self):
+        """Count a failed request"""
+        with self._lock:
+            self.errors += 1
+
+    def record_batch(self, rows):
+        """Count a batch of coalesced requests"""
+        with self._lock:
+            self.batches += 1
+            self.batch_rows += rows
+
+    def snapshot(self):
+        """The metrics as a JSON-serializable dict"""
+        now = time.monotonic()
+        with self._lock:
+            recent = [
+                (seconds, rows)
+                for finished, seconds, rows in self._recent
+                if now - finished <= self.window
+            ]
+            snapshot = {
+                'uptime_seconds': now - self._started,
+                'requests': self.requests,
+                'rows': self.rows,
+                'errors': self.errors,
+                'batches': self.batches,
+                'mean_batch_rows': self.batch_rows / max(self.batches, 1),
+            }
+        latencies = np.array([seconds for seconds, _ in recent])
+        elapsed = min(self.window, snapshot['uptime_seconds']) or 1.0
+        snapshot.update({
+            'latency_p50_ms': _percentile_ms(latencies, 50),
+            'latency_p99_ms': _percentile_ms(latencies, 99),
+            'requests_per_second': len(recent) / elapsed,
+            'rows_per_second': sum(rows for _, rows in recent) / elapsed,
+        })
+        return snapshot
+
+
+class _MicroBatcher(object):
+    """Coalesce concurrent requests for one model into single calls"""
+
+    def __init__(self, model, model_type, census_tract, kwargs, window,
+                 max_rows, metrics):
+        self.model = model
+        self.kwargs = kwargs
+        self.window = window
+        self.max_rows = max_rows
+        self.metrics = metrics
+        _, columns = MODEL_TYPES[model_type]
+        if census_tract:
+            columns = [
+                column for column in columns if column != 'zcta5'
+            ] + TRACT_COLUMNS
+        self.columns = columns
+        self._model_type = model_type
+        self._census_tract = census_tract
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, df):
+        """Queue rows for the next batch, returning a future of the result"""
+        future = concurrent.futures.Future()
+        self._queue.put((df, future))
+        return future
+
+    def close(self):
+        """Score anything queued, then stop the batching thread"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        """Collect requests until the window closes or the batch is full"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            rows = len(item[0])
+            deadline = time.monotonic() + self.window
+            stopping = False
+            while rows < self.max_rows:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                rows += len(item[0])
+            self._score(batch)
+            if stopping:
+                return
+
+    def _score(self, batch):
+        """Score a batch in one call and hand each request its rows"""
+        frames = [df for df, _ in batch]
+        futures = [future for _, future in batch]
+        try:
+            combined = pd.concat(frames, ignore_index=True)
+            result = self._call_model(combined)
+        except Exception as error:
+            if len(batch) == 1:
+                futures[0].set_exception(error)
+                return
+            # Score each request alone so that only a bad one fails
+            for item in batch:
+                self._score([item])
+            return
+        self.metrics.record_batch(len(combined))
+        bounds = np.cumsum([0] + [len(df) for df in frames])
+        for future, start, stop in zip(futures, bounds[:-1], bounds[1:]):
+            future.set_result(result.iloc[start:stop].reset_index(drop=True))
+
+    def _call_model(self, df):
+        """Run the model's get_probabilities() on the input columns"""
+        if not self._census_tract:
+            inputs = [df[column] for column in self.columns]
+            return self.model.get_probabilities(*inputs, **self.kwargs)
+        if self._model_type == 'geo':
+            return self.model.get_probabilities_tract(
+                df[TRACT_COLUMNS],
+                **self.kwargs,
+            )
+        return self.model.get_probabilities(
+            df['name'],
+            df[TRACT_COLUMNS],
+            **self.kwargs,
+        )
+
+
+class _HTTPServer(http.server.ThreadingHTTPServer):
+    """A thread per connection, with room for bursts of connections"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class _ScoreHandler(http.server.BaseHTTPRequestHandler):
+    """Route HTTP requests to the server's batchers and metrics"""
+
+    def do_GET(self):
+        path = urllib.parse.urlsplit(self.path).path
+        if path == '/metrics':
+            self._send_json(200, self.server.surgeo_server.metrics.snapshot())
+        elif path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        else:
+            self._send_json(404, {'error': f'Not found: {path}'})
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        parts = url.path.strip('/').split('/')
+        if len(parts) != 2 or parts[0] != 'score':
+            self._send_json(404, {'error': f'Not found: {url.path}'})
+            return
+        server = self.server.surgeo_server
+        query = urllib.parse.parse_qs(url.query)
+        is_csv = 'csv' in self.headers.get('Content-Type', '')
+        try:
+            df = self._read_body(is_csv)
+            result = server.score(
+                parts[1],
+                df,
+                census_tract=_flag(query, 'census_tract'),
+                output=query.get('output', ['full'])[0],
+                entropy=_flag(query, 'entropy'),
+            )
+        except Exception as error:
+            server.metrics.record_error()
+            # Bad input is the client's error, anything else the server's
+            if isinstance(error, (SurgeoException, ValueError, KeyError)):
+                status = 400
+            else:
+                status = 500
+            self._send_json(status, {'error': str(error)})
+            return
+        if is_csv:
+            self._send(200, 'text/csv', result.to_csv(index=False))
+        else:
+            self._send(200, 'application/json', result.to_json(orient='records'))
+
+    def _read_body(self, is_csv):
+        """Parse the JSON or CSV body into a dataframe"""
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8')
+        if is_csv:
+            # Read every column as text, as the CLI's ZIPs and names are
+            return pd.read_csv(
+                io.StringIO(body),
+                dtype=str,
+                keep_default_na=False,
+                na_values=[''],
+                skip_blank_lines=False,
+            )
+        records = json.loads(body)
+        if isinstance(records, dict):
+            records = records.get('records', [])
+        if not isinstance(records, list) or not all(
+            isinstance(record, dict) for record in records
+        ):
+            raise SurgeoException('Send a list of records as JSON.')
+        df = pd.DataFrame.from_records(records)
+        # Read every column as text, as the CSV body is
+        for column in df.columns:
+            df[column] = pd.Series(
+                [_text_value(column, value) for value in df[column]],
+                dtype=object,
+            )
+        return df
+
+    def _send_json(self, status, content):
+        self._send(status, 'application/json', json.dumps(content))
+
+    def _send(self, status, content_type, text):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Keep request logging off the console"""
+        pass
+
+
+def _flag(query, name):
+    """Read a true/false query parameter"""
+    value = query.get(name, ['false'])[0]
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def _text_value(column, value):
+    """A JSON value as text (None if missing), rejecting lists and objects"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise SurgeoException(
+            f'Column "{column}" has a {type(value).__name__} value. '
+            'Send strings, numbers, or null.'
+        )
+    if isinstance(value, float):
+        if np.isnan(value):
+            return None
+        if value.is_integer():
+            return str(int(value))
+    return str(value)
+
+
+def _percentile_ms(seconds, percentile):
+    """A latency percentile in milliseconds (None without any requests)"""
+    if not len(seconds):
+        return None
+    return float(np.percentile(seconds, percentile) * 1000)
+
+
+class SurgeoServeCLI(object):
+    """Parse the "surgeo serve" arguments and run the server
+
+    Example
+    -------
+        .. code-block::
+
+            $ surgeo serve --help
+
+            usage: surgeo serve [-h] [--host HOST] [--port PORT]
+                                [--batch_window BATCH_WINDOW]
+                                [--max_batch MAX_BATCH]
+                                [--dtype {float64,float32,uint16}]
+                                [--cache_entries CACHE_ENTRIES]
+
+    """
+
+    def __init__(self, argv=None):
+        self._args = self._get_parsed_args(argv)
+
+    def main(self):
+        """Start the server and serve until interrupted"""
+        args = self._args
+        server = SurgeoServer(
+            host=args.host,
+            port=args.port,
+            batch_window=args.batch_window / 1000,
+            max_batch=args.max_batch,
+            dtype=args.dtype,
+            cache_entries=args.cache_entries,
+        )
+        host, port = server.address
+        print(f'Serving surgeo on http://{host}:{port} (Ctrl+C to stop)')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+    def _get_parsed_args(self, argv):
+        """Create an argument parser and parse the serve arguments"""
+        parser = argparse.ArgumentParser(
+            prog='surgeo serve',
+            description='Serve Surgeo models over HTTP.',
+        )
+        parser.add_argument(
+            '--host',
+            default='127.0.0.1',
+            help='The interface to listen on (default 127.0.0.1)',
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=8000,
+            help='The port to listen on (default 8000)',
+        )
+        parser.add_argument(
+            '--batch_window',
+            type=float,
+            default=5.0,
+            help='Milliseconds to wait for requests to coalesce (default 5)',
+        )
+        parser.add_argument(
+            '--max_batch',
+            type=int,
+            default=10_000,
+            help='Score a batch once it has this many rows (default 10000)',
+        )
+        parser.add_argument(
+            '--dtype',
+            choices=['float64', 'float32', 'uint16'],
+            default='float64',
+            help='The precision of the lookup tables (default float64)',
+        )
+        parser.add_argument(
+            '--cache_entries',
+            type=int,
+            help='Cache this many BISG/BIFSG results per model',
+        )
+        return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    SurgeoServeCLI().main()
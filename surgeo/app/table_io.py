@@ -0,0 +1,675 @@
+"""Module containing the file readers and writers used by the CLI and GUI.
+
+CSV files are read and written with pandas. The model input columns are
+read as text by read_inputs() and iter_inputs(), which parse only those
+columns (CSV files with pyarrow's multi-threaded reader when pyarrow is
+installed). XLSX files are streamed with
+openpyxl's read-only and write-only modes, so neither reading nor writing
+builds the whole workbook in memory; rows are parsed the way
+pd.read_excel() parses them, and output longer than a sheet spills onto
+further sheets. Parquet and Arrow IPC (``.arrow``/``.feather``) files are
+read and written with pyarrow, which is optional and only imported when
+one of those files is used. Only the columns a model needs are read from
+XLSX, Parquet, and Arrow files, and each can be read a batch of rows at a
+time (Parquet one row group at a time) so that large files never have to
+fit in memory. Probability columns are written to them as floats, without
+any text formatting.
+
+"""
+
+import pathlib
+
+import pandas as pd
+
+from surgeo.utility.surgeo_exception import SurgeoException
+
+
+CSV_SUFFIXES = ('.csv',)
+
+EXCEL_SUFFIXES = ('.xlsx', '.xls')
+
+# The Excel files read and written with openpyxl
+XLSX_SUFFIXES = ('.xlsx',)
+
+PARQUET_SUFFIXES = ('.parquet',)
+
+ARROW_SUFFIXES = ('.arrow', '.feather')
+
+READ_SUFFIXES = CSV_SUFFIXES + EXCEL_SUFFIXES + PARQUET_SUFFIXES + ARROW_SUFFIXES
+
+WRITE_SUFFIXES = CSV_SUFFIXES + XLSX_SUFFIXES + PARQUET_SUFFIXES + ARROW_SUFFIXES
+
+# The rows of an Excel sheet, including its header
+EXCEL_MAX_ROWS = 1_048_576
+
+# Input columns are read as text, with only empty values missing
+_TEXT_OPTIONS = {'dtype': str, 'keep_default_na': False, 'na_values': ['']}
+
+
+def read_table(path, columns=None):
+    """Read a whole input file into a dataframe
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        A .csv, .xlsx, .xls, .parquet, .arrow, or .feather file
+    columns : list of str, optional
+        The columns needed. Only these are read from XLSX, Parquet, and
+        Arrow files (columns missing from the file are ignored); CSV and
+        XLS files are read whole.
+
+    Returns
+    -------
+    pd.DataFrame
+        The file's data
+
+    """
+    path = pathlib.Path(path)
+    suffix = _check_suffix(path, READ_SUFFIXES)
+    if suffix in EXCEL_SUFFIXES and suffix not in XLSX_SUFFIXES:
+        # openpyxl only reads xlsx, and xlrd only the legacy xls format
+        _import_xlrd(path)
+        return pd.read_excel(path, engine='xlrd')
+    if suffix in CSV_SUFFIXES:
+        return pd.read_csv(path, skip_blank_lines=False)
+    frames = list(iter_table(path, None, columns))
+    return frames[0]
+
+
+def iter_table(path, chunksize, columns=None, dtype=None):
+    """Read an input file as a series of dataframes
+
+    At least one (possibly empty) dataframe is always produced.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        A .csv, .xlsx, .parquet, .arrow, or .feather file
+    chunksize : int or None
+        The number of rows in each dataframe (None for a single dataframe)
+    columns : list of str, optional
+        The columns needed (see read_table())
+    dtype : dict, optional
+        Column dtypes passed to pd.read_csv() for CSV files (and applied
+        the same way to XLSX files)
+
+    Yields
+    ------
+    pd.DataFrame
+        Consecutive blocks of the file's rows
+
+    """
+    path = pathlib.Path(path)
+    suffix = _check_suffix(
+        path,
+        CSV_SUFFIXES + XLSX_SUFFIXES + PARQUET_SUFFIXES + ARROW_SUFFIXES,
+    )
+    if suffix in XLSX_SUFFIXES:
+        yield from _iter_xlsx(path, chunksize, columns, dtype=dtype)
+        return
+    if suffix in CSV_SUFFIXES:
+        reader = pd.read_csv(
+            path,
+            skip_blank_lines=False,
+            chunksize=chunksize,
+            dtype=dtype,
+        )
+        if chunksize is None:
+            yield reader
+            return
+        with reader:
+            yield from reader
+        return
+    pa = _import_pyarrow(path)
+    if suffix in PARQUET_SUFFIXES:
+        import pyarrow.parquet as pq
+        with pq.ParquetFile(path) as parquet_file:
+            schema = parquet_file.schema_arrow
+            selected = _project(schema.names, columns)
+            # Each batch is read from one row group at a time
+            batches = parquet_file.iter_batches(
+                batch_size=chunksize or 65_536,
+                columns=selected,
+            )
+            yield from _to_frames(pa, batches, schema, selected, chunksize)
+    else:
+        with pa.memory_map(str(path)) as source:
+            reader = pa.ipc.open_file(source)
+            selected = _project(reader.schema.names, columns)
+            batches = (
+                reader.get_batch(position).select(selected)
+                for position in range(reader.num_record_batches)
+            )
+            yield from _to_frames(
+                pa,
+                batches,
+                reader.schema,
+                selected,
+                chunksize,
+            )
+
+
+def read_inputs(path, columns):
+    """Read the model input columns of a file as text
+
+    Names, ZIP codes, and census tract codes are identifiers, so they are
+    read as strings: ZIP codes keep their leading zeros, and each column
+    has the same dtype however the file is split into chunks. Only empty
+    values are missing (a surname such as "NA" is kept). Only the given
+    columns are parsed; CSV files are parsed with pyarrow's multi-threaded
+    reader when it is installed.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        A .csv, .xlsx, .xls, .parquet, .arrow, or .feather file
+    columns : list of str or None
+        The input columns (columns missing from the file are ignored), or
+        None for every column
+
+    Returns
+    -------
+    pd.DataFrame
+        The file's input columns, in file order
+
+    """
+    path = pathlib.Path(path)
+    suffix = _check_suffix(path, READ_SUFFIXES)
+    if suffix in EXCEL_SUFFIXES and suffix not in XLSX_SUFFIXES:
+        _import_xlrd(path)
+        return pd.read_excel(
+            path,
+            engine='xlrd',
+            usecols=_usecols(columns),
+            **_TEXT_OPTIONS,
+        )
+    frames = list(iter_inputs(path, None, columns))
+    return frames[0]
+
+
+def iter_inputs(path, chunksize, columns):
+    """Read the model input columns of a file as a series of dataframes
+
+    The columns are read as text, as read_inputs() reads them. Parquet and
+    Arrow files keep the types of their schema. At least one (possibly
+    empty) dataframe is always produced.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        A .csv, .xlsx, .parquet, .arrow, or .feather file
+    chunksize : int or None
+        The number of rows in each dataframe (None for a single dataframe)
+    columns : list of str or None
+        The input columns (see read_inputs())
+
+    Yields
+    ------
+    pd.DataFrame
+        Consecutive blocks of the file's rows
+
+    """
+    path = pathlib.Path(path)
+    suffix = _check_suffix(
+        path,
+        CSV_SUFFIXES + XLSX_SUFFIXES + PARQUET_SUFFIXES + ARROW_SUFFIXES,
+    )
+    if suffix in CSV_SUFFIXES:
+        yield from _iter_csv_inputs(path, chunksize, columns)
+    elif suffix in XLSX_SUFFIXES:
+        yield from _iter_xlsx(path, chunksize, columns, **_TEXT_OPTIONS)
+    else:
+        yield from iter_table(path, chunksize, columns)
+
+
+def estimate_rows(path):
+    """Estimate the number of rows of an input file without reading it
+
+    Parquet and Arrow files record their row counts, and XLSX sheets
+    their dimensions (which may include trailing empty rows). The lines of
+    a CSV file are counted, which overcounts values with quoted line
+    breaks. XLS files are not counted.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        A .csv, .xlsx, .xls, .parquet, .arrow, or .feather file
+
+    Returns
+    -------
+    int or None
+        The number of rows (None for XLS files and XLSX files that do not
+        record their dimensions)
+
+    """
+    path = pathlib.Path(path)
+    suffix = _check_suffix(path, READ_SUFFIXES)
+    if suffix in CSV_SUFFIXES:
+        lines = 0
+        last = b'\n'
+        with open(path, 'rb') as csv_file:
+            for block in iter(lambda: csv_file.read(2 ** 20), b''):
+                lines += block.count(b'\n')
+                last = block[-1:]
+        # A last line without a line break, less the header
+        if last != b'\n':
+            lines += 1
+        return max(lines - 1, 0)
+    if suffix in XLSX_SUFFIXES:
+        import openpyxl
+        workbook = openpyxl.load_workbook(path, read_only=True)
+        try:
+            rows = workbook.worksheets[0].max_row if workbook.worksheets else 0
+        finally:
+            workbook.close()
+        return None if rows is None else max(rows - 1, 0)
+    if suffix in EXCEL_SUFFIXES:
+        return None
+    pa = _import_pyarrow(path)
+    if suffix in PARQUET_SUFFIXES:
+        import pyarrow.parquet as pq
+        with pq.ParquetFile(path) as parquet_file:
+            return parquet_file.metadata.num_rows
+    with pa.memory_map(str(path)) as source:
+        reader = pa.ipc.open_file(source)
+        return sum(
+            reader.get_batch(position).num_rows
+            for position in range(reader.num_record_batches)
+        )
+
+
+class TableWriter(object):
+    """Write dataframes one after another to a single output file
+
+    CSV output is appended to, with the header written once. XLSX output
+    is streamed to a write-only workbook; once a sheet is full (see
+    EXCEL_MAX_ROWS) the rows continue on a new sheet with the same header.
+    Parquet and Arrow output is written one record batch (or row group)
+    per dataframe with the schema of the first dataframe.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        A .csv, .xlsx, .parquet, .arrow, or .feather file
+
+    Example
+    -------
+        .. code-block:: python
+
+            with TableWriter('output.parquet') as writer:
+                for chunk in chunks:
+                    writer.write(chunk)
+
+    """
+
+    def __init__(self, path):
+        self._path = pathlib.Path(path)
+        self._suffix = _check_suffix(
+            self._path,
+            CSV_SUFFIXES + XLSX_SUFFIXES + PARQUET_SUFFIXES + ARROW_SUFFIXES,
+        )
+        self._writer = None
+        self._schema = None
+        self._sheet = None
+        self._sheet_rows = 0
+        if self._suffix not in CSV_SUFFIXES + XLSX_SUFFIXES:
+            self._pa = _import_pyarrow(self._path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, df):
+        """Append a dataframe to the output"""
+        if self._suffix in CSV_SUFFIXES:
+            header = self._writer is None
+            if header:
+                # Written the same way DataFrame.to_csv() opens a path
+                self._writer = open(
+                    self._path, 'w', newline='', encoding='utf-8'
+                )
+            df.to_csv(self._writer, header=header, index=False)
+            return
+        if self._suffix in XLSX_SUFFIXES:
+            self._write_xlsx(df)
+            return
+        pa = self._pa
+        table = pa.Table.from_pandas(
+            df,
+            schema=self._schema,
+            preserve_index=False,
+        )
+        if self._writer is None:
+            self._schema = table.schema
+            if self._suffix in PARQUET_SUFFIXES:
+                import pyarrow.parquet as pq
+                self._writer = pq.ParquetWriter(self._path, self._schema)
+            else:
+                self._writer = pa.ipc.new_file(str(self._path), self._schema)
+        self._writer.write_table(table)
+
+    def _write_xlsx(self, df):
+        """Append a dataframe's rows to the sheets of an XLSX output"""
+        if self._writer is None:
+            import openpyxl
+            self._writer = openpyxl.Workbook(write_only=True)
+            self._schema = [str(column) for column in df.columns]
+            self._add_sheet()
+        # Missing values are written as empty cells
+        values = df.astype(object).where(df.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            if self._sheet_rows == EXCEL_MAX_ROWS:
+                self._add_sheet()
+            self._sheet.append(row)
+            self._sheet_rows += 1
+
+    def _add_sheet(self):
+        """Start a new sheet (Sheet1, Sheet2, ...) with the header"""
+        number = len(self._writer.worksheets) + 1
+        self._sheet = self._writer.create_sheet(f'Sheet{number}')
+        self._sheet.append(self._schema)
+        self._sheet_rows = 1
+
+    def close(self):
+        """Finish and close the output file"""
+        if self._writer is not None:
+            if self._suffix in XLSX_SUFFIXES:
+                self._writer.save(self._path)
+                self._sheet = None
+            else:
+                self._writer.close()
+            self._writer = None
+
+
+def write_table(df, path):
+    """Write a whole dataframe to a .csv, .xlsx, .parquet, or .arrow file"""
+    path = pathlib.Path(path)
+    suffix = _check_suffix(path, WRITE_SUFFIXES)
+    if suffix in CSV_SUFFIXES:
+        df.to_csv(path, index=False)
+    else:
+        with TableWriter(path) as writer:
+            writer.write(df)
+
+
+class _IrregularRows(Exception):
+    """Raised when pyarrow meets a row pandas would read differently"""
+
+
+def _iter_csv_inputs(path, chunksize, columns):
+    """Read the input columns of a CSV file as text (see iter_inputs())
+
+    pyarrow parses the file if it is installed. If it meets a row that it
+    cannot read the way pandas does (e.g. a row with too few values, which
+    pandas fills with missing values), the file is read again with pandas
+    from the first row not yet produced.
+    """
+    selected = _csv_header(path, columns)
+    produced = 0
+    pa = _optional_pyarrow()
+    if pa is not None and selected:
+        try:
+            for frame in _iter_csv_arrow(pa, path, chunksize, selected):
+                yield frame
+                produced += len(frame)
+            return
+        except _IrregularRows:
+            pass
+    reader = pd.read_csv(
+        path,
+        usecols=_usecols(columns),
+        skip_blank_lines=False,
+        chunksize=chunksize,
+        **_TEXT_OPTIONS,
+    )
+    if chunksize is None:
+        yield reader
+        return
+    with reader:
+        for frame in reader:
+            # Skip the chunks pyarrow already produced
+            if produced:
+                produced -= len(frame)
+                continue
+            yield frame
+
+
+def _iter_csv_arrow(pa, path, chunksize, selected):
+    """Read columns of a CSV file as text with pyarrow's CSV reader"""
+    import pyarrow.csv
+    irregular = []
+
+    def invalid_row(row):
+        irregular.append(row.number)
+        return 'skip'
+
+    options = {
+        'read_options': pyarrow.csv.ReadOptions(use_threads=True),
+        'parse_options': pyarrow.csv.ParseOptions(
+            newlines_in_values=True,
+            ignore_empty_lines=False,
+            invalid_row_handler=invalid_row,
+        ),
+        'convert_options': pyarrow.csv.ConvertOptions(
+            include_columns=selected,
+            column_types={column: pa.string() for column in selected},
+            null_values=[''],
+            strings_can_be_null=True,
+        ),
+    }
+    if chunksize is None:
+        table = pyarrow.csv.read_csv(path, **options)
+        if irregular:
+            raise _IrregularRows()
+        yield table.to_pandas()
+        return
+
+    def batches(reader):
+        # Stop before any batch that follows an irregular row
+        for batch in reader:
+            if irregular:
+                raise _IrregularRows()
+            yield batch
+        if irregular:
+            raise _IrregularRows()
+
+    with pyarrow.csv.open_csv(path, **options) as reader:
+        yield from _to_frames(
+            pa,
+            batches(reader),
+            reader.schema,
+            selected,
+            chunksize,
+        )
+
+
+def _csv_header(path, columns):
+    """The needed columns of a CSV file's header, in file order
+
+    Returns None if the header repeats a name (pandas renames repeats) or
+    cannot be read.
+    """
+    import csv
+    try:
+        with open(path, newline='', encoding='utf-8-sig') as csv_file:
+            header = next(csv.reader(csv_file), [])
+    except (OSError, UnicodeDecodeError, csv.Error):
+        return None
+    if len(set(header)) < len(header):
+        return None
+    return _project(header, columns)
+
+
+def _iter_xlsx(path, chunksize, columns, **options):
+    """Read the first sheet of an XLSX file as a series of dataframes
+
+    The rows are streamed from a read-only workbook and parsed as
+    pd.read_excel() parses them (see _xlsx_rows()), chunksize rows at a
+    time, with any parser options (e.g. dtype). Cells to the right of the
+    header are ignored.
+    """
+    from pandas.io.parsers import TextParser
+    import openpyxl
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = _xlsx_rows(workbook)
+        header = next(rows, None)
+        if header is None:
+            yield pd.DataFrame()
+            return
+        # Only the needed columns are parsed
+        if columns is None:
+            positions = list(range(len(header)))
+        else:
+            positions = [
+                position for position, name in enumerate(header)
+                if name in columns
+            ]
+        width = len(header)
+
+        def parse(block):
+            data = [[header[position] for position in positions]]
+            for row in block:
+                row = row + [''] * (width - len(row))
+                data.append([row[position] for position in positions])
+            parser = TextParser(
+                data,
+                header=0,
+                skip_blank_lines=False,
+                **options,
+            )
+            return parser.read()
+
+        block = []
+        produced = False
+        for row in rows:
+            block.append(row)
+            if chunksize is not None and len(block) == chunksize:
+                yield parse(block)
+                produced = True
+                block = []
+        # The final partial chunk (or the only frame, or an empty frame)
+        if block or not produced:
+            yield parse(block)
+    finally:
+        workbook.close()
+
+
+def _xlsx_rows(workbook):
+    """The rows of a workbook's first sheet as pd.read_excel() reads them
+
+    Cells are converted as pandas converts them: empty cells to "", errors
+    to NaN, and whole numbers to ints. Trailing empty cells and trailing
+    empty rows are dropped, and empty rows between others are kept.
+    """
+    from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+    if not workbook.worksheets:
+        return
+    sheet = workbook.worksheets[0]
+    # The recorded dimensions may be wrong
+    sheet.reset_dimensions()
+    empty_rows = 0
+    for cells in sheet.rows:
+        row = []
+        for cell in cells:
+            value = cell.value
+            if value is None:
+                value = ''
+            elif cell.data_type == TYPE_ERROR:
+                value = float('nan')
+            elif cell.data_type == TYPE_NUMERIC:
+                whole = int(value)
+                value = whole if whole == value else float(value)
+            row.append(value)
+        while row and row[-1] == '':
+            row.pop()
+        # Empty rows are only kept once a row with data follows them
+        if not row:
+            empty_rows += 1
+            continue
+        for _ in range(empty_rows):
+            yield []
+        empty_rows = 0
+        yield row
+
+
+def _check_suffix(path, suffixes):
+    """Return the file's suffix, raising an error if it is not supported"""
+    suffix = path.suffix.lower()
+    if suffix not in suffixes:
+        raise SurgeoException(
+            f'File ending for "{path}" not recognized. '
+            f'Please use one of {", ".join(suffixes)}.'
+        )
+    return suffix
+
+
+def _import_pyarrow(path):
+    """Import pyarrow, which is only needed for Parquet and Arrow files"""
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+    except ImportError:
+        raise SurgeoException(
+            f'Reading or writing "{path}" requires pyarrow. '
+            'Install it with "pip install pyarrow".'
+        )
+    return pa
+
+
+def _import_xlrd(path):
+    """Import xlrd, which is only needed for legacy XLS files"""
+    try:
+        import xlrd
+    except ImportError:
+        raise SurgeoException(
+            f'Reading "{path}" requires xlrd. Install it with '
+            '"pip install xlrd", or save the file as .xlsx or .csv.'
+        )
+    return xlrd
+
+
+def _usecols(columns):
+    """The usecols argument of pandas' readers for the needed columns"""
+    if columns is None:
+        return None
+    return lambda name: name in columns
+
+
+def _optional_pyarrow():
+    """Import pyarrow if it is installed (None if not)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.csv
+    except ImportError:
+        return None
+    return pa
+
+
+def _project(names, columns):
+    """The file's columns that are needed, in file order"""
+    if columns is None:
+        return list(names)
+    return [name for name in names if name in columns]
+
+
+def _to_frames(pa, batches, schema, selected, chunksize):
+    """Regroup record batches into dataframes of chunksize rows"""
+    # Every frame is converted with the same (projected) schema
+    target = pa.schema([schema.field(name) for name in selected])
+    pending = target.empty_table()
+    produced = False
+    for batch in batches:
+        pending = pa.concat_tables([
+            pending,
+            pa.Table.from_batches([batch]).cast(target),
+        ])
+        while chunksize is not None and pending.num_rows >= chunksize:
+            yield pending.slice(0, chunksize).to_pandas()
+            produced = True
+            pending = pending.slice(chunksize)
+    # The final partial chunk (or the only frame, or an empty frame)
+    if pending.num_rows or not produced:
+        yield pending.to_pandas()
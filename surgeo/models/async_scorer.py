@@ -0,0 +1,233 @@
+"""Contains an asyncio scorer that batches single-record requests.
+
+Scoring one record at a time through get_probabilities() pays the full
+pandas overhead per record and blocks the event loop. AsyncScorer queues
+each record, flushes the queue as one batch once it holds max_batch
+records or the oldest has waited max_wait seconds, scores the batch with
+the model's score_arrays() in an executor, and resolves each caller's
+future with its own row.
+
+"""
+
+import asyncio
+import inspect
+
+import numpy as np
+
+from surgeo.models.lookup_index import TRACT_PARTS, tract_keys
+from surgeo.utility.surgeo_exception import SurgeoException
+
+
+class AsyncScorer(object):
+    """Score single records from coroutines in vectorized batches.
+
+    Parameters
+    ----------
+    model : surgeo model
+        Any of the surgeo models (anything with score_arrays())
+    max_batch : int, optional
+        Flush a batch as soon as it has this many records. Defaults to 1000.
+    max_wait : float, optional
+        The longest (in seconds) a record waits for its batch to fill.
+        Defaults to 0.005.
+    max_pending : int, optional
+        The most records that can be queued. Once the queue is full,
+        score() waits for room, which pushes back on callers. Defaults to
+        10000.
+    executor : concurrent.futures.Executor, optional
+        Where batches are scored. Defaults to the event loop's default
+        executor.
+
+    Attributes
+    ----------
+    batches : int
+        The number of batches scored
+    records : int
+        The number of records scored
+
+    Example
+    -------
+        .. code-block:: python
+
+            scorer = AsyncScorer(surgeo.BIFSGModel())
+
+            async def handle(application):
+                return await scorer.score(
+                    application.first_name,
+                    application.surname,
+                    application.zip_code,
+                )
+
+    """
+
+    def __init__(self,
+                 model,
+                 max_batch=1_000,
+                 max_wait=0.005,
+                 max_pending=10_000,
+                 executor=None):
+        for name, value in [('max_batch', max_batch),
+                            ('max_pending', max_pending)]:
+            if not isinstance(value, int) or value < 1:
+                raise SurgeoException(
+                    f'{name} must be a positive integer, not {value!r}.'
+                )
+        if max_wait < 0:
+            raise SurgeoException(
+                f'max_wait must not be negative, not {max_wait!r}.'
+            )
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self.executor = executor
+        self.batches = 0
+        self.records = 0
+        self._races = list(model.races)
+        # One value per score_arrays() argument, checked per record (a
+        # batch that fails anyway is rescored one record at a time)
+        self._arity = len(inspect.signature(model.score_arrays).parameters)
+        self._queue = None
+        self._task = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def score(self, *values):
+        """Score one record
+
+        Parameters
+        ----------
+        *values
+            One value per argument of the model's score_arrays() (e.g. a
+            surname and a ZIP code for a SurgeoModel). A census tract is a
+            (state, county, tract) tuple or a GEOID, and the two forms may
+            be mixed between records.
+
+        Returns
+        -------
+        dict
+            The probability of each race (NaN if the record was not found)
+
+        """
+        if len(values) != self._arity:
+            raise SurgeoException(
+                f'Expected {self._arity} values per record, got {len(values)}.'
+            )
+        self._start()
+        future = asyncio.get_running_loop().create_future()
+        # Waits here while max_pending records are queued
+        await self._queue.put((values, future))
+        return await future
+
+    async def aclose(self):
+        """Score any queued records, then stop the batching task"""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    def _start(self):
+        """Create the queue and batching task in the running loop"""
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        """Collect records until a batch is full or has waited max_wait"""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = loop.time() + self.max_wait
+            stopping = False
+            while len(batch) < self.max_batch:
+                # Take queued records at once, then wait out the deadline
+                if not self._queue.empty():
+                    item = self._queue.get_nowait()
+                else:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(
+                            self._queue.get(),
+                            timeout,
+                        )
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._score(loop, batch)
+            if stopping:
+                return
+
+    async def _score(self, loop, batch):
+        """Score a batch in the executor and resolve its futures"""
+        rows = [values for values, _ in batch]
+        futures = [future for _, future in batch]
+        try:
+            probs, _ = await loop.run_in_executor(
+                self.executor,
+                self._score_rows,
+                rows,
+            )
+        except Exception as error:
+            if len(batch) == 1:
+                if not futures[0].done():
+                    futures[0].set_exception(error)
+                return
+            # Score each record alone so that only a malformed one fails
+            for item in batch:
+                await self._score(loop, [item])
+            return
+        self.batches += 1
+        self.records += len(rows)
+        for future, row in zip(futures, probs.tolist()):
+            # Skip callers that have given up (e.g. been cancelled)
+            if not future.done():
+                future.set_result(dict(zip(self._races, row)))
+
+    def _score_rows(self, rows):
+        """Transpose records into arrays and score them (in the executor)"""
+        inputs = []
+        for column in zip(*rows):
+            if any(isinstance(value, tuple) for value in column):
+                inputs.append(self._tract_parts(column))
+            else:
+                inputs.append(np.array(column, dtype=object))
+        return self.model.score_arrays(*inputs)
+
+    @staticmethod
+    def _tract_parts(column):
+        """State, county, and tract arrays of a column of census tracts
+
+        Callers may mix (state, county, tract) tuples and GEOIDs in one
+        batch, so each GEOID is split into its zero-padded parts (missing
+        if unparseable).
+        """
+        parts = [np.empty(len(column), dtype=object) for _ in TRACT_PARTS]
+        geoids = [
+            position for position, value in enumerate(column)
+            if not isinstance(value, tuple)
+        ]
+        if geoids:
+            _, padded_parts = tract_keys([
+                np.array([column[position] for position in geoids], dtype=object)
+            ])
+            for part, padded in zip(parts, padded_parts):
+                part[geoids] = padded.to_numpy(dtype=object)
+        for position, value in enumerate(column):
+            if isinstance(value, tuple):
+                for part, code in zip(parts, value):
+                    part[position] = code
+        return tuple(parts)
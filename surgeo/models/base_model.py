@@ -1,12 +1,142 @@
 """Contains the base model for First Name, Surname, Geocode, BIFSG, and Surgeo models."""
 
+import concurrent.futures
+import contextlib
+import os
 import pathlib
-import string
 import sys
+import threading
 
 import numpy as np
 import pandas as pd
 
+from surgeo.models.lookup_index import NameIndex
+from surgeo.models.lookup_index import TRACT_PARTS
+from surgeo.models.lookup_index import TractIndex
+from surgeo.models.lookup_index import ZctaIndex
+from surgeo.models.lookup_index import tract_keys
+from surgeo.models.lookup_index import check_dtype
+from surgeo.models.lookup_index import zcta_keys
+from surgeo.models.kernels import combine_probabilities
+from surgeo.models.kernels import top_race
+from surgeo.models.result_cache import ResultCache
+from surgeo.utility import normalize
+from surgeo.utility import table_cache
+from surgeo.utility.profiling import StageProfiler
+from surgeo.utility.surgeo_exception import SurgeoException
+
+
+class TableRegistry(object):
+    """Process-wide store of lookup tables shared by every model instance.
+
+    Each table is loaded at most once per process, no matter how many
+    models use it. Tables are stored read-only, and every caller receives
+    a shallow view of the stored table, so one model cannot modify the
+    data another model sees. Call clear() to release the tables (e.g.
+    after the data files change); they are reloaded on next use.
+
+    """
+
+    def __init__(self):
+        self._tables = {}
+        self._lock = threading.RLock()
+
+    def get(self, key, load):
+        """Return the table stored under key, loading it on first use
+
+        Parameters
+        ----------
+        key : hashable
+            A key identifying the table (e.g. the path of its data file)
+        load : callable
+            A zero-argument function returning the table if it is absent
+
+        Returns
+        -------
+        object
+            A read-only view of the table
+
+        """
+        with self._lock:
+            try:
+                table = self._tables[key]
+            except KeyError:
+                table = _freeze(load())
+                self._tables[key] = table
+        return _view(table)
+
+    def clear(self):
+        """Drop every stored table"""
+        with self._lock:
+            self._tables.clear()
+
+    def __contains__(self, key):
+        return key in self._tables
+
+    def __len__(self):
+        return len(self._tables)
+
+
+TABLE_REGISTRY = TableRegistry()
+
+
+def clear_table_registry():
+    """Release every lookup table held by the process-wide registry"""
+    TABLE_REGISTRY.clear()
+
+
+def _freeze(table):
+    """Make a lookup dataframe's values read-only"""
+    if not isinstance(table, pd.DataFrame):
+        return table
+    if not all(pd.api.types.is_float_dtype(dtype) for dtype in table.dtypes):
+        return table
+    values = table.to_numpy(dtype=np.float64, copy=True)
+    values.flags.writeable = False
+    frozen = pd.DataFrame(
+        values,
+        index=table.index,
+        columns=table.columns,
+        copy=False,
+    )
+    return frozen
+
+
+def _view(table):
+    """Hand out a new dataframe object sharing the stored data"""
+    if isinstance(table, pd.DataFrame):
+        return table.copy(deep=False)
+    return table
+
+
+# What get_probabilities() returns: every race's probability, or only the
+# most likely race, its probability, and optionally the row's entropy
+OUTPUT_MODES = ('full', 'top')
+
+# What a stage is timed with when the model has no profiler
+_NO_STAGE = contextlib.nullcontext()
+
+# The model each worker process scores its blocks with (see _map_blocks)
+_WORKER_MODEL = None
+
+
+def _init_worker(model_type, kwargs):
+    """Create the model of a worker process (once per worker)"""
+    global _WORKER_MODEL
+    _WORKER_MODEL = model_type(**kwargs)
+
+
+def _score_block(method_name, inputs, kwargs):
+    """Score one block of rows with the worker's model"""
+    return getattr(_WORKER_MODEL, method_name)(*inputs, **kwargs)
+
+
+def _slice_rows(values, start, stop):
+    """Take a contiguous block of rows from a Series, DataFrame, or array"""
+    if hasattr(values, 'iloc'):
+        return values.iloc[start:stop]
+    return values[start:stop]
+
 
 class BaseModel(object):
     """Base class for the first name, surname, geocode, bifsg, and
@@ -17,8 +147,15 @@ class BaseModel(object):
     of responsibility for the subclass. This base class does the following
     operations:
 
-    1. Creating functions to provide lookup dataframes; and,
-    2. Housing normalization routines for dirty ZIP code and name data.
+    1. Creating functions to provide lookup dataframes, which are read from
+       a compiled cache of the CSVs in ``surgeo/data`` when it is current
+       and are shared by all models through the process-wide
+       TABLE_REGISTRY; and,
+    2. Housing normalization routines for dirty ZIP code and name data; and,
+    3. Scoring large inputs in contiguous blocks on a pool of worker
+       processes (the ``n_jobs`` argument of the models'
+       ``get_probabilities()``). Each worker builds its own model once,
+       and the pool is kept until close() is called.
 
     Note
     ----
@@ -43,7 +180,9 @@ class BaseModel(object):
 
     """
 
-    def __init__(self):
+    def __init__(self, dtype='float64'):
+        # Storage precision of the lookup tables (see lookup_index)
+        self.dtype = check_dtype(dtype)
         # https://cx-freeze.readthedocs.io/en/latest/faq.html#using-data-files
         # If it's frozen, we can't use __file__
         if getattr(sys, 'frozen', False):
@@ -53,103 +192,381 @@ class BaseModel(object):
         else:
             # The application is not frozen
             self._package_root = pathlib.Path(__file__).parents[1]
+        # Worker pool for n_jobs != 1 (created on first use)
+        self._executor = None
+        self._executor_workers = None
+        # The data files the lookup tables come from (see data_files), and
+        # the tables and indexes loaded from them (see memory_usage())
+        self._data_files = set()
+        self._tables = {}
+        # Times the scoring stages when set (see profile())
+        self.profiler = None
+
+    @property
+    def data_files(self):
+        """The paths of the data files the model's lookup tables came from"""
+        return sorted(self._data_files)
+
+    def memory_usage(self):
+        """The memory used by each of the model's lookup tables
+
+        The tables are shared through the process-wide TABLE_REGISTRY, so
+        models using the same tables (at the same precision) share this
+        memory rather than adding to it. The result cache, if any, is
+        included as "result_cache".
+
+        Returns
+        -------
+        pd.Series
+            The bytes used by each table, indexed by data file name
+
+        """
+        usage = {}
+        for (file_name, _), table in self._tables.items():
+            if isinstance(table, pd.DataFrame):
+                nbytes = table.memory_usage(index=True, deep=True).sum()
+            else:
+                nbytes = table.nbytes
+            usage[file_name] = usage.get(file_name, 0) + int(nbytes)
+        if getattr(self, 'result_cache', None) is not None:
+            usage['result_cache'] = self.result_cache.nbytes
+        return pd.Series(usage, dtype=np.int64, name='bytes')
+
+    @contextlib.contextmanager
+    def profile(self, profiler=None):
+        """Time the scoring stages of the model within a with block
+
+        Each stage (e.g. normalizing the names or combining the components)
+        is recorded by the profiler (see surgeo.utility.profiling).
+
+        Parameters
+        ----------
+        profiler : surgeo.utility.profiling.StageProfiler, optional
+            The profiler to record to (a new one without memory tracing if
+            None)
+
+        Yields
+        ------
+        surgeo.utility.profiling.StageProfiler
+            The profiler
+
+        """
+        previous = self.profiler
+        self.profiler = profiler or StageProfiler()
+        try:
+            with self.profiler:
+                yield self.profiler
+        finally:
+            self.profiler = previous
+
+    def _stage(self, name, rows=None):
+        """A context manager timing one stage (doing nothing unprofiled)"""
+        if self.profiler is None:
+            return _NO_STAGE
+        return self.profiler.stage(name, rows)
+
+    def close(self):
+        """Shut down the worker processes used for n_jobs, if any"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+            self._executor_workers = None
+
+    def _worker_kwargs(self):
+        """Keyword arguments that recreate this model in a worker"""
+        return {'dtype': self.dtype}
+
+    def _map_blocks(self, method_name, inputs, n_jobs, **kwargs):
+        """Run a scoring method over contiguous blocks in worker processes
+
+        The rows of the inputs are split into one contiguous block per
+        worker, each block is scored by the worker's own copy of the model,
+        and the results are concatenated back in the original row order.
+        Keyword arguments are passed on to the method.
+        """
+        workers = self._resolve_n_jobs(n_jobs)
+        row_count = len(inputs[0])
+        block_count = min(workers, row_count)
+        # Nothing to share out, so skip the pool
+        if block_count <= 1:
+            return getattr(self, method_name)(*inputs, **kwargs)
+        bounds = np.linspace(0, row_count, block_count + 1).astype(np.int64)
+        blocks = [
+            tuple(_slice_rows(values, start, stop) for values in inputs)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+        executor = self._get_executor(workers)
+        results = executor.map(
+            _score_block,
+            [method_name] * len(blocks),
+            blocks,
+            [kwargs] * len(blocks),
+        )
+        return pd.concat(list(results))
+
+    def _get_executor(self, workers):
+        """Get the worker pool, (re)starting it for a new worker count"""
+        if self._executor_workers != workers:
+            self.close()
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(type(self), self._worker_kwargs()),
+            )
+            self._executor_workers = workers
+        return self._executor
+
+    @staticmethod
+    def _check_output(output):
+        """Raise an error unless output is a known output mode"""
+        if output not in OUTPUT_MODES:
+            raise SurgeoException(
+                f'output must be one of {", ".join(OUTPUT_MODES)}, '
+                f'not {output!r}.'
+            )
+
+    @staticmethod
+    def _top_race_frame(probs, races, index, entropy=False):
+        """Reduce (N, 6) probabilities to the compact 'top' output columns
+
+        'race' is a categorical of the races (stored as int8 codes, and
+        missing if every probability is), 'probability' is the race's
+        probability, and 'entropy' (if requested) is the normalized
+        entropy of the row.
+        """
+        codes, top_probs, entropies = top_race(probs, entropy=entropy)
+        columns = {
+            'race': pd.Categorical.from_codes(codes, categories=list(races)),
+            'probability': top_probs,
+        }
+        if entropy:
+            columns['entropy'] = entropies
+        return pd.DataFrame(columns, index=index)
+
+    @staticmethod
+    def _resolve_n_jobs(n_jobs):
+        """Convert n_jobs (a positive count, or -1 for every core) to a count"""
+        if n_jobs == -1:
+            return os.cpu_count() or 1
+        if isinstance(n_jobs, int) and n_jobs >= 1:
+            return n_jobs
+        raise SurgeoException(
+            f'n_jobs must be a positive integer or -1, not {n_jobs!r}.'
+        )
 
     def _get_prob_race_given_zcta(self):
         """Create dataframe of race probs given ZCTA (for Geo)"""
-        prob_race_given_zcta = pd.read_csv(
-            self._package_root / 'data' / 'prob_race_given_zcta_2010.csv',
-            index_col='zcta5',
-            na_values=[''],
-            keep_default_na=False,
-        )
-        # Convert geocode zip codes to 00000-formatted strings
-        prob_race_given_zcta.index = (
-            prob_race_given_zcta.index.astype('str')
-                                .str.zfill(5)
+        return self._load_table(
+            'prob_race_given_zcta_2010.csv',
+            self._read_zcta_csv,
         )
-        return prob_race_given_zcta
-        
-    def _get_prob_race_given_tract(self):
-        prob_race_given_tract = pd.read_csv(
-            self._package_root / 'data' / 'prob_race_given_tract_2010.csv',
-            na_values=[''],
-            keep_default_na=False,
-            dtype={'state':str,'county':str,'tract':str}
-        ).set_index(['state','county','tract'])
-        return prob_race_given_tract
 
+    def _get_prob_race_given_tract(self):
+        """Create dataframe of race probs given State/County/Tract"""
+        return self._load_table(
+            'prob_race_given_tract_2010.csv',
+            self._read_tract_csv,
+        )
 
     def _get_prob_zcta_given_race(self):
         """Create dataframe of ZCTA ratios given a race (for SurGeo)"""
-        prob_zcta_given_race = pd.read_csv(
-            self._package_root / 'data' / 'prob_zcta_given_race_2010.csv',
-            index_col='zcta5',
-            na_values=[''],
-            keep_default_na=False,
-        )
-        # Convert geocode zip codes to 00000-formatted strings
-        prob_zcta_given_race.index = (
-            prob_zcta_given_race.index.astype('str')
-                                .str.zfill(5)
+        return self._load_table(
+            'prob_zcta_given_race_2010.csv',
+            self._read_zcta_csv,
         )
-        return prob_zcta_given_race
 
     def _get_prob_race_given_surname(self):
         """Create dataframe of race probabilities given surnames (for Sur)"""
-        # Create surname df (beware ... some NA values like "NAN" are names)
-        prob_race_given_surname = pd.read_csv(
-            self._package_root / 'data' / 'prob_race_given_surname_2010.csv',
-            index_col='name',
-            na_values=[''],
-            keep_default_na=False,
+        return self._load_table(
+            'prob_race_given_surname_2010.csv',
+            self._read_name_csv,
         )
-        return prob_race_given_surname
 
     def _get_prob_race_given_first_name(self):
         """Create dataframe of race probabilities given first names (for First)"""
-        # Create first name df (beware ... some NA values like "NAN" are names)
-        prob_race_given_first_name = pd.read_csv(
-            self._package_root / 'data' / 'prob_race_given_first_name_harvard.csv',
-            index_col='name',
-            na_values=[''],
-            keep_default_na=False,
+        return self._load_table(
+            'prob_race_given_first_name_harvard.csv',
+            self._read_name_csv,
         )
-        return prob_race_given_first_name
 
     def _get_prob_first_name_given_race(self):
         """Create dataframe of first name ratios given a race (for BIFSG)"""
-        prob_first_name_given_race = pd.read_csv(
-            self._package_root / 'data' / 'prob_first_name_given_race_harvard.csv',
+        return self._load_table(
+            'prob_first_name_given_race_harvard.csv',
+            self._read_name_csv,
+        )
+
+    def _get_race_given_zcta_index(self):
+        """Create a direct-addressed index of race probs given ZCTA"""
+        return self._load_index(
+            'prob_race_given_zcta_2010.csv',
+            self._read_zcta_csv,
+            ZctaIndex,
+        )
+
+    def _get_zcta_given_race_index(self):
+        """Create a direct-addressed index of ZCTA ratios given a race"""
+        return self._load_index(
+            'prob_zcta_given_race_2010.csv',
+            self._read_zcta_csv,
+            ZctaIndex,
+        )
+
+    def _get_race_given_tract_index(self):
+        """Create a sorted GEOID index of race probs given State/County/Tract"""
+        return self._load_index(
+            'prob_race_given_tract_2010.csv',
+            self._read_tract_csv,
+            TractIndex,
+        )
+
+    def _get_race_given_surname_index(self):
+        """Create a sorted name index of race probabilities given surnames"""
+        return self._load_index(
+            'prob_race_given_surname_2010.csv',
+            self._read_name_csv,
+            NameIndex,
+        )
+
+    def _get_race_given_first_name_index(self):
+        """Create a sorted name index of race probs given first names"""
+        return self._load_index(
+            'prob_race_given_first_name_harvard.csv',
+            self._read_name_csv,
+            NameIndex,
+        )
+
+    def _get_first_name_given_race_index(self):
+        """Create a sorted name index of first name ratios given a race"""
+        return self._load_index(
+            'prob_first_name_given_race_harvard.csv',
+            self._read_name_csv,
+            NameIndex,
+        )
+
+    def _load_index(self, file_name, read_csv, index_type):
+        """Get a shared array index built over a data file
+
+        Only the index is kept in the registry; the dataframe it is built
+        from is released once the index holds its keys and values. Each
+        storage precision (self.dtype) is a separate index.
+        """
+        csv_path = self._package_root / 'data' / file_name
+        self._data_files.add(csv_path)
+        index = TABLE_REGISTRY.get(
+            (str(csv_path), index_type.__name__, self.dtype),
+            lambda: index_type(
+                table_cache.load(csv_path, lambda: read_csv(csv_path)),
+                self.dtype,
+            ),
+        )
+        self._tables[file_name, index_type.__name__] = index
+        return index
+
+    def _load_table(self, file_name, read_csv):
+        """Get a shared data file, loading it from its compiled cache (or
+        from CSV if the cache is stale) the first time it is requested
+        """
+        csv_path = self._package_root / 'data' / file_name
+        self._data_files.add(csv_path)
+        table = TABLE_REGISTRY.get(
+            str(csv_path),
+            lambda: table_cache.load(csv_path, lambda: read_csv(csv_path)),
+        )
+        self._tables[file_name, 'DataFrame'] = table
+        return table
+
+    def _read_zcta_csv(self, csv_path):
+        """Parse a ZCTA-indexed CSV from the data folder"""
+        prob_zcta = pd.read_csv(
+            csv_path,
+            index_col='zcta5',
+            na_values=[''],
+            keep_default_na=False,
+        )
+        # Convert geocode zip codes to 00000-formatted strings
+        prob_zcta.index = (
+            prob_zcta.index.astype('str')
+                     .str.zfill(5)
+        )
+        return prob_zcta
+
+    def _read_tract_csv(self, csv_path):
+        """Parse a State/County/Tract-indexed CSV from the data folder"""
+        prob_tract = pd.read_csv(
+            csv_path,
+            na_values=[''],
+            keep_default_na=False,
+            dtype={'state':str,'county':str,'tract':str}
+        ).set_index(['state','county','tract'])
+        return prob_tract
+
+    def _read_name_csv(self, csv_path):
+        """Parse a name-indexed CSV from the data folder"""
+        # Create name df (beware ... some NA values like "NAN" are names)
+        prob_name = pd.read_csv(
+            csv_path,
             index_col='name',
             na_values=[''],
             keep_default_na=False,
         )
-        return prob_first_name_given_race
+        return prob_name
 
     def _normalize_names(self, names: pd.Series) -> pd.Series:
         """Take names and run a normalization routine"""
-        # Make a transalation table of unwanted characers
-        unwanted_characters = (
-            string.digits +
-            string.punctuation +
-            string.whitespace
-        )
-        # Remove unwanted characters efficiently
-        translation_table =  str.maketrans('', '', unwanted_characters)
-        # Run our string operations (remember NAN is a valid name)
-        output = (
-            names.fillna('')
-                 .astype(str)
-                 .str.translate(translation_table)
-                 .str.upper()
-                 .str.replace(r'\s?J\.*?R\.*\s*?$', '', regex=True)
-                 .str.replace(r'\s?S\.*?R\.*\s*?$', '', regex=True)
-                 .str.replace(r'\s?III\s*?$',      '', regex=True)
-                 .str.replace(r'\s?IV\s*?$',       '', regex=True)
-        )
-        output.name = 'name'
+        codes, normalized = self._factorize_names(names)
+        # Broadcast the normalized unique names back to every row
+        output = pd.Series(
+            normalized.take(codes).array,
+            index=names.index,
+            name='name',
+        )
         return output
 
+    def _factorize_names(self, names: pd.Series):
+        """Split names into integer codes and normalized unique names
+
+        Portfolios repeat names heavily, so the string work is done once
+        per distinct input value (see surgeo.utility.normalize). Returns
+        the code of each row and the normalized name of each unique value;
+        missing values get the final code (-1), which selects an appended
+        empty name.
+        """
+        with self._stage('normalize_names', len(names)):
+            codes, normalized = normalize.factorize_names(names)
+            return codes, pd.Series(normalized.tolist(), name='name')
+
+    def _get_name_probs(self,
+                        names: pd.Series,
+                        name_index: NameIndex,
+                        output='full',
+                        entropy=False) -> pd.DataFrame:
+        """Normalize names and join them to a name-indexed lookup table"""
+        codes, normalized, positions = self._lookup_names(names, name_index)
+        with self._stage('gather', len(positions)):
+            name_probs = self._probs_frame(
+                name_index.take(positions),
+                name_index.columns,
+                names.index,
+                output,
+                entropy,
+            )
+            name_probs.insert(0, 'name', normalized.take(codes).array)
+        return name_probs
+
+    def _lookup_names(self, names, name_index: NameIndex):
+        """Normalize names and find the table position of each row
+
+        Both the normalization and the binary search run once per distinct
+        name; the positions are broadcast back through the codes. Returns
+        the codes and normalized names of _factorize_names() and the
+        position of each row (the sentinel if not found).
+        """
+        codes, normalized = self._factorize_names(names)
+        with self._stage('join_names', len(codes)):
+            positions = name_index.positions(normalized.to_numpy())[codes]
+        return codes, normalized, positions
+
     def _normalize_zctas(self, zcta: pd.Series) -> pd.Series:
         """Transform ZCTAs into standardized strings"""
         converted = pd.Series(zcta.values, dtype=str).str.strip()
@@ -157,7 +574,269 @@ class BaseModel(object):
         zfilled.name = 'zcta5'
         return zfilled
 
+    def _factorize_zctas(self, zcta: pd.Series):
+        """Split ZCTAs into integer codes and normalized unique values
+
+        Returns the code of each row, the normalized string of each unique
+        value (as _normalize_zctas() would produce), and the integer ZCTA
+        of each unique value (-1 if unparseable). Missing values get the
+        final code (-1), which selects an appended missing unique value.
+        """
+        with self._stage('normalize_zctas', len(zcta)):
+            codes, uniques = pd.factorize(pd.Series(zcta).to_numpy())
+            uniques = pd.Series(list(uniques) + [np.nan], dtype=object)
+            normalized = self._normalize_zctas(uniques)
+            keys = zcta_keys(uniques)
+        return codes, normalized, keys
+
+    def _get_zcta_probs(self,
+                        zcta: pd.Series,
+                        zcta_index: ZctaIndex,
+                        output='full',
+                        entropy=False) -> pd.DataFrame:
+        """Normalize ZCTAs/ZIPs and gather their rows from a ZCTA index"""
+        codes, normalized, positions = self._lookup_zctas(zcta, zcta_index)
+        with self._stage('gather', len(positions)):
+            zcta_probs = self._probs_frame(
+                zcta_index.take(positions),
+                zcta_index.columns,
+                getattr(zcta, 'index', None),
+                output,
+                entropy,
+            )
+            zcta_probs.insert(0, 'zcta5', normalized.take(codes).array)
+        return zcta_probs
+
+    def _lookup_zctas(self, zcta, zcta_index: ZctaIndex):
+        """Normalize ZCTAs/ZIPs and find the table position of each row
+
+        Returns the codes and normalized values of _factorize_zctas() and
+        the position of each row (the sentinel if not found).
+        """
+        codes, normalized, keys = self._factorize_zctas(zcta)
+        # Look up each unique key once, then broadcast to every row
+        with self._stage('join_zctas', len(codes)):
+            positions = zcta_index.positions(keys)[codes]
+        return codes, normalized, positions
+
     def _normalize_tracts(self, geo_target_df: pd.DataFrame) -> pd.DataFrame:
-        """Transform rename the columns to standard into standardized strings"""
-        converted = geo_target_df.rename(columns={old_col:new_col for old_col, new_col in zip(geo_target_df.columns, ['state','county','tract'])})
-        return converted
+        """Transform State/County/Tract codes into zero-padded strings"""
+        normalized_tracts, _ = self._factorize_tracts(geo_target_df)
+        return normalized_tracts
+
+    def _factorize_tracts(self, geo_target_df):
+        """Split State/County/Tract codes into normalized strings and GEOIDs
+
+        The first three columns are read as state, county, and tract (ints
+        or strings, zero-padded to 2, 3, and 6 digits). A Series or single
+        column is read as 11 digit GEOIDs. Returns a frame of 'state',
+        'county', and 'tract' strings and the int64 GEOID of each row (-1
+        if unparseable).
+        """
+        if isinstance(geo_target_df, pd.Series):
+            geo_target_df = geo_target_df.to_frame()
+        width = 1 if geo_target_df.shape[1] == 1 else len(TRACT_PARTS)
+        if geo_target_df.shape[1] < width:
+            raise SurgeoException(
+                'Census tracts need state, county, and tract columns or a '
+                f'single GEOID column. Got: {list(geo_target_df.columns)}.'
+            )
+        with self._stage('normalize_tracts', len(geo_target_df)):
+            keys, padded_parts = tract_keys([
+                geo_target_df.iloc[:, position]
+                for position in range(width)
+            ])
+            normalized_tracts = pd.DataFrame(
+                {
+                    name: part.array
+                    for (name, _), part in zip(TRACT_PARTS, padded_parts)
+                },
+                index=geo_target_df.index,
+            )
+        return normalized_tracts, keys
+
+    def _get_tract_probs(self,
+                         geo_target_df: pd.DataFrame,
+                         tract_index: TractIndex,
+                         output='full',
+                         entropy=False) -> pd.DataFrame:
+        """Normalize State/County/Tract codes and gather their rows"""
+        normalized_tracts, keys = self._factorize_tracts(geo_target_df)
+        positions = self._tract_positions(keys, tract_index)
+        with self._stage('gather', len(positions)):
+            tract_probs = self._probs_frame(
+                tract_index.take(positions),
+                tract_index.columns,
+                normalized_tracts.index,
+                output,
+                entropy,
+            )
+            tract_probs = pd.concat([normalized_tracts, tract_probs], axis=1)
+        return tract_probs
+
+    def _tract_positions(self, keys: np.ndarray, tract_index: TractIndex):
+        """Find the table position of each packed GEOID"""
+        # Binary search each distinct GEOID once, then broadcast
+        with self._stage('join_tracts', len(keys)):
+            codes, unique_keys = pd.factorize(keys)
+            return tract_index.positions(unique_keys)[codes]
+
+    def _lookup_tract_arrays(self, geo, tract_index: TractIndex):
+        """Find the table position of each tract given as arrays
+
+        geo is either one array of 11 digit GEOIDs or a sequence of state,
+        county, and tract arrays (see surgeo.models.lookup_index.tract_keys).
+        """
+        if isinstance(geo, (list, tuple)):
+            parts = list(geo)
+        else:
+            parts = [geo]
+        if len(parts) not in (1, len(TRACT_PARTS)):
+            raise SurgeoException(
+                'Census tracts need state, county, and tract arrays or a '
+                f'single GEOID array. Got {len(parts)} arrays.'
+            )
+        with self._stage('normalize_tracts', len(parts[0])):
+            keys, _ = tract_keys([self._as_array(part) for part in parts])
+        return self._tract_positions(keys, tract_index)
+
+    def _create_cache(self, cache_entries, cache_bytes):
+        """Create the result cache if either limit is given (else None)"""
+        if cache_entries is None and cache_bytes is None:
+            return None
+        return ResultCache(max_entries=cache_entries, max_bytes=cache_bytes)
+
+    def _cache_kwargs(self):
+        """Keyword arguments that give a worker's model the same cache limits"""
+        if self.result_cache is None:
+            return {}
+        return {
+            'cache_entries': self.result_cache.max_entries,
+            'cache_bytes': self.result_cache.max_bytes,
+        }
+
+    def _name_component(self, names, name_index: NameIndex):
+        """The distinct normalized names of an input, for _cached_combine()
+
+        Returns the codes and normalized names of _factorize_names() and the
+        (codes, keys, positions, index) component of the names.
+        """
+        codes, normalized = self._factorize_names(names)
+        keys = normalized.to_numpy()
+        with self._stage('join_names', len(codes)):
+            positions = name_index.positions(keys)
+        return codes, normalized, (codes, keys, positions, name_index)
+
+    def _zcta_component(self, zcta, zcta_index: ZctaIndex):
+        """The distinct ZCTAs of an input, for _cached_combine()
+
+        Returns the codes and normalized values of _factorize_zctas() and
+        the (codes, keys, positions, index) component of the ZCTAs, keyed
+        by integer ZCTA.
+        """
+        codes, normalized, keys = self._factorize_zctas(zcta)
+        with self._stage('join_zctas', len(codes)):
+            positions = zcta_index.positions(keys)
+        return codes, normalized, (codes, keys, positions, zcta_index)
+
+    def _tract_component(self, keys: np.ndarray, tract_index: TractIndex):
+        """The (codes, keys, positions, index) component of packed GEOIDs"""
+        with self._stage('join_tracts', len(keys)):
+            codes, unique_keys = pd.factorize(keys)
+            positions = tract_index.positions(unique_keys)
+        return codes, unique_keys, positions, tract_index
+
+    def _cached_combine(self, components, races, log_space):
+        """Combine component probabilities once per distinct key tuple
+
+        Each component is a (codes, keys, positions, index) tuple: the code
+        of each row (-1 selects the last key), and the normalized key and
+        table position of each distinct value. The distinct combinations of
+        keys are looked up in the result cache in one pass; only the misses
+        are gathered and combined (and then stored), and the rows of every
+        combination are broadcast back to the input rows.
+
+        Returns the (N, k) probabilities and a boolean array that is True
+        where every component was found.
+        """
+        row_count = len(components[0][0])
+        # Number the distinct combinations, keeping the codes below N * keys
+        combination_codes = np.zeros(row_count, dtype=np.int64)
+        for codes, keys, _, _ in components:
+            combination_codes = combination_codes * len(keys) + codes % len(keys)
+            combination_codes, _ = pd.factorize(combination_codes)
+        combination_count = combination_codes.max() + 1 if row_count else 0
+        # The first row of each combination gives its component codes
+        first_rows = np.empty(combination_count, dtype=np.int64)
+        first_rows[combination_codes[::-1]] = np.arange(row_count)[::-1]
+        unique_codes = [
+            (codes % len(keys))[first_rows]
+            for codes, keys, _, _ in components
+        ]
+        cache_keys = list(zip(*[
+            np.asarray(keys, dtype=object)[codes].tolist()
+            for codes, (_, keys, _, _) in zip(unique_codes, components)
+        ]))
+        # The cached rows are only valid for these tables and options
+        token = (log_space, self.dtype) + tuple(
+            index for _, _, _, index in components
+        )
+        found, hit_rows = self.result_cache.lookup(cache_keys, token)
+        missing = np.flatnonzero(~found)
+        factors = [
+            self._take_races(index, positions[codes[missing]], races)
+            for codes, (_, _, positions, index) in zip(unique_codes, components)
+        ]
+        # The gathered rows are fresh arrays, so combine into the first
+        missing_rows = combine_probabilities(
+            factors,
+            out=factors[0],
+            log_space=log_space,
+        )
+        self.result_cache.store(
+            [cache_keys[position] for position in missing],
+            missing_rows,
+        )
+        unique_probs = np.empty(
+            (combination_count, len(races)),
+            dtype=missing_rows.dtype,
+        )
+        unique_probs[missing] = missing_rows
+        if hit_rows:
+            unique_probs[found] = np.stack(hit_rows)
+        matched = np.ones(row_count, dtype=bool)
+        for codes, (_, keys, positions, index) in zip(unique_codes, components):
+            matched &= (positions[codes] != index.sentinel)[combination_codes]
+        return unique_probs[combination_codes], matched
+
+    @staticmethod
+    def _as_array(values):
+        """View a pyarrow array (chunked or not) or a sequence as NumPy
+
+        pandas objects are returned as they are, since the lookups accept
+        them directly.
+        """
+        if isinstance(values, (pd.Series, pd.Index)):
+            return values
+        if type(values).__module__.startswith('pyarrow'):
+            # Arrays with nulls or strings can't be viewed without a copy
+            return values.to_numpy(zero_copy_only=False)
+        return np.asarray(values)
+
+    @staticmethod
+    def _take_races(index, positions, races):
+        """Gather (N, k) rows from an index with their columns in race order"""
+        rows = index.take(positions)
+        if index.columns != list(races):
+            rows = rows[:, [index.columns.index(race) for race in races]]
+        return rows
+
+    def _probs_frame(self, probs, races, index, output, entropy):
+        """Wrap gathered (N, 6) probabilities in the requested output frame
+
+        In 'full' mode this is every race's probability; in 'top' mode only
+        the most likely race is kept (see _top_race_frame()).
+        """
+        if output == 'top':
+            return self._top_race_frame(probs, races, index, entropy)
+        return pd.DataFrame(probs, columns=races, index=index)
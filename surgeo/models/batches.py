@@ -0,0 +1,95 @@
+"""Contains a generator that scores Arrow record batches.
+
+score_batches() feeds the columns of each pyarrow record batch straight to
+a model's score_arrays() and wraps the resulting probability columns as a
+new record batch, so Arrow-based engines (e.g. vectorized UDFs) can score
+without a round trip through pandas. pyarrow is optional and only needed
+here.
+
+"""
+
+import numpy as np
+
+from surgeo.utility.surgeo_exception import SurgeoException
+
+
+def score_batches(model, batches, columns, matched_column='matched'):
+    """Score Arrow record batches, yielding a batch of results for each.
+
+    Parameters
+    ----------
+    model : surgeo model
+        Any of the surgeo models (anything with score_arrays())
+    batches : iterable of pyarrow.RecordBatch
+        The input batches (a pyarrow.Table or RecordBatchReader works too)
+    columns : list
+        The input column for each argument of model.score_arrays(), e.g.
+        ``['surname', 'zcta5']`` for a SurgeoModel. A tract geography is a
+        list of its state, county, and tract columns (or one GEOID column).
+    matched_column : str or None, optional
+        The name of the boolean column marking rows whose inputs were all
+        found, or None to leave it out. Defaults to "matched".
+
+    Yields
+    ------
+    pyarrow.RecordBatch
+        One float column per race (null where the row was not matched) and
+        the matched column, with the rows of the input batch
+
+    Example
+    -------
+        .. code-block:: python
+
+            reader = pyarrow.ipc.open_file('people.arrow')
+            batches = (
+                reader.get_batch(i) for i in range(reader.num_record_batches)
+            )
+            model = surgeo.SurgeoModel()
+            for result in score_batches(model, batches, ['name', 'zcta5']):
+                ...
+
+    """
+    pa = _import_pyarrow()
+    if isinstance(batches, pa.Table):
+        batches = batches.to_batches()
+    races = model.races
+    for batch in batches:
+        inputs = [_select(batch, column) for column in columns]
+        probs, matched = model.score_arrays(*inputs)
+        # Each column of a Fortran-ordered array is contiguous, so Arrow
+        # can wrap it without another copy
+        probs = np.asfortranarray(probs)
+        unmatched = ~matched
+        arrays = [
+            pa.array(probs[:, position], mask=unmatched)
+            for position in range(len(races))
+        ]
+        names = list(races)
+        if matched_column is not None:
+            arrays.append(pa.array(matched))
+            names.append(matched_column)
+        yield pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+def _select(batch, column):
+    """Take one input column (or a tuple of tract columns) from a batch"""
+    if isinstance(column, (list, tuple)):
+        return tuple(_select(batch, part) for part in column)
+    try:
+        return batch.column(column)
+    except KeyError:
+        raise SurgeoException(
+            f'Column "{column}" not found. Got: {batch.schema.names}.'
+        )
+
+
+def _import_pyarrow():
+    """Import pyarrow, which is only needed for Arrow batches"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise SurgeoException(
+            'Scoring Arrow batches requires pyarrow. '
+            'Install it with "pip install pyarrow".'
+        )
+    return pa
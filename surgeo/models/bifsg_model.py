@@ -3,6 +3,7 @@
 import pandas as pd
 
 from surgeo.models.base_model import BaseModel
+from surgeo.models.kernels import combine_probabilities
 from surgeo.utility.surgeo_exception import SurgeoException
 
 
@@ -20,6 +21,26 @@ class BIFSGModel(BaseModel):
        multiplying probabilities, checking input values, and obtaining
        ZCTA/name data components.
 
+    Parameters
+    ----------
+    log_space : bool, optional
+        Multiply the component probabilities in log space (see
+        surgeo.models.kernels), which avoids underflow for rows whose
+        probabilities are all very small. Defaults to False.
+    dtype : str, optional
+        The precision of the lookup tables: "float64" (the default),
+        "float32", or "uint16" (quantized). The probabilities returned are
+        float32 unless the tables are float64. See
+        surgeo.models.lookup_index for the error bounds.
+    cache_entries : int, optional
+        Keep the probabilities of up to this many normalized key tuples in
+        an LRU cache (see surgeo.models.result_cache), so that repeated
+        combinations skip the lookups and the combination. The cache is off
+        unless cache_entries or cache_bytes is given; its counters are on
+        the result_cache attribute.
+    cache_bytes : int, optional
+        Limit the (estimated) memory of the cache to this many bytes
+
     Notes
     -----
     The surname probability dataframe for this model is identical to that
@@ -79,13 +100,87 @@ class BIFSGModel(BaseModel):
         `<https://www.tandfonline.com/doi/full/10.1080/2330443X.2018.1427012>`_
 
     """
-    def __init__(self):
-        super().__init__()
-        self._PROB_ZCTA_GIVEN_RACE = self._get_prob_zcta_given_race()
-        self._PROB_RACE_GIVEN_SURNAME = self._get_prob_race_given_surname()
-        self._PROB_FIRST_NAME_GIVEN_RACE = self._get_prob_first_name_given_race()
+    def __init__(self, log_space=False, dtype='float64', cache_entries=None,
+                 cache_bytes=None):
+        super().__init__(dtype=dtype)
+        self.log_space = log_space
+        self._ZCTA_GIVEN_RACE_INDEX = self._get_zcta_given_race_index()
+        self._RACE_GIVEN_SURNAME_INDEX = self._get_race_given_surname_index()
+        self._FIRST_NAME_GIVEN_RACE_INDEX = (
+            self._get_first_name_given_race_index()
+        )
+        self.result_cache = self._create_cache(cache_entries, cache_bytes)
+
+    def _worker_kwargs(self):
+        """Recreate the model with the same options in a worker"""
+        return {
+            **super()._worker_kwargs(),
+            'log_space': self.log_space,
+            **self._cache_kwargs(),
+        }
+
+    @property
+    def races(self):
+        """The race of each column of score_arrays() results"""
+        return list(self._RACE_GIVEN_SURNAME_INDEX.columns)
+
+    def score_arrays(self, first_names, surnames, zctas):
+        """Obtain BIFSG probabilities for arrays of names and ZCTAs
+
+        A lower-level counterpart of get_probabilities() for NumPy and
+        pyarrow inputs, which builds no dataframe: the component rows are
+        gathered into arrays and combined in place (see also
+        surgeo.models.batches.score_batches()).
+
+        Parameters
+        ----------
+        first_names : np.ndarray or pyarrow.Array
+            First names to score (pyarrow ChunkedArrays and pd.Series are
+            accepted too)
+        surnames : np.ndarray or pyarrow.Array
+            Surnames to score
+        zctas : np.ndarray or pyarrow.Array
+            ZIPs/ZCTAs to score
 
-    def get_probabilities(self, first_names, surnames, zctas):
+        Returns
+        -------
+        tuple of (np.ndarray, np.ndarray)
+            A C-contiguous (N, 6) float array of probabilities with columns
+            in the order of self.races (NaN where the result is not found), and
+            a boolean array that is True where the first name, surname, and ZCTA
+            were all found
+
+        """
+        self._check_inputs(first_names, surnames, zctas)
+        races = self.races
+        if self.result_cache is not None:
+            components = self._components(first_names, surnames, zctas)[3]
+            with self._stage('combine', len(first_names)):
+                return self._cached_combine(components, races, self.log_space)
+        lookups = [
+            (self._FIRST_NAME_GIVEN_RACE_INDEX, self._lookup_names, first_names),
+            (self._RACE_GIVEN_SURNAME_INDEX, self._lookup_names, surnames),
+            (self._ZCTA_GIVEN_RACE_INDEX, self._lookup_zctas, zctas),
+        ]
+        factors = []
+        matched = None
+        for index, lookup, values in lookups:
+            _, _, positions = lookup(self._as_array(values), index)
+            with self._stage('gather', len(positions)):
+                factors.append(self._take_races(index, positions, races))
+            found = positions != index.sentinel
+            matched = found if matched is None else matched & found
+        # The gathered rows are fresh arrays, so combine into the first
+        with self._stage('combine', len(matched)):
+            probs = combine_probabilities(
+                factors,
+                out=factors[0],
+                log_space=self.log_space,
+            )
+        return probs, matched
+
+    def get_probabilities(self, first_names, surnames, zctas, n_jobs=1,
+                          output='full', entropy=False):
         """Obtain a set of BIFSG probabilities for first_name/surname/ZCTA
         series
 
@@ -106,6 +201,17 @@ class BIFSGModel(BaseModel):
             A series of surnames to use for the BIFSG algorithm
         zctas : pd.Series
             A series of ZIP/ZCTA codes for the BIFSG algorithm
+        n_jobs : int, optional
+            The number of worker processes to score contiguous blocks of
+            rows in (-1 for one per core). The default of 1 scores in the
+            calling process.
+        output : str, optional
+            "full" (the default) for the probability of every race, or
+            "top" for only the most likely race: a categorical 'race'
+            column and its 'probability'
+        entropy : bool, optional
+            With output="top", also add each row's normalized 'entropy'
+            (0 for one certain race, 1 for all races equally likely)
 
         Returns
         -------
@@ -116,42 +222,119 @@ class BIFSGModel(BaseModel):
 
         # Check inputs
         self._check_inputs(first_names, surnames, zctas)
-        # Get component probabilities
-        first_name_probs = self._get_first_name_probs(first_names)
-        sur_probs = self._get_surname_probs(surnames)
-        geo_probs = self._get_geocode_probs(zctas)
-        # Run BIFSG algorithm
-        bifsg_probs = self._combined_probs(
-            first_name_probs,
-            sur_probs,
-            geo_probs
-        )
+        self._check_output(output)
+        # Score contiguous blocks in worker processes if requested
+        if n_jobs != 1:
+            return self._map_blocks(
+                'get_probabilities',
+                (first_names, surnames, zctas),
+                n_jobs,
+                output=output,
+                entropy=entropy,
+            )
+        if self.result_cache is not None:
+            # Combine each distinct name/ZCTA triple once, through the cache
+            first_name_probs, sur_probs, geo_probs, bifsg_probs = (
+                self._cached_probs(first_names, surnames, zctas, output, entropy)
+            )
+        else:
+            # Get component probabilities
+            first_name_probs = self._get_first_name_probs(first_names)
+            sur_probs = self._get_surname_probs(surnames)
+            geo_probs = self._get_geocode_probs(zctas)
+            # Run BIFSG algorithm
+            with self._stage('combine', len(sur_probs)):
+                bifsg_probs = self._combined_probs(
+                    first_name_probs,
+                    sur_probs,
+                    geo_probs,
+                    output,
+                    entropy,
+                )
         # Combine inputs with results and adjust as necessary
-        result = self._adjust_frame(
-            first_name_probs,
-            sur_probs,
-            geo_probs,
-            bifsg_probs,
-        )
+        with self._stage('adjust', len(bifsg_probs)):
+            result = self._adjust_frame(
+                first_name_probs,
+                sur_probs,
+                geo_probs,
+                bifsg_probs,
+            )
         return result
 
     def _combined_probs(self,
                         first_name_probs: pd.DataFrame,
                         sur_probs: pd.DataFrame,
-                        geo_probs: pd.DataFrame) -> pd.DataFrame:
+                        geo_probs: pd.DataFrame,
+                        output='full',
+                        entropy=False) -> pd.DataFrame:
         """Performs the BIFSG calculation"""
-        # Calculate each of the numerators
-        bifsg_numer = (
-            first_name_probs.iloc[:, 1:] *
-            sur_probs.iloc[:, 1:] *
-            geo_probs.iloc[:, 1:]
+        # Take the race columns of each component in the same order
+        races = sur_probs.columns[1:]
+        factors = [
+            first_name_probs[races].to_numpy(),
+            sur_probs[races].to_numpy(),
+            geo_probs[races].to_numpy(),
+        ]
+        # Multiply, sum, and divide in one preallocated buffer, then keep
+        # every race or only the top one
+        bifsg_probs = self._probs_frame(
+            combine_probabilities(factors, log_space=self.log_space),
+            races,
+            sur_probs.index,
+            output,
+            entropy,
         )
-        # Calculate the denominator
-        bifsg_denom = bifsg_numer.sum(axis=1)
-        # Caluclate the bifsg probabilities (each num / denom)
-        bifsg_probs = bifsg_numer.div(bifsg_denom, axis=0)
         return bifsg_probs
 
+    def _components(self, first_names, surnames, zctas):
+        """Normalize the inputs into components for _cached_combine()
+
+        Returns the normalized first names, surnames, and ZCTAs of each row
+        and the first name, surname, and ZCTA components.
+        """
+        frames = []
+        components = []
+        for values, index, column, get_component in [
+            (first_names, self._FIRST_NAME_GIVEN_RACE_INDEX, 'name',
+             self._name_component),
+            (surnames, self._RACE_GIVEN_SURNAME_INDEX, 'name',
+             self._name_component),
+            (zctas, self._ZCTA_GIVEN_RACE_INDEX, 'zcta5',
+             self._zcta_component),
+        ]:
+            codes, normalized, component = get_component(
+                self._as_array(values),
+                index,
+            )
+            frames.append(pd.DataFrame(
+                {column: normalized.take(codes).array},
+                index=getattr(values, 'index', None),
+            ))
+            components.append(component)
+        return (*frames, components)
+
+    def _cached_probs(self, first_names, surnames, zctas, output='full',
+                      entropy=False):
+        """Perform the BIFSG calculation through the result cache
+
+        Returns frames of the normalized first names, surnames, and ZCTAs
+        (as _adjust_frame() expects) and of the results.
+        """
+        first_name_frame, sur_frame, geo_frame, components = (
+            self._components(first_names, surnames, zctas)
+        )
+        races = self.races
+        with self._stage('combine', len(sur_frame)):
+            probs, _ = self._cached_combine(components, races, self.log_space)
+            bifsg_probs = self._probs_frame(
+                probs,
+                races,
+                sur_frame.index,
+                output,
+                entropy,
+            )
+        return first_name_frame, sur_frame, geo_frame, bifsg_probs
+
     def _adjust_frame(self,
                       first_name_probs: pd.DataFrame,
                       sur_probs: pd.DataFrame,
@@ -187,49 +370,28 @@ class BIFSGModel(BaseModel):
             raise SurgeoException(err_string)
 
     def _get_first_name_probs(self, first_names: pd.Series) -> pd.DataFrame:
-        """Normalizes ZCTAs/ZIPs and joins them to their race probs."""
-        # Normalize
-        normalized_first_names = (
-            self._normalize_names(first_names)
-                .to_frame()
-        )
-        # Merge names to dataframe, which gives probs for each name.
-        first_name_probs = normalized_first_names.merge(
-            self._PROB_FIRST_NAME_GIVEN_RACE,
-            left_on='name',
-            right_index=True,
-            how='left',
+        """Normalizes first names and joins them to their race ratios."""
+        # Normalize and join each distinct name once, then broadcast
+        first_name_probs = self._get_name_probs(
+            first_names,
+            self._FIRST_NAME_GIVEN_RACE_INDEX,
         )
         return first_name_probs
 
     def _get_surname_probs(self, surnames: pd.Series) -> pd.DataFrame:
         """Normalizes names and joins names to their race probabilities."""
-        # Normalize names
-        normalized_names = (
-            self._normalize_names(surnames)
-                .to_frame()
-        )
-        # Merge names to dataframe, which gives probs for each name
-        surname_probs = normalized_names.merge(
-            self._PROB_RACE_GIVEN_SURNAME,
-            left_on='name',
-            right_index=True,
-            how='left',
+        # Normalize and join each distinct name once, then broadcast
+        surname_probs = self._get_name_probs(
+            surnames,
+            self._RACE_GIVEN_SURNAME_INDEX,
         )
         return surname_probs
 
     def _get_geocode_probs(self, zctas: pd.Series) -> pd.DataFrame:
         """Normalizes ZCTAs/ZIPs and joins them to their race probs."""
-        # Normalize
-        normalized_zctas = (
-            self._normalize_zctas(zctas)
-                .to_frame()
-        )
-        # Merge names to dataframe, which gives probs for each name.
-        geocode_probs = normalized_zctas.merge(
-            self._PROB_ZCTA_GIVEN_RACE,
-            left_on='zcta5',
-            right_index=True,
-            how='left',
+        # Gather the probs for each ZCTA from the direct-addressed index
+        geocode_probs = self._get_zcta_probs(
+            zctas,
+            self._ZCTA_GIVEN_RACE_INDEX,
         )
         return geocode_probs
@@ -12,6 +12,14 @@ class FirstNameModel(BaseModel):
     mechanism for obtaining race data. It is created using a simple join
     of a race data table and the first names that are input.
 
+    Parameters
+    ----------
+    dtype : str, optional
+        The precision of the lookup table: "float64" (the default),
+        "float32", or "uint16" (quantized). The probabilities returned are
+        float32 unless the table is float64. See surgeo.models.lookup_index
+        for the error bounds.
+
     Notes
     -----
     The manner in which the first name data file was created can be found in
@@ -22,17 +30,63 @@ class FirstNameModel(BaseModel):
 
     """
 
-    def __init__(self):
-        super().__init__()
-        self._PROB_RACE_GIVEN_FIRST_NAME = self._get_prob_race_given_first_name()
+    def __init__(self, dtype='float64'):
+        super().__init__(dtype=dtype)
+        self._RACE_GIVEN_FIRST_NAME_INDEX = (
+            self._get_race_given_first_name_index()
+        )
+
+    @property
+    def races(self):
+        """The race of each column of score_arrays() results"""
+        return list(self._RACE_GIVEN_FIRST_NAME_INDEX.columns)
+
+    def score_arrays(self, names):
+        """Obtain race probabilities for an array of first names.
+
+        A lower-level counterpart of get_probabilities() for NumPy and
+        pyarrow inputs, which builds no dataframe (see also
+        surgeo.models.batches.score_batches()).
+
+        Parameters
+        ----------
+        names : np.ndarray or pyarrow.Array
+            First names to score (pyarrow ChunkedArrays and pd.Series
+            are accepted too)
+
+        Returns
+        -------
+        tuple of (np.ndarray, np.ndarray)
+            A C-contiguous (N, 6) float array of probabilities with columns
+            in the order of self.races (NaN where the name was not found), and
+            a boolean array that is True where the name was found
 
-    def get_probabilities(self, names):
+        """
+        index = self._RACE_GIVEN_FIRST_NAME_INDEX
+        _, _, positions = self._lookup_names(self._as_array(names), index)
+        with self._stage('gather', len(positions)):
+            probs = index.take(positions)
+        return probs, positions != index.sentinel
+
+    def get_probabilities(self, names, n_jobs=1, output='full',
+                          entropy=False):
         """Obtain race probabilities for a set of first names.
 
         Parameters
         ----------
         names : pd.Series
             names to which to attach race probability data
+        n_jobs : int, optional
+            The number of worker processes to score contiguous blocks of
+            rows in (-1 for one per core). The default of 1 scores in the
+            calling process.
+        output : str, optional
+            "full" (the default) for the probability of every race, or
+            "top" for only the most likely race: a categorical 'race'
+            column and its 'probability'
+        entropy : bool, optional
+            With output="top", also add each row's normalized 'entropy'
+            (0 for one certain race, 1 for all races equally likely)
 
         Return
         ------
@@ -41,17 +95,23 @@ class FirstNameModel(BaseModel):
 
         """
 
-        # Clean and process names (consistent with Word et al)
-        normalized_names = (
-            self._normalize_names(names)
-                .to_frame()
-        )
-        # Do a simple join to obtain the names along with provs.
-        first_name_probs = normalized_names.merge(
-            self._PROB_RACE_GIVEN_FIRST_NAME,
-            left_on='name',
-            right_index=True,
-            how='left',
+        self._check_output(output)
+        # Score contiguous blocks in worker processes if requested
+        if n_jobs != 1:
+            return self._map_blocks(
+                'get_probabilities',
+                (names,),
+                n_jobs,
+                output=output,
+                entropy=entropy,
+            )
+        # Clean and process names (consistent with Word et al) and join
+        # them to their probs, once per distinct name
+        first_name_probs = self._get_name_probs(
+            names,
+            self._RACE_GIVEN_FIRST_NAME_INDEX,
+            output,
+            entropy,
         )
         # Rename to avoid clashes with "name"
         first_name_probs = first_name_probs.rename(columns={'name': 'first_name'})
@@ -12,6 +12,16 @@ class GeocodeModel(BaseModel):
     mechanism for obtaining race data. It is created using a simple join
     of a race data table and the ZIPs/ZCTAs that are input.
 
+    Parameters
+    ----------
+    geo_level : str, optional
+        "ZCTA" (the default) or "TRACT"
+    dtype : str, optional
+        The precision of the lookup table: "float64" (the default),
+        "float32", or "uint16" (quantized). The probabilities returned are
+        float32 unless the table is float64. See surgeo.models.lookup_index
+        for the error bounds.
+
     Notes
     -----
     ZIP Code Tabulation Areas (ZCTAs) are approximations for US Postal ZIP
@@ -30,20 +40,81 @@ class GeocodeModel(BaseModel):
 
     """
 
-    def __init__(self, geo_level='ZCTA'):
-        super().__init__()
-        if geo_level.upper() == 'TRACT':
-            self._PROB_RACE_GIVEN_GEO = self._get_prob_race_given_tract()
+    def __init__(self, geo_level='ZCTA', dtype='float64'):
+        super().__init__(dtype=dtype)
+        self.geo_level = geo_level.upper()
+        if self.geo_level == 'TRACT':
+            self._RACE_GIVEN_TRACT_INDEX = self._get_race_given_tract_index()
         else:
-            self._PROB_RACE_GIVEN_GEO = self._get_prob_race_given_zcta()
+            self._RACE_GIVEN_ZCTA_INDEX = self._get_race_given_zcta_index()
+
+    def _worker_kwargs(self):
+        """Recreate the model at the same geography level in a worker"""
+        return {**super()._worker_kwargs(), 'geo_level': self.geo_level}
+
+    @property
+    def races(self):
+        """The race of each column of score_arrays() results"""
+        return list(self._geo_index().columns)
+
+    def score_arrays(self, geo):
+        """Obtain race probabilities for an array of ZCTAs or tracts.
 
-    def get_probabilities(self, zctas):
+        A lower-level counterpart of get_probabilities() and
+        get_probabilities_tract() for NumPy and pyarrow inputs, which
+        builds no dataframe (see also
+        surgeo.models.batches.score_batches()).
+
+        Parameters
+        ----------
+        geo : np.ndarray or pyarrow.Array, or a tuple of them
+            ZIPs/ZCTAs to score, or (at the TRACT level) either 11 digit
+            GEOIDs or a (state, county, tract) tuple of arrays
+
+        Returns
+        -------
+        tuple of (np.ndarray, np.ndarray)
+            A C-contiguous (N, 6) float array of probabilities with columns
+            in the order of self.races (NaN where the geography was not found), and
+            a boolean array that is True where the geography was found
+
+        """
+        index = self._geo_index()
+        if self.geo_level == 'TRACT':
+            positions = self._lookup_tract_arrays(geo, index)
+        else:
+            _, _, positions = self._lookup_zctas(self._as_array(geo), index)
+        with self._stage('gather', len(positions)):
+            probs = index.take(positions)
+        return probs, positions != index.sentinel
+
+    def _geo_index(self):
+        """The index of the model's geography level"""
+        if self.geo_level == 'TRACT':
+            return self._RACE_GIVEN_TRACT_INDEX
+        return self._RACE_GIVEN_ZCTA_INDEX
+
+    def get_probabilities(self, zctas, n_jobs=1, output='full',
+                          entropy=False):
         """Obtain race probabilities for a set of ZIP codes or ZCTAs.
 
         Parameters
         ----------
         zctas : pd.Series
-            ZIPs/ZCTAs to which to attach race probability data
+            ZIPs/ZCTAs to which to attach race probability data. Integers,
+            floats, strings, and ZIP+4 strings (e.g. "63144-1234") are
+            accepted.
+        n_jobs : int, optional
+            The number of worker processes to score contiguous blocks of
+            rows in (-1 for one per core). The default of 1 scores in the
+            calling process.
+        output : str, optional
+            "full" (the default) for the probability of every race, or
+            "top" for only the most likely race: a categorical 'race'
+            column and its 'probability'
+        entropy : bool, optional
+            With output="top", also add each row's normalized 'entropy'
+            (0 for one certain race, 1 for all races equally likely)
 
         Return
         ------
@@ -52,27 +123,46 @@ class GeocodeModel(BaseModel):
 
         """
 
-        # Clean ZCTAs
-        normalized_zctas = (
-            self._normalize_zctas(zctas)
-                .to_frame()
-        )
-        # Merge ZCTAs to race probabilities
-        geocode_probs = normalized_zctas.merge(
-            self._PROB_RACE_GIVEN_GEO,
-            left_on='zcta5',
-            right_index=True,
-            how='left',
+        self._check_output(output)
+        # Score contiguous blocks in worker processes if requested
+        if n_jobs != 1:
+            return self._map_blocks(
+                'get_probabilities',
+                (zctas,),
+                n_jobs,
+                output=output,
+                entropy=entropy,
+            )
+        # Clean ZCTAs and gather their race probabilities
+        geocode_probs = self._get_zcta_probs(
+            zctas,
+            self._RACE_GIVEN_ZCTA_INDEX,
+            output,
+            entropy,
         )
         return geocode_probs
 
-    def get_probabilities_tract(self, geo_df):
+    def get_probabilities_tract(self, geo_df, n_jobs=1, output='full',
+                                entropy=False):
         """Obtain race probabilities for a set of State, County, Tract.
 
         Parameters
         ----------
         geo_df : pd.DataFrame
             DF of ['state','county','tract'] codes to retrun probabilities for
+            (ints or strings, which are zero-padded), or a single column of
+            11 digit GEOIDs
+        n_jobs : int, optional
+            The number of worker processes to score contiguous blocks of
+            rows in (-1 for one per core). The default of 1 scores in the
+            calling process.
+        output : str, optional
+            "full" (the default) for the probability of every race, or
+            "top" for only the most likely race: a categorical 'race'
+            column and its 'probability'
+        entropy : bool, optional
+            With output="top", also add each row's normalized 'entropy'
+            (0 for one certain race, 1 for all races equally likely)
 
         Return
         ------
@@ -81,14 +171,21 @@ class GeocodeModel(BaseModel):
 
         """
 
-        normalized_tracts = (
-            self._normalize_tracts(geo_df)
-        )
-        # Merge ZCTAs to race probabilities
-        geocode_probs = normalized_tracts.merge(
-            self._PROB_RACE_GIVEN_GEO,
-            left_on=['state','county','tract'],
-            right_index=True,
-            how='left',
+        self._check_output(output)
+        # Score contiguous blocks in worker processes if requested
+        if n_jobs != 1:
+            return self._map_blocks(
+                'get_probabilities_tract',
+                (geo_df,),
+                n_jobs,
+                output=output,
+                entropy=entropy,
+            )
+        # Pack tracts into GEOIDs and binary search their race probabilities
+        geocode_probs = self._get_tract_probs(
+            geo_df,
+            self._RACE_GIVEN_TRACT_INDEX,
+            output,
+            entropy,
         )
         return geocode_probs
@@ -0,0 +1,116 @@
+"""Contains the array kernels shared by the models.
+
+The BISG and BIFSG models compute, for each row, the product u(r) of
+their component probabilities for each race r, divided by the sum of u
+over all six races so that the row sums to one. Doing this with DataFrame
+arithmetic allocates a new N x 6 frame (and aligns indexes and columns)
+at every step. combine_probabilities() works on the gathered (N, 6) float
+matrices and writes everything into one output buffer.
+
+Missing values follow pandas' conventions: a missing component makes that
+race's product missing, the missing products are skipped when summing the
+row, and a row whose products sum to zero (or are all missing) is missing.
+
+top_race() reduces rows of probabilities to the most likely race, its
+probability, and optionally the row's entropy, for the models' compact
+``output='top'`` mode.
+
+"""
+
+import numpy as np
+
+
+def combine_probabilities(factors, out=None, log_space=False):
+    """Multiply component probabilities and normalize each row to one.
+
+    Parameters
+    ----------
+    factors : sequence of np.ndarray
+        Two or more (N, k) float arrays of component probabilities (e.g.
+        p(race | surname) and p(ZCTA | race)) with rows and race columns in
+        the same order
+    out : np.ndarray, optional
+        A C-contiguous (N, k) float array to write the result into. It may
+        be one of the factors. If not given, a new array is allocated:
+        float32 if every factor is float32 and float64 otherwise.
+    log_space : bool, optional
+        Multiply by adding logarithms and rescale each row by its largest
+        term before exponentiating. This avoids underflow to zero (and so
+        a missing row) when several very small probabilities are
+        multiplied; otherwise the result is the same to within rounding.
+
+    Returns
+    -------
+    np.ndarray
+        The (N, k) normalized probabilities (out, if it was given)
+
+    """
+    first, *rest = [np.asarray(factor) for factor in factors]
+    if out is None:
+        dtype = np.result_type(first, *rest, np.float32)
+        out = np.empty(first.shape, dtype=dtype)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if log_space:
+            np.log(first, out=out)
+            for factor in rest:
+                out += np.log(factor)
+            # Shift each row so its largest term is exp(0) = 1
+            row_max = _row_max(out)
+            out -= row_max[:, np.newaxis]
+            np.exp(out, out=out)
+        else:
+            np.multiply(first, rest[0], out=out)
+            for factor in rest[1:]:
+                out *= factor
+        # Sum each row, skipping missing values (as DataFrame.sum() does)
+        denominator = np.nansum(out, axis=1)
+        out /= denominator[:, np.newaxis]
+    return out
+
+
+def _row_max(values):
+    """The largest non-missing value of each row (-inf if there is none)"""
+    row_max = np.fmax.reduce(values, axis=1, initial=-np.inf)
+    # A row of all -inf (all zero probabilities) stays all -inf after the
+    # shift, so its sum is zero and its result missing (0 / 0)
+    row_max[np.isneginf(row_max)] = 0.0
+    return row_max
+
+
+def top_race(probs, entropy=False):
+    """Summarize each row of probabilities by its most likely race.
+
+    Parameters
+    ----------
+    probs : np.ndarray
+        (N, k) normalized probabilities (e.g. from combine_probabilities())
+    entropy : bool, optional
+        Also compute each row's normalized entropy: the Shannon entropy of
+        its probabilities divided by log(k), so that 0 means one certain
+        race and 1 means all k races equally likely.
+
+    Returns
+    -------
+    tuple of (np.ndarray, np.ndarray, np.ndarray or None)
+        The int8 column of each row's largest probability (the first one
+        on ties, and -1 if the row is all missing), that probability, and
+        the normalized entropies (None unless requested)
+
+    """
+    probs = np.asarray(probs)
+    # np.fmax skips missing values; an all-missing row stays missing
+    top_probs = np.fmax.reduce(probs, axis=1)
+    codes = np.argmax(probs == top_probs[:, np.newaxis], axis=1)
+    codes = codes.astype(np.int8)
+    missing = np.isnan(top_probs)
+    codes[missing] = -1
+    entropies = None
+    if entropy:
+        # p * log(p), taking 0 * log(0) (and missing values) as zero
+        terms = np.zeros_like(probs)
+        np.log(probs, out=terms, where=probs > 0)
+        terms *= probs
+        terms[~(probs > 0)] = 0.0
+        entropies = (0.0 - terms.sum(axis=1)) / np.log(probs.shape[1])
+        entropies[missing] = np.nan
+    return codes, top_probs, entropies
@@ -0,0 +1,419 @@
+"""Contains array-based indexes over the lookup dataframes.
+
+The lookup dataframes are convenient to read and inspect, but joining
+millions of input rows against them with DataFrame.merge() is slow. The
+classes in this module hold the same probabilities in contiguous NumPy
+arrays and resolve keys to table rows with vectorized integer operations.
+Each index appends a sentinel row of NaNs to its table so that keys which
+are not found gather NaNs, exactly as a left merge does.
+
+The probabilities can be stored at three precisions (see ProbabilityStore):
+
+* ``float64`` -- the default; exactly the values parsed from the CSV.
+* ``float32`` -- half the memory. Each value is rounded to the nearest
+  float32, an absolute error of at most 2**-24 times the column maximum
+  (about 6e-8 for probabilities).
+* ``uint16`` -- a quarter of the memory. Each column is quantized to
+  integer multiples of a scale factor (the column maximum / 65534), with
+  the code 65535 marking missing values, and rows are dequantized to
+  float32 when gathered. The absolute error is at most half the scale plus
+  the float32 rounding above: about 7.6e-6 for a column whose largest
+  value is 1, and proportionally less for columns of small ratios such as
+  p(ZCTA | race). Those ratios lose relative precision, though, so BISG
+  and BIFSG posteriors computed from quantized tables can move by a few
+  hundredths for rare ZCTAs and names; float32 tables keep the posteriors
+  within about 1e-6 of float64.
+
+"""
+
+import numpy as np
+import pandas as pd
+
+from surgeo.utility.surgeo_exception import SurgeoException
+
+
+# The precisions a table can be stored at
+DTYPES = ('float64', 'float32', 'uint16')
+
+# Largest quantized code; the code above it marks a missing value
+QUANTIZED_MAX = 65534
+
+QUANTIZED_MISSING = 65535
+
+
+class ProbabilityStore(object):
+    """The probability rows of a lookup table, plus a sentinel row of NaNs.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        The (rows, k) probabilities of a table
+    dtype : str, optional
+        The storage precision: "float64" (the default), "float32", or
+        "uint16" (see the module documentation for the error bounds)
+
+    """
+
+    def __init__(self, values: np.ndarray, dtype='float64'):
+        self.dtype = check_dtype(dtype)
+        values = np.asarray(values, dtype=np.float64)
+        self.column_max = np.fmax.reduce(
+            np.abs(values),
+            axis=0,
+            initial=0.0,
+        )
+        if self.dtype == 'uint16':
+            self._scale = np.where(
+                self.column_max > 0,
+                self.column_max / QUANTIZED_MAX,
+                1.0,
+            )
+            codes = np.clip(np.rint(values / self._scale), 0, QUANTIZED_MAX)
+            codes[np.isnan(values)] = QUANTIZED_MISSING
+            sentinel_row = np.full((1, values.shape[1]), QUANTIZED_MISSING)
+            stored = np.concatenate([codes, sentinel_row]).astype(np.uint16)
+            stored.flags.writeable = False
+            self._values = stored
+            self._scale = self._scale.astype(np.float32)
+        else:
+            self._scale = None
+            self._values = _with_sentinel(values.astype(self.dtype))
+
+    @property
+    def output_dtype(self):
+        """The float dtype of gathered rows"""
+        if self.dtype == 'float64':
+            return np.dtype(np.float64)
+        return np.dtype(np.float32)
+
+    @property
+    def nbytes(self):
+        """The memory used by the stored probabilities"""
+        return self._values.nbytes
+
+    @property
+    def max_error(self) -> np.ndarray:
+        """The largest absolute error of each column versus float64"""
+        # Rounding to float32 (relative error 2**-24)
+        rounding = self.column_max * 2.0 ** -24
+        if self.dtype == 'float64':
+            return np.zeros_like(self.column_max)
+        if self.dtype == 'float32':
+            return rounding
+        # Half a quantization step, plus rounding the scale and product
+        return self._scale.astype(np.float64) / 2 + 2 * rounding
+
+    def take(self, positions: np.ndarray) -> np.ndarray:
+        """Gather the (N, k) probability rows at positions"""
+        rows = np.take(self._values, positions, axis=0)
+        if self._scale is None:
+            return rows
+        # Dequantize, restoring the missing values
+        dequantized = rows.astype(np.float32)
+        dequantized *= self._scale
+        dequantized[rows == QUANTIZED_MISSING] = np.nan
+        return dequantized
+
+
+def check_dtype(dtype) -> str:
+    """Return the name of a supported storage dtype, or raise an error"""
+    try:
+        name = np.dtype(dtype).name
+    except TypeError:
+        name = None
+    if name not in DTYPES:
+        raise SurgeoException(
+            f'dtype must be one of {", ".join(DTYPES)}, not {dtype!r}.'
+        )
+    return name
+
+
+class ZctaIndex(object):
+    """Direct-addressed index of a ZCTA-indexed lookup dataframe.
+
+    ZCTAs are five digit numbers, so every possible ZCTA has its own slot
+    in a 100,000 element array holding the position of its table row.
+    Looking up a column of ZCTAs is then a pair of array gathers.
+
+    Parameters
+    ----------
+    table : pd.DataFrame
+        A lookup dataframe indexed by 00000-formatted ZCTA strings
+    dtype : str, optional
+        The storage precision of the probabilities (see ProbabilityStore)
+
+    """
+
+    SIZE = 100_000
+
+    def __init__(self, table: pd.DataFrame, dtype='float64'):
+        self.columns = list(table.columns)
+        self.index_name = table.index.name
+        values = table.to_numpy(dtype=np.float64)
+        # The sentinel row (all NaN) sits after the last table row
+        self.sentinel = len(values)
+        self.store = ProbabilityStore(values, dtype)
+        # One slot per ZCTA plus a final slot for unparseable keys (-1)
+        self._slots = np.full(self.SIZE + 1, self.sentinel, dtype=np.int64)
+        keys = zcta_keys(table.index)
+        rows = np.arange(len(keys))
+        found = keys >= 0
+        # Assign in reverse so the first duplicate of a ZCTA wins
+        self._slots[keys[found][::-1]] = rows[found][::-1]
+        self._slots[-1] = self.sentinel
+        self._slots.flags.writeable = False
+
+    @property
+    def nbytes(self):
+        """The memory used by the slots and probabilities"""
+        return self._slots.nbytes + self.store.nbytes
+
+    def positions(self, keys: np.ndarray) -> np.ndarray:
+        """Return table row positions (or the sentinel) for integer ZCTAs"""
+        return self._slots[keys]
+
+    def take(self, positions: np.ndarray) -> np.ndarray:
+        """Gather the (N, k) probability rows at positions"""
+        return self.store.take(positions)
+
+
+class TractIndex(object):
+    """Sorted-key index of a State/County/Tract-indexed lookup dataframe.
+
+    Each census tract is identified by its 11 digit GEOID: the two digit
+    state FIPS code, three digit county FIPS code, and six digit tract code
+    packed into a single int64. The table rows are stored sorted by GEOID
+    and keys are resolved with a binary search (np.searchsorted).
+
+    Parameters
+    ----------
+    table : pd.DataFrame
+        A lookup dataframe indexed by ('state', 'county', 'tract') strings
+    dtype : str, optional
+        The storage precision of the probabilities (see ProbabilityStore)
+
+    """
+
+    def __init__(self, table: pd.DataFrame, dtype='float64'):
+        self.columns = list(table.columns)
+        keys, _ = tract_keys([
+            table.index.get_level_values(level)
+            for level in range(table.index.nlevels)
+        ])
+        found = keys >= 0
+        # Sort the parseable rows by GEOID (stable, so first duplicate wins)
+        order = np.flatnonzero(found)[np.argsort(keys[found], kind='stable')]
+        sorted_keys = keys[order]
+        unique = np.ones(len(sorted_keys), dtype=bool)
+        unique[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        self._keys = sorted_keys[unique]
+        self._keys.flags.writeable = False
+        values = table.to_numpy(dtype=np.float64)[order[unique]]
+        self.sentinel = len(values)
+        self.store = ProbabilityStore(values, dtype)
+
+    @property
+    def nbytes(self):
+        """The memory used by the keys and probabilities"""
+        return self._keys.nbytes + self.store.nbytes
+
+    def positions(self, keys: np.ndarray) -> np.ndarray:
+        """Return table row positions (or the sentinel) for packed GEOIDs"""
+        if self.sentinel == 0:
+            return np.zeros(len(keys), dtype=np.int64)
+        positions = np.searchsorted(self._keys, keys)
+        # Keys past the end or not equal to their insertion point are misses
+        clipped = np.minimum(positions, self.sentinel - 1)
+        found = (positions < self.sentinel) & (self._keys[clipped] == keys)
+        return np.where(found, positions, self.sentinel)
+
+    def take(self, positions: np.ndarray) -> np.ndarray:
+        """Gather the (N, k) probability rows at positions"""
+        return self.store.take(positions)
+
+
+class NameIndex(object):
+    """Sorted fixed-width byte-string index of a name-indexed dataframe.
+
+    The names are encoded as UTF-8 and stored as one sorted, fixed-width
+    bytes array (NumPy "S" dtype) alongside a contiguous float matrix of
+    probabilities. This is far smaller than an Index of Python strings,
+    and a column of names is joined with one np.searchsorted and a gather.
+
+    Parameters
+    ----------
+    table : pd.DataFrame
+        A lookup dataframe indexed by normalized name strings
+    dtype : str, optional
+        The storage precision of the probabilities (see ProbabilityStore)
+
+    """
+
+    def __init__(self, table: pd.DataFrame, dtype='float64'):
+        self.columns = list(table.columns)
+        keys = _encode_names(table.index)
+        # Sort by name (stable, so the first duplicate of a name wins)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        unique = np.ones(len(sorted_keys), dtype=bool)
+        unique[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        self._keys = sorted_keys[unique]
+        self._keys.flags.writeable = False
+        values = table.to_numpy(dtype=np.float64)[order[unique]]
+        self.sentinel = len(values)
+        self.store = ProbabilityStore(values, dtype)
+
+    @property
+    def nbytes(self):
+        """The memory used by the keys and probabilities"""
+        return self._keys.nbytes + self.store.nbytes
+
+    def positions(self, names) -> np.ndarray:
+        """Return table row positions (or the sentinel) for name strings"""
+        if self.sentinel == 0:
+            return np.zeros(len(names), dtype=np.int64)
+        encoded = [str(name).encode('utf-8') for name in names]
+        # Names that cannot fit the key width (or hold NULs) are misses
+        width = self._keys.dtype.itemsize
+        fits = np.array(
+            [len(name) <= width and b'\0' not in name for name in encoded],
+            dtype=bool,
+        )
+        keys = np.array(
+            [name if fit else b'' for name, fit in zip(encoded, fits)],
+            dtype=self._keys.dtype,
+        )
+        positions = np.searchsorted(self._keys, keys)
+        clipped = np.minimum(positions, self.sentinel - 1)
+        found = fits & (positions < self.sentinel)
+        found &= self._keys[clipped] == keys
+        return np.where(found, positions, self.sentinel)
+
+    def take(self, positions: np.ndarray) -> np.ndarray:
+        """Gather the (N, k) probability rows at positions"""
+        return self.store.take(positions)
+
+
+# The digits making up a GEOID, most significant first
+TRACT_PARTS = (('state', 2), ('county', 3), ('tract', 6))
+
+GEOID_WIDTH = sum(width for _, width in TRACT_PARTS)
+
+
+def tract_keys(parts):
+    """Pack state/county/tract codes into int64 GEOIDs (-1 if unparseable).
+
+    Parameters
+    ----------
+    parts : list of array-like
+        Either three columns (state, county, tract) of ints or strings,
+        which are zero-padded to 2, 3, and 6 digits, or a single column of
+        11 digit GEOIDs
+
+    Returns
+    -------
+    tuple of (np.ndarray, list of pd.Series)
+        An int64 array of packed GEOIDs (-1 where unparseable), and the
+        zero-padded state, county, and tract strings
+
+    """
+    if len(parts) == 1:
+        keys, padded = digit_keys(parts[0], GEOID_WIDTH)
+        # Split each GEOID into its parts (missing if unparseable)
+        padded_parts = []
+        start = 0
+        for _, width in TRACT_PARTS:
+            part = padded.str[start:start + width].where(keys >= 0)
+            padded_parts.append(part)
+            start += width
+        return keys, padded_parts
+    keys = np.zeros(len(parts[0]), dtype=np.int64)
+    found = np.ones(len(parts[0]), dtype=bool)
+    padded_parts = []
+    for values, (_, width) in zip(parts, TRACT_PARTS):
+        part_keys, padded = digit_keys(values, width)
+        keys = keys * 10 ** width + part_keys
+        found &= part_keys >= 0
+        padded_parts.append(padded)
+    return np.where(found, keys, -1), padded_parts
+
+
+def digit_keys(values, width):
+    """Parse codes of at most width digits into integers.
+
+    Integers, integral floats, and digit strings (with surrounding
+    whitespace) are accepted. The work is done once per unique value and
+    broadcast back to the rows.
+
+    Parameters
+    ----------
+    values : array-like
+        Codes to parse
+    width : int
+        The maximum number of digits in a code
+
+    Returns
+    -------
+    tuple of (np.ndarray, pd.Series)
+        The int64 code of each value (-1 if unparseable), and each value
+        as a zero-padded string (or the original value if unparseable)
+
+    """
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    # Missing values take code -1, which selects this appended NaN
+    uniques = pd.Series(list(uniques) + [np.nan], dtype=object)
+    extracted = (
+        uniques.astype(str)
+               .str.strip()
+               .str.extract(rf'^(\d{{1,{width}}})(?:\.0*)?$', expand=False)
+    )
+    unique_keys = pd.to_numeric(extracted).fillna(-1).to_numpy(dtype=np.int64)
+    padded = extracted.str.zfill(width).where(unique_keys >= 0, uniques)
+    return unique_keys[codes], padded.take(codes).reset_index(drop=True)
+
+
+def zcta_keys(zctas) -> np.ndarray:
+    """Parse ZIPs/ZCTAs into integers, with -1 for anything unparseable.
+
+    Integers, integral floats, and strings of up to five digits are
+    accepted, as are ZIP+4 strings such as "63144-1234". Surrounding
+    whitespace is ignored.
+
+    Parameters
+    ----------
+    zctas : array-like
+        Values to parse (ints, floats, strings, or a mixture)
+
+    Returns
+    -------
+    np.ndarray
+        An int64 array of ZCTAs in [0, 99999], or -1 where unparseable
+
+    """
+    extracted = (
+        pd.Series(np.asarray(zctas, dtype=object), dtype=object)
+          .astype(str)
+          .str.strip()
+          .str.extract(r'^(\d{1,5})(?:-\d{4}|\.0*)?$', expand=False)
+    )
+    keys = (
+        pd.to_numeric(extracted)
+          .fillna(-1)
+          .to_numpy(dtype=np.int64)
+    )
+    return keys
+
+
+def _encode_names(names) -> np.ndarray:
+    """Encode names as a fixed-width UTF-8 bytes array"""
+    encoded = [str(name).encode('utf-8') for name in names]
+    width = max([len(name) for name in encoded] + [1])
+    return np.array(encoded, dtype=f'S{width}')
+
+
+def _with_sentinel(values: np.ndarray) -> np.ndarray:
+    """Append a read-only row of NaNs to a table of probabilities"""
+    sentinel_row = np.full((1, values.shape[1]), np.nan, dtype=values.dtype)
+    stacked = np.concatenate([values, sentinel_row])
+    stacked.flags.writeable = False
+    return stacked
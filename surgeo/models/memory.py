@@ -0,0 +1,207 @@
+"""Contains a planner that estimates the peak memory of scoring N rows.
+
+A run's memory is the model's lookup tables (see the models'
+memory_usage()) plus a cost per row scored: the input values, their codes
+and table positions, the gathered probability rows, and the output frame.
+The cost per row depends on the inputs (e.g. how long the names are and
+whether they are Python or Arrow strings), so MemoryPlanner measures it
+on a sample with tracemalloc and scales it up. The estimate is padded by
+SAFETY_FACTOR, since allocations outside Python (and fragmentation) are
+not traced.
+
+The planner also turns a memory budget into the largest chunk size that
+keeps a streamed run under it, as the CLI's ``--max-memory`` does.
+
+"""
+
+import math
+import os
+import re
+import sys
+import tracemalloc
+
+from surgeo.utility.surgeo_exception import SurgeoException
+
+
+# Padding applied to the measured cost per row
+SAFETY_FACTOR = 1.25
+
+_UNITS = {'': 1, 'K': 2 ** 10, 'M': 2 ** 20, 'G': 2 ** 30, 'T': 2 ** 40}
+
+
+def parse_bytes(text):
+    """Parse a size such as "512M", "2G", "1.5GB", or "1000000" to bytes"""
+    match = re.fullmatch(
+        r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:I?B)?\s*',
+        str(text),
+        flags=re.IGNORECASE,
+    )
+    if match is None:
+        raise SurgeoException(
+            f'Could not read "{text}" as a size (e.g. 512M or 2G).'
+        )
+    number, unit = match.groups()
+    return int(float(number) * _UNITS[unit.upper()])
+
+
+def format_bytes(nbytes):
+    """Format a byte count in binary units, e.g. "1.5 GiB\""""
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if abs(nbytes) < 1024 or unit == 'GiB':
+            break
+        nbytes /= 1024
+    return f'{nbytes:.0f} {unit}' if unit == 'B' else f'{nbytes:.1f} {unit}'
+
+
+def current_rss():
+    """The memory the process is using now (None if unknown)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            resident_pages = int(statm.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return peak_rss()
+    return resident_pages * os.sysconf('SC_PAGE_SIZE')
+
+
+def peak_rss():
+    """The most memory the process has used (None if unknown)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes, except on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measure_peak(function):
+    """Call a function, returning its result and the memory it allocated
+
+    The allocation is the traced peak above what was in use beforehand.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started:
+            tracemalloc.stop()
+    return result, max(peak - before, 0)
+
+
+class MemoryPlanner(object):
+    """Estimate the peak memory of scoring a number of rows with a model.
+
+    Parameters
+    ----------
+    model : surgeo model
+        Any of the surgeo models
+    bytes_per_row : float, optional
+        The measured cost of a row, if already known. Otherwise call
+        calibrate() before estimating.
+
+    Example
+    -------
+        .. code-block:: python
+
+            model = surgeo.SurgeoModel()
+            planner = MemoryPlanner(model).calibrate(names[:10_000], zctas[:10_000])
+            planner.estimate(10_000_000)
+            planner.chunksize(parse_bytes('2G'))
+
+    """
+
+    def __init__(self, model, bytes_per_row=None):
+        self.model = model
+        self.bytes_per_row = bytes_per_row
+
+    def calibrate(self, *inputs, method='get_probabilities', **kwargs):
+        """Measure the cost per row of scoring a sample of inputs
+
+        Parameters
+        ----------
+        *inputs
+            The arguments of the scoring method (a sample of rows)
+        method : str, optional
+            The model method to score with, e.g. "get_probabilities_tract"
+            for a tract-level GeocodeModel. Defaults to
+            "get_probabilities".
+        **kwargs
+            Keyword arguments of the method (e.g. output="top")
+
+        Returns
+        -------
+        MemoryPlanner
+            The planner itself
+
+        """
+        score = getattr(self.model, method)
+        return self.calibrate_with(
+            lambda: score(*inputs, **kwargs),
+            len(inputs[0]),
+        )
+
+    def calibrate_with(self, function, rows):
+        """Measure the cost per row of a function that processes rows"""
+        if rows < 1:
+            raise SurgeoException('Calibrate with at least one row.')
+        _, allocated = measure_peak(function)
+        self.bytes_per_row = allocated / rows
+        return self
+
+    def estimate(self, rows):
+        """Estimate the peak bytes of scoring rows (tables included)
+
+        Returns a dict of the 'tables' bytes, the 'rows' bytes, and their
+        'total'.
+        """
+        self._check_calibrated()
+        tables = int(self.model.memory_usage().sum())
+        row_bytes = int(math.ceil(self.bytes_per_row * SAFETY_FACTOR * rows))
+        return {
+            'tables': tables,
+            'rows': row_bytes,
+            'total': tables + row_bytes,
+        }
+
+    def chunksize(self, budget, in_use=None):
+        """The most rows a chunk can have to stay within a budget
+
+        Parameters
+        ----------
+        budget : int
+            The most bytes the process may use
+        in_use : int, optional
+            The bytes already in use (tables loaded). Defaults to the
+            process's current memory, or the tables if that is unknown.
+
+        Returns
+        -------
+        int
+            The chunk size
+
+        """
+        self._check_calibrated()
+        if in_use is None:
+            in_use = current_rss()
+        if in_use is None:
+            in_use = int(self.model.memory_usage().sum())
+        available = budget - in_use
+        row_bytes = max(self.bytes_per_row * SAFETY_FACTOR, 1)
+        if available < row_bytes:
+            raise SurgeoException(
+                f'A memory budget of {format_bytes(budget)} leaves no room '
+                f'to score: {format_bytes(in_use)} is already in use.'
+            )
+        return int(available // row_bytes)
+
+    def _check_calibrated(self):
+        """Raise an error if the cost per row is not known"""
+        if self.bytes_per_row is None:
+            raise SurgeoException(
+                'The cost per row is not known: call calibrate() first.'
+            )
@@ -0,0 +1,173 @@
+"""Contains a bounded LRU cache of combined model results.
+
+Online scoring sees the same name/geography combinations again and again.
+The BISG and BIFSG models can keep the combined probabilities of each
+normalized key tuple (e.g. ``('SMITH', 63144)``) in a ResultCache, so
+that a repeated combination skips the table lookups and the combination
+kernel. Lookups and stores take whole lists of keys, so a batch of rows
+is resolved with one pass over its distinct keys.
+
+Each cache remembers the lookup tables (and options) its results were
+computed with. When the model presents different ones, every entry is
+dropped before the lookup.
+
+"""
+
+import collections
+import sys
+import threading
+
+import numpy as np
+
+from surgeo.utility.surgeo_exception import SurgeoException
+
+
+class ResultCache(object):
+    """Least recently used cache of probability rows keyed by tuples.
+
+    Parameters
+    ----------
+    max_entries : int, optional
+        The most entries to keep (unlimited if None)
+    max_bytes : int, optional
+        The most memory to use, as estimated from the sizes of the keys
+        and rows (unlimited if None)
+
+    Attributes
+    ----------
+    hits : int
+        Keys found by lookup()
+    misses : int
+        Keys not found by lookup()
+    evictions : int
+        Entries dropped to stay within the limits
+    invalidations : int
+        Times the cache was emptied because the tables changed
+
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None):
+        for name, limit in [('max_entries', max_entries),
+                            ('max_bytes', max_bytes)]:
+            if limit is not None and (not isinstance(limit, int) or limit < 1):
+                raise SurgeoException(
+                    f'{name} must be a positive integer or None, '
+                    f'not {limit!r}.'
+                )
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = collections.OrderedDict()
+        self._nbytes = 0
+        self._token = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        """The estimated memory used by the entries"""
+        return self._nbytes
+
+    def lookup(self, keys, token):
+        """Find the rows of a list of keys
+
+        Parameters
+        ----------
+        keys : list of tuple
+            The keys to look up
+        token : tuple
+            The tables and options the caller computes results with. If it
+            differs from the previous call's, the cache is emptied first.
+
+        Returns
+        -------
+        tuple of (np.ndarray, list of np.ndarray)
+            A boolean array that is True for each key found, and the rows
+            of the found keys in order
+
+        """
+        found = np.zeros(len(keys), dtype=bool)
+        rows = []
+        with self._lock:
+            self._validate(token)
+            entries = self._entries
+            for position, key in enumerate(keys):
+                row = entries.get(key)
+                if row is not None:
+                    entries.move_to_end(key)
+                    found[position] = True
+                    rows.append(row)
+            hit_count = len(rows)
+            self.hits += hit_count
+            self.misses += len(keys) - hit_count
+        return found, rows
+
+    def store(self, keys, rows):
+        """Add the (len(keys), k) rows of a list of keys
+
+        The least recently used entries are evicted to stay within the
+        limits.
+        """
+        with self._lock:
+            entries = self._entries
+            for key, row in zip(keys, rows):
+                # Copy so that an entry does not keep the whole block alive
+                row = row.copy()
+                if key in entries:
+                    self._nbytes -= _entry_bytes(key, entries[key])
+                entries[key] = row
+                entries.move_to_end(key)
+                self._nbytes += _entry_bytes(key, row)
+            self._evict()
+
+    def clear(self):
+        """Drop every entry (the counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def stats(self):
+        """The counters, size, and limits of the cache as a dict"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'entries': len(self._entries),
+            'bytes': self._nbytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+        }
+
+    def _validate(self, token):
+        """Empty the cache if the results were computed from other tables"""
+        if self._token is not None and self._token != token:
+            self._entries.clear()
+            self._nbytes = 0
+            self.invalidations += 1
+        self._token = token
+
+    def _evict(self):
+        """Drop least recently used entries until within the limits"""
+        entries = self._entries
+        while entries and (
+            (self.max_entries is not None and len(entries) > self.max_entries)
+            or (self.max_bytes is not None and self._nbytes > self.max_bytes)
+        ):
+            key, row = entries.popitem(last=False)
+            self._nbytes -= _entry_bytes(key, row)
+            self.evictions += 1
+
+
+def _entry_bytes(key, row):
+    """Estimate the memory held by one entry"""
+    return (
+        sys.getsizeof(key)
+        + sum(sys.getsizeof(part) for part in key)
+        + sys.getsizeof(row)
+    )
@@ -4,6 +4,7 @@ import pandas as pd
 from typing import Union
 
 from surgeo.models.base_model import BaseModel
+from surgeo.models.kernels import combine_probabilities
 from surgeo.utility.surgeo_exception import SurgeoException
 
 
@@ -20,6 +21,28 @@ class SurgeoModel(BaseModel):
        multiplying probabilities, checking input values, and obtaining
        ZCTA/name data components.
 
+    Parameters
+    ----------
+    geo_level : str, optional
+        "ZCTA" (the default) or "TRACT"
+    log_space : bool, optional
+        Multiply the component probabilities in log space (see
+        surgeo.models.kernels), which avoids underflow for rows whose
+        probabilities are all very small. Defaults to False.
+    dtype : str, optional
+        The precision of the lookup tables: "float64" (the default),
+        "float32", or "uint16" (quantized). The probabilities returned are
+        float32 unless the tables are float64. See
+        surgeo.models.lookup_index for the error bounds.
+    cache_entries : int, optional
+        Keep the probabilities of up to this many normalized key tuples in
+        an LRU cache (see surgeo.models.result_cache), so that repeated
+        combinations skip the lookups and the combination. The cache is off
+        unless cache_entries or cache_bytes is given; its counters are on
+        the result_cache attribute.
+    cache_bytes : int, optional
+        Limit the (estimated) memory of the cache to this many bytes
+
     Notes
     -----
     The surname probability dataframe for this model is identical to that
@@ -68,16 +91,100 @@ class SurgeoModel(BaseModel):
         69. `<https://link.springer.com/article/10.1007/s10742-009-0047-1>`_
 
     """
-    def __init__(self, geo_level="ZCTA"):
-        super().__init__()
+    def __init__(self, geo_level="ZCTA", log_space=False, dtype='float64',
+                 cache_entries=None, cache_bytes=None):
+        super().__init__(dtype=dtype)
         self.geo_level = geo_level.upper()
-        if geo_level == "TRACT":
-            self._PROB_GEO_GIVEN_RACE = self._get_prob_race_given_tract()
+        self.log_space = log_space
+        if self.geo_level == "TRACT":
+            self._RACE_GIVEN_TRACT_INDEX = self._get_race_given_tract_index()
         else:
-            self._PROB_GEO_GIVEN_RACE = self._get_prob_zcta_given_race()
-        self._PROB_RACE_GIVEN_SURNAME = self._get_prob_race_given_surname()
+            self._ZCTA_GIVEN_RACE_INDEX = self._get_zcta_given_race_index()
+        self._RACE_GIVEN_SURNAME_INDEX = self._get_race_given_surname_index()
+        self.result_cache = self._create_cache(cache_entries, cache_bytes)
+
+    def _worker_kwargs(self):
+        """Recreate the model at the same geography level in a worker"""
+        return {
+            **super()._worker_kwargs(),
+            'geo_level': self.geo_level,
+            'log_space': self.log_space,
+            **self._cache_kwargs(),
+        }
+
+    @property
+    def races(self):
+        """The race of each column of score_arrays() results"""
+        return list(self._RACE_GIVEN_SURNAME_INDEX.columns)
+
+    def score_arrays(self, names, geo):
+        """Obtain BISG probabilities for arrays of surnames and geographies
+
+        A lower-level counterpart of get_probabilities() for NumPy and
+        pyarrow inputs, which builds no dataframe: the component rows are
+        gathered into arrays and combined in place (see also
+        surgeo.models.batches.score_batches()).
+
+        Parameters
+        ----------
+        names : np.ndarray or pyarrow.Array
+            Surnames to score (pyarrow ChunkedArrays and pd.Series are
+            accepted too)
+        geo : np.ndarray or pyarrow.Array, or a tuple of them
+            ZIPs/ZCTAs, or (at the TRACT level) either 11 digit GEOIDs or
+            a (state, county, tract) tuple of arrays
+
+        Returns
+        -------
+        tuple of (np.ndarray, np.ndarray)
+            A C-contiguous (N, 6) float array of probabilities with columns
+            in the order of self.races (NaN where the result is not found), and
+            a boolean array that is True where both the name and the geography were found
 
-    def get_probabilities(self, names, geo_df):
+        """
+        self._check_inputs(
+            names,
+            geo[0] if isinstance(geo, (list, tuple)) else geo,
+        )
+        races = self.races
+        if self.result_cache is not None:
+            components = self._components(names, geo)[2]
+            with self._stage('combine', len(names)):
+                return self._cached_combine(components, races, self.log_space)
+        name_index = self._RACE_GIVEN_SURNAME_INDEX
+        _, _, name_positions = self._lookup_names(
+            self._as_array(names),
+            name_index,
+        )
+        if self.geo_level == 'TRACT':
+            geo_index = self._RACE_GIVEN_TRACT_INDEX
+            geo_positions = self._lookup_tract_arrays(geo, geo_index)
+        else:
+            geo_index = self._ZCTA_GIVEN_RACE_INDEX
+            _, _, geo_positions = self._lookup_zctas(
+                self._as_array(geo),
+                geo_index,
+            )
+        with self._stage('gather', len(name_positions)):
+            factors = [
+                self._take_races(name_index, name_positions, races),
+                self._take_races(geo_index, geo_positions, races),
+            ]
+        # The gathered rows are fresh arrays, so combine into the first
+        with self._stage('combine', len(name_positions)):
+            probs = combine_probabilities(
+                factors,
+                out=factors[0],
+                log_space=self.log_space,
+            )
+        matched = (
+            (name_positions != name_index.sentinel)
+            & (geo_positions != geo_index.sentinel)
+        )
+        return probs, matched
+
+    def get_probabilities(self, names, geo_df, n_jobs=1, output='full',
+                          entropy=False):
         """Obtain a set of BISG probabilities for name/ZCTA series
 
         This method first takes the data and checks to see if the data is
@@ -95,6 +202,18 @@ class SurgeoModel(BaseModel):
             A series of names to use for the BISG algorithm
         geo_df : Union[pd.Series, pd.DataFrame]
             A series of target ZIP/ZCTA codes or State County Tract for the BISG algorithm
+            (either three columns or a single column of 11 digit GEOIDs)
+        n_jobs : int, optional
+            The number of worker processes to score contiguous blocks of
+            rows in (-1 for one per core). The default of 1 scores in the
+            calling process.
+        output : str, optional
+            "full" (the default) for the probability of every race, or
+            "top" for only the most likely race: a categorical 'race'
+            column and its 'probability'
+        entropy : bool, optional
+            With output="top", also add each row's normalized 'entropy'
+            (0 for one certain race, 1 for all races equally likely)
 
         Returns
         -------
@@ -105,31 +224,125 @@ class SurgeoModel(BaseModel):
 
         # Check inputs
         self._check_inputs(names, geo_df)
-        # Get component probabilities
-        sur_probs = self._get_surname_probs(names)
-        geo_probs = self._get_geocode_probs(geo_df)
-        # Run Surgeo algorithm
-        surgeo_probs = self._combined_probs(sur_probs, geo_probs)
+        self._check_output(output)
+        # Score contiguous blocks in worker processes if requested
+        if n_jobs != 1:
+            return self._map_blocks(
+                'get_probabilities',
+                (names, geo_df),
+                n_jobs,
+                output=output,
+                entropy=entropy,
+            )
+        if self.result_cache is not None:
+            # Combine each distinct name/geography once, through the cache
+            sur_probs, geo_probs, surgeo_probs = self._cached_probs(
+                names,
+                geo_df,
+                output,
+                entropy,
+            )
+        else:
+            # Get component probabilities
+            sur_probs = self._get_surname_probs(names)
+            geo_probs = self._get_geocode_probs(geo_df)
+            # Run Surgeo algorithm
+            with self._stage('combine', len(sur_probs)):
+                surgeo_probs = self._combined_probs(
+                    sur_probs,
+                    geo_probs,
+                    output,
+                    entropy,
+                )
         # Combine inputs with results and adjust as necessary
-        result = self._adjust_frame(
-            sur_probs,
-            geo_probs,
-            surgeo_probs,
-        )
+        with self._stage('adjust', len(surgeo_probs)):
+            result = self._adjust_frame(
+                sur_probs,
+                geo_probs,
+                surgeo_probs,
+            )
         return result
 
     def _combined_probs(self,
                         sur_probs: pd.DataFrame,
-                        geo_probs: pd.DataFrame) -> pd.DataFrame:
+                        geo_probs: pd.DataFrame,
+                        output='full',
+                        entropy=False) -> pd.DataFrame:
         """Performs the BISG calculation"""
-        # Calculate each of the numerators
-        surgeo_numer = sur_probs.iloc[:, 1:] * geo_probs.iloc[:, 1:]
-        # Calculate the denominator
-        surgeo_denom = surgeo_numer.sum(axis=1)
-        # Caluclate the surgeo probabilities (each num / denom)
-        surgeo_probs = surgeo_numer.div(surgeo_denom, axis=0)
+        # Take the race columns of each component in the same order
+        races = sur_probs.columns[1:]
+        factors = [
+            sur_probs[races].to_numpy(),
+            geo_probs[races].to_numpy(),
+        ]
+        # Multiply, sum, and divide in one preallocated buffer, then keep
+        # every race or only the top one
+        surgeo_probs = self._probs_frame(
+            combine_probabilities(factors, log_space=self.log_space),
+            races,
+            sur_probs.index,
+            output,
+            entropy,
+        )
         return surgeo_probs
 
+    def _components(self, names, geo_df):
+        """Normalize the inputs into components for _cached_combine()
+
+        Returns the normalized names and geography key columns of each row
+        and the surname and geography components.
+        """
+        name_codes, normalized_names, name_component = self._name_component(
+            self._as_array(names),
+            self._RACE_GIVEN_SURNAME_INDEX,
+        )
+        name_frame = pd.DataFrame(
+            {'name': normalized_names.take(name_codes).array},
+            index=getattr(names, 'index', None),
+        )
+        if self.geo_level == 'TRACT':
+            if isinstance(geo_df, (list, tuple)):
+                geo_df = pd.concat(
+                    [pd.Series(self._as_array(part)) for part in geo_df],
+                    axis=1,
+                )
+            elif not isinstance(geo_df, (pd.Series, pd.DataFrame)):
+                geo_df = pd.Series(self._as_array(geo_df))
+            geo_frame, keys = self._factorize_tracts(geo_df)
+            geo_component = self._tract_component(
+                keys,
+                self._RACE_GIVEN_TRACT_INDEX,
+            )
+        else:
+            geo_codes, normalized_geo, geo_component = self._zcta_component(
+                self._as_array(geo_df),
+                self._ZCTA_GIVEN_RACE_INDEX,
+            )
+            geo_frame = pd.DataFrame(
+                {'zcta5': normalized_geo.take(geo_codes).array},
+                index=getattr(geo_df, 'index', None),
+            )
+        return name_frame, geo_frame, [name_component, geo_component]
+
+    def _cached_probs(self, names, geo_df, output='full', entropy=False):
+        """Perform the BISG calculation through the result cache
+
+        Returns frames of the normalized names and geography keys (as
+        _adjust_frame() expects) and of the results.
+        """
+        name_frame, geo_frame, components = self._components(names, geo_df)
+        races = self.races
+        with self._stage('combine', len(name_frame)):
+            probs, _ = self._cached_combine(components, races, self.log_space)
+            surgeo_probs = self._probs_frame(
+                probs,
+                races,
+                name_frame.index,
+                output,
+                entropy,
+            )
+        return name_frame, geo_frame, surgeo_probs
+
     def _adjust_frame(self,
                       sur_probs: pd.DataFrame,
                       geo_probs: pd.DataFrame,
@@ -163,17 +376,10 @@ class SurgeoModel(BaseModel):
     def _get_surname_probs(self,
                            names: pd.Series) -> pd.DataFrame:
         """Normalizes names and joins names to their race probabilities."""
-        # Normalize names
-        normalized_names = (
-            self._normalize_names(names)
-                .to_frame()
-        )
-        # Merge names to dataframe, which gives probs for each name
-        surname_probs = normalized_names.merge(
-            self._PROB_RACE_GIVEN_SURNAME,
-            left_on='name',
-            right_index=True,
-            how='left',
+        # Normalize and join each distinct name once, then broadcast
+        surname_probs = self._get_name_probs(
+            names,
+            self._RACE_GIVEN_SURNAME_INDEX,
         )
         return surname_probs
 
@@ -181,25 +387,15 @@ class SurgeoModel(BaseModel):
         """Normalizes ZCTAs/ZIPs and joins them to their race probs."""
         # Normalize
         if self.geo_level == 'TRACT':
-            normalized_tracts = (
-                self._normalize_tracts(geo_df)
-            )
-            geocode_probs = normalized_tracts.merge(
-                self._PROB_GEO_GIVEN_RACE,
-                left_on=['state','county','tract'],
-                right_index=True,
-                how='left',
+            # Pack tracts into GEOIDs and binary search their probs
+            geocode_probs = self._get_tract_probs(
+                geo_df,
+                self._RACE_GIVEN_TRACT_INDEX,
             )
-        else: 
-            normalized_zctas = (
-                self._normalize_zctas(geo_df)
-                    .to_frame()
-            )
-            # Merge names to dataframe, which gives probs for each name.
-            geocode_probs = normalized_zctas.merge(
-                self._PROB_GEO_GIVEN_RACE,
-                left_on='zcta5',
-                right_index=True,
-                how='left',
+        else:
+            # Gather the probs for each ZCTA from the direct-addressed index
+            geocode_probs = self._get_zcta_probs(
+                geo_df,
+                self._ZCTA_GIVEN_RACE_INDEX,
             )
         return geocode_probs
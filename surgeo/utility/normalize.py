@@ -0,0 +1,104 @@
+"""Module containing the name normalizer used by the models.
+
+Names are normalized in a manner consistent with Word et. al (2007):
+whitespace, punctuation, and digits are removed, the name is upper-cased,
+and "JR", "SR", "III", and "IV" suffixes are stripped from its tail. The
+models used to do this with a chain of pandas string methods, each of
+which walked the whole column; here each string is handled in a single
+pass with one precompiled pattern.
+
+Example
+-------
+    .. code-block:: python
+
+        >>> import surgeo
+        >>> surgeo.normalize.names(['Davis Jr. ', ' Mapother IV', None])
+        array(['DAVIS', 'MAPOTHER', ''], dtype=object)
+
+"""
+
+import re
+import string
+
+import numpy as np
+import pandas as pd
+
+
+# Table deleting every digit, punctuation, and whitespace character
+_UNWANTED_CHARACTERS = str.maketrans(
+    '',
+    '',
+    string.digits + string.punctuation + string.whitespace,
+)
+
+# The suffixes in the order they were historically stripped (JR first,
+# then SR, III, and IV), so they appear in reverse order in the string.
+_SUFFIXES = re.compile(
+    r'(?:\s?IV\s*)?'
+    r'(?:\s?III\s*)?'
+    r'(?:\s?S\.*R\.*\s*)?'
+    r'(?:\s?J\.*R\.*\s*)?'
+    r'$'
+)
+
+
+def name(value: str) -> str:
+    """Normalize a single name string
+
+    Parameters
+    ----------
+    value : str
+        The raw name
+
+    Returns
+    -------
+    str
+        The normalized name (e.g. "Dav 3idson Jr." becomes "DAVIDSON")
+
+    """
+    cleaned = value.translate(_UNWANTED_CHARACTERS).upper()
+    return _SUFFIXES.sub('', cleaned, count=1)
+
+
+def names(values) -> np.ndarray:
+    """Normalize an array of names
+
+    Parameters
+    ----------
+    values : array-like
+        Raw names. Missing values become empty strings (remember "NAN" is
+        a valid name); other non-string values are converted with str().
+
+    Returns
+    -------
+    np.ndarray
+        An object array of normalized names, one per input value
+
+    """
+    codes, normalized = factorize_names(values)
+    return normalized[codes]
+
+
+def factorize_names(values):
+    """Normalize the distinct values of an array of names
+
+    Parameters
+    ----------
+    values : array-like
+        Raw names, as for names()
+
+    Returns
+    -------
+    tuple of (np.ndarray, np.ndarray)
+        The integer code of each value, and an object array holding the
+        normalized name of each code. Missing values take code -1, which
+        selects an appended empty name.
+
+    """
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    # Non-strings are converted the same way pandas' astype(str) does
+    unique_strings = pd.Series(uniques, dtype=object).astype(str).tolist()
+    normalized = np.empty(len(unique_strings) + 1, dtype=object)
+    normalized[:-1] = [name(value) for value in unique_strings]
+    normalized[-1] = ''
+    return codes, normalized
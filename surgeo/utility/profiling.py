@@ -0,0 +1,154 @@
+"""Module containing the stage profiler the models and CLI report to.
+
+A model with a profiler (see ``BaseModel.profile()``) times each stage of
+its scoring: normalizing the inputs, finding them in the tables (join),
+gathering their rows, combining the components, and assembling the output
+frame. The CLI adds the loading and writing of the data. Each stage
+records its wall time, its row count, and, if memory tracing is on, the
+most memory it allocated beyond what was in use when it started.
+
+Models without a profiler skip all of this: each stage costs one
+attribute check per call, not per row.
+
+A profiler is not thread-safe. Stages scored in worker processes (with
+n_jobs) are not seen by the profiler of the calling process.
+
+"""
+
+import contextlib
+import time
+import tracemalloc
+
+
+class StageProfiler(object):
+    """Records the time, rows, and memory of named stages.
+
+    Parameters
+    ----------
+    callback : callable, optional
+        Called with the record (a dict) of each stage as it ends
+    trace_memory : bool, optional
+        Measure the memory each stage allocates with tracemalloc, which
+        slows down Python allocations while on. Defaults to False.
+
+    Attributes
+    ----------
+    records : list of dict
+        One record per stage run, in the order they ended: the 'stage'
+        name, 'seconds', 'rows', 'allocated_bytes' (None without memory
+        tracing), and 'depth' (0 unless inside another stage)
+    peak_bytes : int or None
+        The most memory traced during any stage (None without memory
+        tracing)
+
+    Example
+    -------
+        .. code-block:: python
+
+            model = surgeo.SurgeoModel()
+            with model.profile() as profiler:
+                model.get_probabilities(names, zctas)
+            print(profiler.summary())
+
+    """
+
+    def __init__(self, callback=None, trace_memory=False):
+        self.callback = callback
+        self.trace_memory = trace_memory
+        self.records = []
+        self.peak_bytes = None
+        self._open = []
+        self._started_tracing = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        """Start memory tracing (if requested and not already on)"""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        """Stop memory tracing if this profiler started it"""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextlib.contextmanager
+    def stage(self, name, rows=None):
+        """Time the body of a with block as one run of a stage
+
+        The stage's record is yielded, so that a row count only known
+        once the stage has run can be filled in.
+        """
+        record = {'stage': name, 'rows': rows}
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            # Keep the peak so far for the enclosing stages, then measure
+            # this stage's own peak
+            self._update_peaks(peak)
+            tracemalloc.reset_peak()
+        else:
+            current = 0
+        frame = {'start': current, 'peak': current}
+        self._open.append(frame)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            record['allocated_bytes'] = None
+            if tracing:
+                self._update_peaks(tracemalloc.get_traced_memory()[1])
+                record['allocated_bytes'] = frame['peak'] - frame['start']
+            self._open.pop()
+            record['depth'] = len(self._open)
+            self.records.append(record)
+            if self.callback is not None:
+                self.callback(record)
+
+    def _update_peaks(self, peak):
+        """Raise the peak of the open stages (and overall) to peak"""
+        for frame in self._open:
+            frame['peak'] = max(frame['peak'], peak)
+        self.peak_bytes = max(self.peak_bytes or 0, peak)
+
+    def summary(self):
+        """Total each stage's runs, in the order the stages first ended
+
+        Returns a dict of stage name to its 'calls', total 'seconds',
+        total 'rows', and largest 'allocated_bytes'.
+        """
+        stages = {}
+        for record in self.records:
+            totals = stages.setdefault(record['stage'], {
+                'calls': 0,
+                'seconds': 0.0,
+                'rows': 0,
+                'allocated_bytes': None,
+            })
+            totals['calls'] += 1
+            totals['seconds'] += record['seconds']
+            totals['rows'] += record['rows'] or 0
+            if record['allocated_bytes'] is not None:
+                totals['allocated_bytes'] = max(
+                    totals['allocated_bytes'] or 0,
+                    record['allocated_bytes'],
+                )
+        return stages
+
+    def report(self, **details):
+        """A JSON-serializable report of the stages (plus any details)"""
+        return {
+            **details,
+            'trace_memory': self.trace_memory,
+            'peak_bytes': self.peak_bytes,
+            'stages': self.summary(),
+            'records': self.records,
+        }
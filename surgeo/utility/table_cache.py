@@ -0,0 +1,216 @@
+"""Module containing a compiled on-disk cache for the lookup tables.
+
+Parsing the CSV files in ``surgeo/data`` dominates model construction time
+for small batches. This module stores each parsed lookup table as a
+versioned ``.npz`` bundle that loads in milliseconds. Each bundle records
+the size, modification time, and SHA-256 digest of the CSV it was compiled
+from; a bundle that does not match its CSV is ignored and rebuilt, and one
+whose CSV was only touched is rewritten with the new modification time.
+
+Bundles are written next to the CSV when the data folder is writable and
+in a user cache folder otherwise (``$SURGEO_CACHE_DIR`` or
+``~/.cache/surgeo``).
+
+"""
+
+import hashlib
+import os
+import pathlib
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+
+# Increment whenever the bundle layout changes
+FORMAT_VERSION = 1
+
+_SUFFIX = f'.v{FORMAT_VERSION}.npz'
+
+
+def _file_mode():
+    """The mode of a new readable-by-all file under the process umask"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o644 & ~umask
+
+
+# Bundles in a shared install must be readable by every user
+_FILE_MODE = _file_mode()
+
+
+def load(csv_path, build):
+    """Load a lookup table from its compiled bundle or build it from CSV.
+
+    Parameters
+    ----------
+    csv_path : pathlib.Path
+        The CSV file the lookup table is parsed from
+    build : callable
+        A zero-argument function that parses the CSV into a DataFrame. It
+        is only called when no valid bundle exists.
+
+    Returns
+    -------
+    pd.DataFrame
+        The lookup table with a string (Multi)Index and float columns
+
+    """
+    csv_path = pathlib.Path(csv_path)
+    # Try every location a bundle could have been written to, preferring
+    # one with the CSV's timestamp over one with only its contents
+    for verify in (False, True):
+        for bundle_path in _bundle_paths(csv_path):
+            frame = _read_bundle(bundle_path, csv_path, verify)
+            if frame is not None:
+                if verify:
+                    # Record the new timestamp so later loads skip the hash
+                    write(csv_path, frame)
+                return frame
+    # Fall back to parsing the CSV, then compile it for next time
+    frame = build()
+    write(csv_path, frame)
+    return frame
+
+
+def write(csv_path, frame):
+    """Compile a parsed lookup table into a bundle next to its CSV.
+
+    Tables that cannot be represented (non-string index levels or
+    non-numeric columns) are silently skipped, as are unwritable folders.
+
+    Parameters
+    ----------
+    csv_path : pathlib.Path
+        The CSV file the lookup table was parsed from
+    frame : pd.DataFrame
+        The parsed lookup table
+
+    Returns
+    -------
+    pathlib.Path or None
+        The path of the written bundle, or None if nothing was written
+
+    """
+    csv_path = pathlib.Path(csv_path)
+    arrays = _to_arrays(frame)
+    if arrays is None:
+        return None
+    stat = csv_path.stat()
+    arrays.update({
+        'format_version': np.array(FORMAT_VERSION),
+        'source_size': np.array(stat.st_size, dtype=np.int64),
+        'source_mtime_ns': np.array(stat.st_mtime_ns, dtype=np.int64),
+        'source_sha256': np.array(checksum(csv_path)),
+    })
+    for bundle_path in _bundle_paths(csv_path):
+        try:
+            bundle_path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file and swap it in atomically
+            handle, temp_name = tempfile.mkstemp(
+                dir=bundle_path.parent,
+                suffix='.tmp',
+            )
+            with os.fdopen(handle, 'wb') as temp_file:
+                np.savez(temp_file, **arrays)
+            # mkstemp() makes files only their owner can read
+            os.chmod(temp_name, _FILE_MODE)
+            os.replace(temp_name, bundle_path)
+            return bundle_path
+        except OSError:
+            continue
+    return None
+
+
+def checksum(csv_path):
+    """Return the SHA-256 hex digest of a data file"""
+    digest = hashlib.sha256()
+    with open(csv_path, 'rb') as csv_file:
+        for block in iter(lambda: csv_file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _bundle_paths(csv_path):
+    """Candidate bundle locations in order of preference"""
+    file_name = csv_path.stem + _SUFFIX
+    cache_dir = os.environ.get('SURGEO_CACHE_DIR')
+    if cache_dir:
+        user_dir = pathlib.Path(cache_dir)
+    else:
+        user_dir = pathlib.Path.home() / '.cache' / 'surgeo'
+    return [csv_path.parent / file_name, user_dir / file_name]
+
+
+def _read_bundle(bundle_path, csv_path, verify):
+    """Return the bundled frame, or None if missing, stale, or corrupt"""
+    if not bundle_path.exists():
+        return None
+    try:
+        with np.load(bundle_path, allow_pickle=False) as bundle:
+            if int(bundle['format_version']) != FORMAT_VERSION:
+                return None
+            if not _is_current(bundle, csv_path, verify):
+                return None
+            return _from_arrays(bundle)
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _is_current(bundle, csv_path, verify):
+    """Check a bundle against the CSV it was compiled from
+
+    A bundle with the CSV's size and timestamp is trusted. Otherwise, if
+    verify is true, its checksum is compared with the CSV's contents.
+    """
+    try:
+        stat = csv_path.stat()
+    except OSError:
+        return False
+    if int(bundle['source_size']) != stat.st_size:
+        return False
+    if int(bundle['source_mtime_ns']) == stat.st_mtime_ns:
+        return True
+    return verify and str(bundle['source_sha256']) == checksum(csv_path)
+
+
+def _to_arrays(frame):
+    """Flatten a lookup table into plain NumPy arrays (or None)"""
+    levels = [
+        frame.index.get_level_values(level)
+        for level in range(frame.index.nlevels)
+    ]
+    if not all(
+        pd.api.types.infer_dtype(level, skipna=False) == 'string'
+        for level in levels
+    ):
+        return None
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in frame.dtypes):
+        return None
+    arrays = {
+        'index_names': np.array([str(name) for name in frame.index.names]),
+        'columns': np.array([str(column) for column in frame.columns]),
+        'values': frame.to_numpy(dtype=np.float64),
+    }
+    for position, level in enumerate(levels):
+        arrays[f'index_{position}'] = np.array(level.tolist(), dtype=str)
+    return arrays
+
+
+def _from_arrays(bundle):
+    """Rebuild a lookup table from the arrays in a bundle"""
+    names = bundle['index_names'].tolist()
+    levels = [bundle[f'index_{position}'] for position in range(len(names))]
+    if len(levels) == 1:
+        index = pd.Index(levels[0].astype(object), name=names[0])
+    else:
+        index = pd.MultiIndex.from_arrays(
+            [level.astype(object) for level in levels],
+            names=names,
+        )
+    frame = pd.DataFrame(
+        bundle['values'],
+        index=index,
+        columns=bundle['columns'].tolist(),
+    )
+    return frame
@@ -1,3 +1,4 @@
+import json
 import os
 import pathlib
 import subprocess
@@ -8,6 +9,11 @@ import unittest
 import numpy as np
 import pandas as pd
 
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
 import surgeo.app.surgeo_cli
 
 
@@ -135,19 +141,207 @@ class TestSurgeoCLI(unittest.TestCase):
         """Test Excel functionality of CLI"""
         # Generate input name based on input file
         input_path = str(self._DATA_FOLDER / 'surgeo_input.xlsx')
-        # Run a process that writes to CSV output
-        subprocess.run([
-            sys.executable,
-            self._CLI_SCRIPT,
-            input_path,
-            self._EXCEL_OUTPUT_PATH,
-            'surgeo'
-        ])
-        # Read the newly generated information
-        df_generated = pd.read_excel(self._EXCEL_OUTPUT_PATH, engine='openpyxl')
         # Read the true information
         df_true = pd.read_excel(self._DATA_FOLDER / 'surgeo_output.xlsx', engine='openpyxl')
-        self._is_close_enough(df_generated, df_true)
+        # Run a process that writes to Excel output, whole and streamed
+        for chunk_arguments in [[], ['--chunksize', '2']]:
+            subprocess.run([
+                sys.executable,
+                self._CLI_SCRIPT,
+                input_path,
+                self._EXCEL_OUTPUT_PATH,
+                'surgeo',
+                *chunk_arguments,
+            ], check=True)
+            # Read the newly generated information
+            df_generated = pd.read_excel(self._EXCEL_OUTPUT_PATH, engine='openpyxl')
+            pathlib.Path(self._EXCEL_OUTPUT_PATH).unlink()
+            self._is_close_enough(df_generated, df_true)
+
+    def test_chunksize(self):
+        """Test that a chunked run writes the same bytes as a full run"""
+        for input_name, model_type in [
+            ('geocode_input.csv', 'geo'),
+            ('surgeo_input.csv', 'surgeo'),
+            ('first_name_input.csv', 'first'),
+            ('surgeo_input.xlsx', 'surgeo'),
+        ]:
+            input_path = str(self._DATA_FOLDER / input_name)
+            outputs = []
+            for chunk_arguments in [[], ['--chunksize', '2']]:
+                subprocess.run([
+                    sys.executable,
+                    self._CLI_SCRIPT,
+                    input_path,
+                    self._CSV_OUTPUT_PATH,
+                    model_type,
+                    *chunk_arguments,
+                ], check=True)
+                outputs.append(pathlib.Path(self._CSV_OUTPUT_PATH).read_bytes())
+                os.unlink(self._CSV_OUTPUT_PATH)
+            self.assertEqual(outputs[0], outputs[1])
+
+    def test_chunksize_encoding(self):
+        """Test that chunked CSV output is UTF-8 whatever the locale"""
+        # Python falls back to ASCII for files under the C locale
+        env = dict(os.environ, LC_ALL='C', PYTHONUTF8='0')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_path = pathlib.Path(temp_dir) / 'input.csv'
+            input_path.write_text(
+                'name,zcta5\nMÜLLER,63144\nDIAZ,65201\n',
+                encoding='utf-8',
+            )
+            outputs = []
+            for chunk_arguments in [[], ['--chunksize', '1']]:
+                subprocess.run([
+                    sys.executable,
+                    self._CLI_SCRIPT,
+                    str(input_path),
+                    self._CSV_OUTPUT_PATH,
+                    'surgeo',
+                    *chunk_arguments,
+                ], env=env, check=True)
+                outputs.append(pathlib.Path(self._CSV_OUTPUT_PATH).read_bytes())
+                os.unlink(self._CSV_OUTPUT_PATH)
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertIn('MÜLLER'.encode('utf-8'), outputs[1])
+
+    def test_incremental(self):
+        """Test that incremental runs write the same bytes as a full run"""
+        input_df = pd.read_csv(
+            self._DATA_FOLDER / 'surgeo_input.csv',
+            skip_blank_lines=False,
+            dtype=str,
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_dir = pathlib.Path(temp_dir)
+            input_path = temp_dir / 'input.csv'
+            sidecar_path = temp_dir / 'sidecar.npz'
+            report_path = pathlib.Path(self._CSV_OUTPUT_PATH + '.profile.json')
+            # The second run reuses every row, the third all but one, and
+            # the last has no rows at all
+            changed_df = input_df.copy()
+            changed_df.loc[1, 'name'] = 'SMITH'
+            for df, chunk_arguments, scored_rows in [
+                (input_df, [], len(input_df)),
+                (input_df, [], 0),
+                (changed_df, ['--chunksize', '2'], 1),
+                (input_df.iloc[:0], [], 0),
+            ]:
+                df.to_csv(input_path, index=False)
+                outputs = []
+                for incremental_arguments in [
+                    [],
+                    ['--incremental', str(sidecar_path), '--profile', 'time'],
+                ]:
+                    subprocess.run([
+                        sys.executable,
+                        self._CLI_SCRIPT,
+                        str(input_path),
+                        self._CSV_OUTPUT_PATH,
+                        'surgeo',
+                        *chunk_arguments,
+                        *incremental_arguments,
+                    ], check=True)
+                    outputs.append(
+                        pathlib.Path(self._CSV_OUTPUT_PATH).read_bytes()
+                    )
+                self.assertEqual(outputs[0], outputs[1])
+                self.assertTrue(sidecar_path.exists())
+                # Only the rows missing from the sidecar reach the model
+                report = json.loads(report_path.read_text())
+                report_path.unlink()
+                stage = report['stages'].get('normalize_names', {'rows': 0})
+                self.assertEqual(stage['rows'], scored_rows)
+
+    def test_profile(self):
+        """Test that a profiled run writes a report next to its output"""
+        report_path = pathlib.Path(self._CSV_OUTPUT_PATH + '.profile.json')
+        for profile_arguments, trace_memory in [
+            (['--profile'], True),
+            (['--profile', 'time', '--chunksize', '2'], False),
+        ]:
+            subprocess.run([
+                sys.executable,
+                self._CLI_SCRIPT,
+                str(self._DATA_FOLDER / 'surgeo_input.csv'),
+                self._CSV_OUTPUT_PATH,
+                'surgeo',
+                *profile_arguments,
+            ])
+            report = json.loads(report_path.read_text())
+            report_path.unlink()
+            self.assertEqual(report['rows'], 5)
+            self.assertEqual(report['trace_memory'], trace_memory)
+            for stage in ['load', 'construct', 'normalize_names', 'combine', 'score', 'write']:
+                self.assertIn(stage, report['stages'])
+            self.assertEqual(report['stages']['write']['rows'], 5)
+            allocated = report['stages']['score']['allocated_bytes']
+            self.assertEqual(allocated is not None, trace_memory)
+
+    def test_max_memory(self):
+        """Test that a run within a memory budget writes the same bytes"""
+        input_path = str(self._DATA_FOLDER / 'surgeo_input.csv')
+        outputs = []
+        for memory_arguments in [[], ['--max-memory', '4G']]:
+            process = subprocess.run(
+                [
+                    sys.executable,
+                    self._CLI_SCRIPT,
+                    input_path,
+                    self._CSV_OUTPUT_PATH,
+                    'surgeo',
+                    *memory_arguments,
+                ],
+                stdout=subprocess.PIPE,
+                universal_newlines=True,
+                check=True,
+            )
+            outputs.append(pathlib.Path(self._CSV_OUTPUT_PATH).read_bytes())
+            os.unlink(self._CSV_OUTPUT_PATH)
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertIn('Peak memory', process.stdout)
+
+    @unittest.skipUnless(pyarrow, 'pyarrow is not installed')
+    def test_parquet_arrow(self):
+        """Test Parquet and Arrow input and output, whole and chunked"""
+        input_df = pd.read_csv(
+            self._DATA_FOLDER / 'surgeo_input.csv',
+            skip_blank_lines=False,
+            dtype={'zcta5': str},
+        )
+        df_true = pd.read_csv(self._DATA_FOLDER / 'surgeo_output.csv')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_dir = pathlib.Path(temp_dir)
+            input_df.to_parquet(temp_dir / 'input.parquet', row_group_size=2)
+            input_df.to_feather(temp_dir / 'input.feather')
+            for input_name in ['input.parquet', 'input.feather']:
+                for output_name in ['output.parquet', 'output.arrow']:
+                    for chunk_arguments in [[], ['--chunksize', '2']]:
+                        output_path = temp_dir / output_name
+                        subprocess.run([
+                            sys.executable,
+                            self._CLI_SCRIPT,
+                            str(temp_dir / input_name),
+                            str(output_path),
+                            'surgeo',
+                            *chunk_arguments,
+                        ], check=True)
+                        if output_path.suffix == '.parquet':
+                            df_generated = pd.read_parquet(output_path)
+                        else:
+                            df_generated = pd.read_feather(output_path)
+                        # Probabilities are written as floats, not text
+                        self.assertEqual(
+                            df_generated['white'].dtype,
+                            np.float64,
+                        )
+                        self.assertEqual(
+                            list(df_generated['zcta5'].fillna('')),
+                            ['00631', '63110', '', '', 'will fail'],
+                        )
+                        self._is_close_enough(df_generated, df_true)
+                        output_path.unlink()
 
     def test_malformed(self):
         """Test arguments to specify column names"""
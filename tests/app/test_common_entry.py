@@ -0,0 +1,51 @@
+import subprocess
+import sys
+import time
+import unittest
+
+
+class TestSurgeoCommonEntry(unittest.TestCase):
+
+    # Runs the common entry with "--help" and reports what was imported
+    _STARTUP_SCRIPT = '\n'.join([
+        'import sys',
+        'sys.argv = ["surgeo", "--help"]',
+        'from surgeo.app.common_entry import SurgeoCommonEntry',
+        'try:',
+        '    SurgeoCommonEntry().main()',
+        'except SystemExit:',
+        '    pass',
+        'heavy = ["pandas", "numpy", "tkinter"]',
+        'print("imported:" + ",".join(n for n in heavy if n in sys.modules))',
+    ])
+
+    # Generous upper bound on interpreter start plus "--help"
+    _MAX_STARTUP_SECONDS = 5.0
+
+    def test_help_startup(self):
+        """Check "surgeo --help" is fast and skips pandas and tkinter"""
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, '-c', self._STARTUP_SCRIPT],
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        )
+        elapsed = time.perf_counter() - start
+        imported = completed.stdout.strip().splitlines()[-1]
+        self.assertEqual(imported, 'imported:')
+        self.assertIn('usage:', completed.stdout)
+        self.assertLess(elapsed, self._MAX_STARTUP_SECONDS)
+
+    def test_lazy_namespace(self):
+        """Check the models are still reachable from the package"""
+        import surgeo
+        from surgeo.models.surname_model import SurnameModel
+        self.assertIs(surgeo.SurnameModel, SurnameModel)
+        self.assertIn('BIFSGModel', dir(surgeo))
+        with self.assertRaises(AttributeError):
+            surgeo.NotAModel
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 import os
 import pathlib
+import queue
 import tempfile
+import threading
 import unittest
 
 import tkinter as tk
@@ -8,6 +10,7 @@ import tkinter as tk
 import numpy as np
 import pandas as pd
 
+import surgeo
 import surgeo.app.surgeo_gui
 
 
@@ -61,8 +64,10 @@ class TestSurgeoGUI(unittest.TestCase):
         self._GUI._objects['zip_var'].set(zip_header)
         # Update events (required)
         self._GUI._objects['root'].update()
-        # Execute
-        self._GUI._execute(show_msgbox=False)
+        # Execute, wait for the worker, and show its outcome
+        worker = self._GUI._execute(show_msgbox=False)
+        worker.join()
+        self._GUI._poll()
 
     def _is_close_enough(self, df_generated, df_true):
         """Helper function to select floats, round them, and compare"""
@@ -202,6 +207,74 @@ class TestSurgeoGUI(unittest.TestCase):
         # Compare values
         self._is_close_enough(df_generated, df_true)
 
+    def test_models_kept(self):
+        """Test that a model is reused by later runs"""
+        models = []
+        for _ in range(2):
+            self._run_model(
+                self._DATA_FOLDER / 'surgeo_input.csv',
+                'Surgeo (Surname + Geocode)',
+                self._CSV_OUTPUT_PATH,
+                'first_name',
+                'name',
+                'zcta5',
+            )
+            models.append(self._GUI._models[surgeo.SurgeoModel])
+        self.assertIs(models[0], models[1])
+        # The window is ready for another run
+        self.assertIsNone(self._GUI._worker)
+        self.assertFalse(
+            self._GUI._objects['execute_button'].instate(['disabled'])
+        )
+
+    def test_progress(self):
+        """Test the progress messages of a run in several chunks"""
+        job = {
+            'input_var': str(self._DATA_FOLDER / 'surgeo_input.csv'),
+            'output_var': self._CSV_OUTPUT_PATH,
+            'first_name_var': 'first_name',
+            'surname_var': 'name',
+            'zip_var': 'zcta5',
+            'model_var': 'Surgeo (Surname + Geocode)',
+        }
+        messages = queue.Queue()
+        self._GUI.CHUNKSIZE = 2
+        try:
+            self._GUI._run(job, threading.Event(), messages)
+        finally:
+            del self._GUI.CHUNKSIZE
+        received = []
+        while not messages.empty():
+            received.append(messages.get())
+        self.assertEqual(received[-1], ('done', 5))
+        progress = [value for kind, value in received if kind == 'progress']
+        self.assertEqual(len(progress), 9)
+        self.assertEqual(
+            progress[-1],
+            {'read': 5, 'scored': 5, 'written': 5, 'total': 5},
+        )
+        # The output is the same as when written at once
+        df_generated = pd.read_csv(self._CSV_OUTPUT_PATH)
+        df_true = pd.read_csv(self._DATA_FOLDER / 'surgeo_output.csv')
+        self._is_close_enough(df_generated, df_true)
+
+    def test_cancel(self):
+        """Test that a cancelled run stops and writes no output"""
+        job = {
+            'input_var': str(self._DATA_FOLDER / 'surgeo_input.csv'),
+            'output_var': self._CSV_OUTPUT_PATH,
+            'first_name_var': 'first_name',
+            'surname_var': 'name',
+            'zip_var': 'zcta5',
+            'model_var': 'Surgeo (Surname + Geocode)',
+        }
+        cancel = threading.Event()
+        cancel.set()
+        messages = queue.Queue()
+        self._GUI._run(job, cancel, messages)
+        self.assertEqual(messages.get_nowait(), ('cancelled', 0))
+        self.assertFalse(pathlib.Path(self._CSV_OUTPUT_PATH).exists())
+
     def test_excel(self):
         """Test Excel input and output"""
         INPUT = 'surgeo_input.xlsx'
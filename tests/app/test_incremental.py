@@ -0,0 +1,72 @@
+import pathlib
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from surgeo.app.incremental import IncrementalIndex, row_hashes
+
+
+class TestIncrementalIndex(unittest.TestCase):
+
+    _OPTIONS = {'model_type': 'surgeo', 'dtype': 'float64'}
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._sidecar_path = pathlib.Path(self._temp_dir.name) / 'sidecar.npz'
+        self._input = pd.DataFrame({
+            'name': ['SMITH', 'JONES', None, 'SMITH'],
+            'zcta5': ['63144', '00501', '63144', '63144'],
+        })
+        self._output = self._input.assign(
+            race=pd.Categorical(
+                ['white', 'black', None, 'white'],
+                categories=['white', 'black'],
+            ),
+            probability=np.array([0.5, 0.25, np.nan, 0.5], dtype=np.float32),
+        )
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def _write_sidecar(self, options=None):
+        """Record the output of the input rows and save the sidecar"""
+        index = IncrementalIndex(self._sidecar_path, options or self._OPTIONS)
+        index.record(row_hashes(self._input, ['name', 'zcta5']), self._output)
+        index.save()
+
+    def test_round_trip(self):
+        """Test that saved rows are found again with the same values"""
+        self._write_sidecar()
+        index = IncrementalIndex(self._sidecar_path, self._OPTIONS)
+        # Duplicate rows are kept once
+        self.assertEqual(len(index), 3)
+        changed = self._input.copy()
+        changed.loc[1, 'zcta5'] = '63110'
+        found, carried = index.lookup(row_hashes(changed, ['name', 'zcta5']))
+        self.assertEqual(found.tolist(), [True, False, True, True])
+        pd.testing.assert_frame_equal(
+            carried,
+            self._output[found].reset_index(drop=True),
+        )
+
+    def test_dtype_mismatch(self):
+        """Test that the same values read with another dtype do not match"""
+        self._write_sidecar()
+        index = IncrementalIndex(self._sidecar_path, self._OPTIONS)
+        numeric = self._input.assign(zcta5=[63144, 501, 63144, 63144])
+        found, carried = index.lookup(row_hashes(numeric, ['name', 'zcta5']))
+        self.assertFalse(found.any())
+        self.assertIsNone(carried)
+
+    def test_stale(self):
+        """Test that sidecars with other options or corrupt files are ignored"""
+        self._write_sidecar(options={'model_type': 'bifsg'})
+        self.assertEqual(len(IncrementalIndex(self._sidecar_path, self._OPTIONS)), 0)
+        self._sidecar_path.write_bytes(b'not a sidecar')
+        self.assertEqual(len(IncrementalIndex(self._sidecar_path, self._OPTIONS)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
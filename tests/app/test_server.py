@@ -0,0 +1,139 @@
+import concurrent.futures
+import io
+import json
+import pathlib
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+from surgeo.app.surgeo_server import SurgeoServer
+from surgeo.models.surgeo_model import SurgeoModel
+
+
+class TestSurgeoServer(unittest.TestCase):
+
+    _DATA_FOLDER = pathlib.Path(__file__).resolve().parents[1] / 'data'
+
+    def setUp(self):
+        # A long window so that concurrent requests surely coalesce
+        self._server = SurgeoServer(port=0, batch_window=0.2)
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.start()
+        host, port = self._server.address
+        self._url = f'http://{host}:{port}'
+
+    def tearDown(self):
+        self._server.shutdown()
+        self._thread.join()
+
+    def _request(self, path, body=None, content_type='application/json'):
+        """Send a GET (or a POST if there is a body) and return the reply"""
+        request = urllib.request.Request(
+            self._url + path,
+            data=None if body is None else body.encode('utf-8'),
+            headers={'Content-Type': content_type},
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, response.read().decode('utf-8')
+        except urllib.error.HTTPError as error:
+            return error.code, error.read().decode('utf-8')
+
+    def test_coalesced_requests(self):
+        """Test that concurrent single-row requests match a batch call"""
+        input_data = pd.read_csv(
+            self._DATA_FOLDER / 'surgeo_input.csv',
+            dtype=str,
+        )
+        records = json.loads(input_data.to_json(orient='records'))
+        with concurrent.futures.ThreadPoolExecutor(len(records)) as executor:
+            replies = list(executor.map(
+                lambda record: self._request(
+                    '/score/surgeo',
+                    json.dumps([record]),
+                ),
+                records,
+            ))
+        self.assertEqual({status for status, _ in replies}, {200})
+        result = pd.concat(
+            [pd.DataFrame(json.loads(body)) for _, body in replies],
+            ignore_index=True,
+        )
+        correct = SurgeoModel().get_probabilities(
+            input_data['name'],
+            input_data['zcta5'],
+        )
+        np.testing.assert_allclose(
+            result[correct.columns[2:]].to_numpy(dtype=float),
+            correct[correct.columns[2:]].to_numpy(dtype=float),
+        )
+        status, body = self._request('/metrics')
+        metrics = json.loads(body)
+        self.assertEqual(status, 200)
+        self.assertEqual(metrics['requests'], len(records))
+        self.assertLess(metrics['batches'], len(records))
+        for key in ['latency_p50_ms', 'latency_p99_ms', 'rows_per_second']:
+            self.assertGreater(metrics[key], 0)
+
+    def test_csv_and_errors(self):
+        """Test CSV bodies, the compact output, and bad requests"""
+        csv_text = (self._DATA_FOLDER / 'surgeo_input.csv').read_text()
+        status, body = self._request(
+            '/score/surgeo?output=top',
+            csv_text,
+            content_type='text/csv',
+        )
+        self.assertEqual(status, 200)
+        result = pd.read_csv(io.StringIO(body))
+        self.assertEqual(
+            list(result.columns),
+            ['zcta5', 'name', 'race', 'probability'],
+        )
+        for path, body in [
+            ('/score/nope', '[]'),
+            ('/score/geo', '[{"name": "DIAZ"}]'),
+            ('/score/geo?output=nope', '[{"zcta5": "63144"}]'),
+            ('/score/geo', 'not json'),
+        ]:
+            status, reply = self._request(path, body)
+            self.assertEqual(status, 400)
+            self.assertIn('error', json.loads(reply))
+        self.assertEqual(self._request('/nope')[0], 404)
+        self.assertEqual(json.loads(self._request('/metrics')[1])['errors'], 4)
+
+    def test_bad_request_in_batch(self):
+        """Test that a bad request fails alone, not with its batch"""
+        good = json.dumps([{'name': 'DIAZ', 'zcta5': '65201'}])
+        bad = json.dumps([{'name': ['x'], 'zcta5': '63144'}])
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            replies = list(executor.map(
+                lambda body: self._request('/score/surgeo', body),
+                [good, bad, good, good],
+            ))
+        self.assertEqual(
+            [status for status, _ in replies],
+            [200, 400, 200, 200],
+        )
+        self.assertIn('error', json.loads(replies[1][1]))
+        self.assertEqual(json.loads(self._request('/metrics')[1])['errors'], 1)
+        # Frames that get past the request checks are rescored one by one
+        frames = [
+            pd.DataFrame({'name': ['DIAZ'], 'zcta5': ['65201']}),
+            pd.DataFrame({'name': [['x']], 'zcta5': ['63144']}),
+        ]
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            futures = [
+                executor.submit(self._server.score, 'surgeo', df)
+                for df in frames
+            ]
+            self.assertEqual(len(futures[0].result()), 1)
+            with self.assertRaises(TypeError):
+                futures[1].result()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import pathlib
+import tempfile
+import unittest
+import unittest.mock
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from surgeo.app import table_io
+from surgeo.utility.surgeo_exception import SurgeoException
+
+
+class TestTableIO(unittest.TestCase):
+
+    _DATA_FOLDER = pathlib.Path(__file__).resolve().parents[1] / 'data'
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._xlsx_path = pathlib.Path(self._temp_dir.name) / 'input.xlsx'
+        # Missing, whole, fractional, text, and error values, an empty row
+        # between others, and trailing empty rows
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['name', 'zcta5', 'share'])
+        sheet.append(['DIAZ', 65201, 1.5])
+        sheet.append([None, None, None])
+        sheet.append(['SMITH', 501, 3.0])
+        sheet.append(['LEE', '02134', None])
+        sheet.append(['WONG', '#N/A', 2])
+        sheet.append([None, None, None])
+        workbook.save(self._xlsx_path)
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def test_read_xlsx(self):
+        """Test that streamed XLSX reads match pd.read_excel()"""
+        for path in [self._xlsx_path, self._DATA_FOLDER / 'surgeo_input.xlsx']:
+            pd.testing.assert_frame_equal(
+                table_io.read_table(path),
+                pd.read_excel(path, engine='openpyxl'),
+            )
+        chunks = list(table_io.iter_table(self._xlsx_path, 2, columns=['zcta5']))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(list(chunks[0].columns), ['zcta5'])
+
+    def test_read_xls_without_xlrd(self):
+        """Test that XLS files ask for xlrd when it is not installed"""
+        xls_path = pathlib.Path(self._temp_dir.name) / 'input.xls'
+        xls_path.write_bytes(b'')
+        with unittest.mock.patch.dict('sys.modules', {'xlrd': None}):
+            for read in [table_io.read_table, table_io.read_inputs]:
+                with self.assertRaisesRegex(SurgeoException, 'xlrd'):
+                    read(xls_path, None)
+
+    def test_read_inputs(self):
+        """Test that input columns are read as text, whole or in chunks"""
+        csv_path = pathlib.Path(self._temp_dir.name) / 'input.csv'
+        # A blank line, a short row, a value with a line break, and "NA"
+        csv_path.write_text(
+            'name,zcta5,other\n'
+            'DIAZ,65201,1\n'
+            '\n'
+            'NA,00501\n'
+            '"SMI\nTH",,3\n'
+        )
+        expected = pd.DataFrame({
+            'name': ['DIAZ', np.nan, 'NA', 'SMI\nTH'],
+            'zcta5': ['65201', np.nan, '00501', np.nan],
+        }, dtype=str)
+        columns = ['zcta5', 'name', 'first_name']
+        for chunksize in [None, 1, 3]:
+            frames = list(table_io.iter_inputs(csv_path, chunksize, columns))
+            pd.testing.assert_frame_equal(
+                pd.concat(frames, ignore_index=True),
+                expected,
+            )
+        pd.testing.assert_frame_equal(
+            table_io.read_inputs(csv_path, columns),
+            expected,
+        )
+        # Excel numbers are read as the text pandas would give them
+        df = table_io.read_inputs(self._xlsx_path, columns)
+        self.assertEqual(
+            df['zcta5'].tolist(),
+            ['65201', np.nan, '501', '02134', np.nan],
+        )
+
+    def test_write_xlsx_sheets(self):
+        """Test that XLSX output longer than a sheet continues on new sheets"""
+        df = pd.DataFrame({
+            'name': ['DIAZ', None, 'SMITH', 'LEE', 'WONG'],
+            'white': np.array([0.5, 0.75, 0.25, np.nan, 1], dtype=np.float32),
+        })
+        output_path = pathlib.Path(self._temp_dir.name) / 'output.xlsx'
+        with unittest.mock.patch.object(table_io, 'EXCEL_MAX_ROWS', 3):
+            with table_io.TableWriter(output_path) as writer:
+                writer.write(df.iloc[:3])
+                writer.write(df.iloc[3:])
+        sheets = pd.read_excel(output_path, sheet_name=None, engine='openpyxl')
+        self.assertEqual(list(sheets), ['Sheet1', 'Sheet2', 'Sheet3'])
+        self.assertEqual([len(sheet) for sheet in sheets.values()], [2, 2, 1])
+        pd.testing.assert_frame_equal(
+            pd.concat(sheets.values(), ignore_index=True),
+            df.astype({'white': np.float64}),
+            check_dtype=False,
+        )
+
+    def test_estimate_rows(self):
+        """Test the row counts used to show progress"""
+        self.assertEqual(
+            table_io.estimate_rows(self._DATA_FOLDER / 'surgeo_input.csv'),
+            len(pd.read_csv(self._DATA_FOLDER / 'surgeo_input.csv')),
+        )
+        # The dimensions of a sheet include its trailing empty rows
+        self.assertEqual(table_io.estimate_rows(self._xlsx_path), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import asyncio
+import pathlib
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from surgeo.models.async_scorer import AsyncScorer
+from surgeo.models.bifsg_model import BIFSGModel
+from surgeo.models.geocode_model import GeocodeModel
+from surgeo.utility.surgeo_exception import SurgeoException
+
+
+class TestAsyncScorer(unittest.TestCase):
+
+    _DATA_FOLDER = pathlib.Path(__file__).resolve().parents[1] / 'data'
+
+    def _read_input(self, file_name):
+        return pd.read_csv(
+            self._DATA_FOLDER / file_name,
+            skip_blank_lines=False,
+        )
+
+    def test_score(self):
+        """Test that concurrent records are batched and match score_arrays()"""
+        input_data = self._read_input('bifsg_input.csv')
+        # Enough records to fill several batches
+        input_data = pd.concat([input_data] * 20, ignore_index=True)
+        columns = ['first_name', 'surname', 'zcta5']
+        model = BIFSGModel()
+        scorer = AsyncScorer(model, max_batch=16, max_wait=0.05, max_pending=8)
+
+        async def score_all():
+            async with scorer:
+                return await asyncio.gather(*[
+                    scorer.score(*record)
+                    for record in input_data[columns].itertuples(index=False)
+                ])
+
+        results = asyncio.run(score_all())
+        correct, _ = model.score_arrays(*[input_data[c] for c in columns])
+        np.testing.assert_array_equal(
+            [[result[race] for race in model.races] for result in results],
+            correct,
+        )
+        self.assertEqual(scorer.records, len(input_data))
+        self.assertLessEqual(scorer.batches, len(input_data) // 8 + 1)
+
+    def test_tracts_and_errors(self):
+        """Test tract tuples, bad records, and bad limits"""
+        input_data = self._read_input('tract_input.csv')
+        model = GeocodeModel('TRACT')
+        scorer = AsyncScorer(model)
+
+        async def score_all():
+            async with scorer:
+                with self.assertRaises(SurgeoException):
+                    await scorer.score('01', '001')
+                return await asyncio.gather(*[
+                    scorer.score(tuple(record))
+                    for record in input_data[
+                        ['state', 'county', 'tract']
+                    ].itertuples(index=False)
+                ])
+
+        results = asyncio.run(score_all())
+        correct = model.get_probabilities_tract(input_data)[model.races]
+        np.testing.assert_array_equal(
+            [[result[race] for race in model.races] for result in results],
+            correct.to_numpy(),
+        )
+        for kwargs in [{'max_batch': 0}, {'max_pending': 1.5}, {'max_wait': -1}]:
+            with self.assertRaises(SurgeoException):
+                AsyncScorer(model, **kwargs)
+
+    def test_mixed_tracts(self):
+        """Test that tract tuples and GEOIDs can share a batch"""
+        input_data = self._read_input('tract_input.csv')
+        model = GeocodeModel('TRACT')
+        scorer = AsyncScorer(model, max_wait=0.05)
+        parts = input_data[['state', 'county', 'tract']].astype(str)
+        geoids = parts['state'] + parts['county'] + parts['tract']
+
+        async def score_all():
+            async with scorer:
+                # Alternate the two forms, starting with each of them
+                return await asyncio.gather(*[
+                    scorer.score(geoid if (position % 2) else tuple(record))
+                    for position, (record, geoid) in enumerate(zip(
+                        parts.itertuples(index=False), geoids,
+                    ))
+                ] + [
+                    scorer.score(tuple(record) if (position % 2) else geoid)
+                    for position, (record, geoid) in enumerate(zip(
+                        parts.itertuples(index=False), geoids,
+                    ))
+                ])
+
+        results = asyncio.run(score_all())
+        correct = model.get_probabilities_tract(input_data)[model.races]
+        np.testing.assert_array_equal(
+            [[result[race] for race in model.races] for result in results],
+            np.concatenate([correct.to_numpy()] * 2),
+        )
+        self.assertEqual(scorer.batches, 1)
+
+    def test_bad_record_in_batch(self):
+        """Test that a malformed record fails alone, not with its batch"""
+        model = BIFSGModel()
+        scorer = AsyncScorer(model, max_wait=0.05)
+        records = [
+            ('MARIA', 'DIAZ', '65201'),
+            ('JOHN', ['x'], '63144'),
+            ('JOHN', 'SMITH', '63110'),
+        ]
+
+        async def score_all():
+            async with scorer:
+                return await asyncio.gather(
+                    *[scorer.score(*record) for record in records],
+                    return_exceptions=True,
+                )
+
+        results = asyncio.run(score_all())
+        self.assertIsInstance(results[1], Exception)
+        correct, _ = model.score_arrays(*[
+            np.array(column, dtype=object)
+            for column in zip(records[0], records[2])
+        ])
+        np.testing.assert_array_equal(
+            [[results[i][race] for race in model.races] for i in (0, 2)],
+            correct,
+        )
+        self.assertEqual(scorer.records, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
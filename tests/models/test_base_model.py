@@ -1,8 +1,13 @@
 import unittest
 
+import numpy as np
 import pandas as pd
 
 from surgeo.models.base_model import BaseModel
+from surgeo.models.base_model import TABLE_REGISTRY
+from surgeo.models.base_model import clear_table_registry
+from surgeo.models.lookup_index import NameIndex
+from surgeo.models.lookup_index import ProbabilityStore
 
 
 class TestBaseModel(unittest.TestCase):
@@ -49,6 +54,28 @@ class TestBaseModel(unittest.TestCase):
         self.assertIsInstance(df, pd.DataFrame)
         self.assertEqual(len(df), self._SURNAME_DF_LENGTH)
 
+    def test_table_registry(self):
+        """Check lookup tables are loaded once and shared read-only"""
+        clear_table_registry()
+        self.assertEqual(len(TABLE_REGISTRY), 0)
+        first = BaseModel()._get_prob_race_given_first_name()
+        second = BaseModel()._get_prob_race_given_first_name()
+        # Only one table is held and both models view the same data
+        self.assertEqual(len(TABLE_REGISTRY), 1)
+        self.assertIsNot(first, second)
+        self.assertTrue(np.shares_memory(first.values, second.values))
+        # Modifying one model's view never reaches the other model
+        try:
+            first.iloc[0, 0] = -1.0
+        except ValueError:
+            pass
+        self.assertNotEqual(second.iloc[0, 0], -1.0)
+        # Clearing drops the shared table so it is reloaded on next use
+        clear_table_registry()
+        third = BaseModel()._get_prob_race_given_first_name()
+        self.assertFalse(np.shares_memory(second.values, third.values))
+        pd.testing.assert_frame_equal(second, third)
+
     def test_normalize_names(self):
         """Test string normalization routines for names"""
         # Generate series
@@ -60,6 +87,65 @@ class TestBaseModel(unittest.TestCase):
         for correct_output, function_output in zip_object:
             self.assertEqual(correct_output, function_output)
 
+    def test_normalize_names_repeated(self):
+        """Test normalizing repeated and missing names row by row"""
+        original = pd.Series(
+            ['Davis Jr. ', None, 'DAVIS', 'Davis Jr. ', 'NAN', float('nan')],
+            index=[10, 11, 12, 13, 14, 15],
+        )
+        correct = ['DAVIS', '', 'DAVIS', 'DAVIS', 'NAN', '']
+        function_output = self._BASE_MODEL._normalize_names(original)
+        self.assertEqual(list(function_output), correct)
+        self.assertEqual(list(function_output.index), list(original.index))
+        self.assertEqual(function_output.name, 'name')
+
+    def test_table_precision(self):
+        """Test the float32 and uint16 error bounds over the bundled data"""
+        tables = [
+            self._BASE_MODEL._get_prob_race_given_zcta(),
+            self._BASE_MODEL._get_prob_zcta_given_race(),
+            self._BASE_MODEL._get_prob_race_given_tract(),
+            self._BASE_MODEL._get_prob_race_given_surname(),
+            self._BASE_MODEL._get_prob_race_given_first_name(),
+            self._BASE_MODEL._get_prob_first_name_given_race(),
+        ]
+        # The documented bounds for a column whose largest value is 1
+        documented = {'float32': 6e-8, 'uint16': 7.8e-6}
+        for table in tables:
+            values = table.to_numpy(dtype=np.float64)
+            for dtype, bound in documented.items():
+                store = ProbabilityStore(values, dtype)
+                stored = store.take(np.arange(len(values) + 1))
+                self.assertEqual(stored.dtype, np.float32)
+                self.assertLess(store.nbytes, values.nbytes)
+                # The sentinel row and missing values stay missing
+                self.assertTrue(np.isnan(stored[-1]).all())
+                np.testing.assert_array_equal(
+                    np.isnan(stored[:-1]),
+                    np.isnan(values),
+                )
+                error = np.nanmax(np.abs(stored[:-1] - values), axis=0)
+                self.assertTrue((error <= store.max_error).all())
+                self.assertTrue(
+                    (store.max_error <= bound * store.column_max).all()
+                )
+
+    def test_name_index(self):
+        """Test the sorted name index against a reindex of its table"""
+        table = pd.DataFrame(
+            {'white': [0.1, 0.2, 0.3, 0.4], 'black': [0.9, 0.8, 0.7, 0.6]},
+            index=pd.Index(['SMITH', 'ÑUÑEZ', 'DAVIS', 'SMITH'], name='name'),
+        )
+        name_index = NameIndex(table)
+        names = ['DAVIS', 'SMITH', 'ÑUÑEZ', 'SMITHSONIAN', 'SMIT', '', 'A\0']
+        positions = name_index.positions(names)
+        correct = table[~table.index.duplicated()].reindex(names)
+        np.testing.assert_array_equal(
+            name_index.take(positions),
+            correct.to_numpy(),
+        )
+        self.assertEqual(name_index.columns, ['white', 'black'])
+
     def test_normalize_zctas(self):
         """Test string normalization routines for ZCTAs"""
         # Generate series
@@ -0,0 +1,102 @@
+import pathlib
+import unittest
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+from surgeo.models.batches import score_batches
+from surgeo.models.bifsg_model import BIFSGModel
+from surgeo.models.geocode_model import GeocodeModel
+from surgeo.models.surgeo_model import SurgeoModel
+
+
+class TestScoreArrays(unittest.TestCase):
+
+    _DATA_FOLDER = pathlib.Path(__file__).resolve().parents[1] / 'data'
+
+    def _read_input(self, file_name):
+        return pd.read_csv(
+            self._DATA_FOLDER / file_name,
+            skip_blank_lines=False,
+        )
+
+    def _check_arrays(self, model, full, probs, matched):
+        """Check score_arrays() results against get_probabilities()"""
+        self.assertTrue(probs.flags.c_contiguous)
+        self.assertEqual(probs.shape, (len(full), 6))
+        np.testing.assert_array_equal(probs, full[model.races].to_numpy())
+        # Unmatched rows are all missing
+        self.assertTrue(np.isnan(probs[~matched]).all())
+
+    def test_score_arrays(self):
+        """Test NumPy array scoring against the dataframe results"""
+        input_data = self._read_input('bifsg_input.csv')
+        first_names = input_data['first_name'].to_numpy()
+        surnames = input_data['surname'].to_numpy()
+        zctas = input_data['zcta5'].to_numpy()
+        model = SurgeoModel()
+        self._check_arrays(
+            model,
+            model.get_probabilities(input_data['surname'], input_data['zcta5']),
+            *model.score_arrays(surnames, zctas),
+        )
+        model = BIFSGModel()
+        self._check_arrays(
+            model,
+            model.get_probabilities(
+                input_data['first_name'],
+                input_data['surname'],
+                input_data['zcta5'],
+            ),
+            *model.score_arrays(first_names, surnames, zctas),
+        )
+
+    def test_score_arrays_tract(self):
+        """Test tract scoring from separate arrays and from GEOIDs"""
+        input_data = self._read_input('tract_input.csv')
+        model = GeocodeModel('TRACT')
+        full = model.get_probabilities_tract(input_data)
+        parts = tuple(
+            input_data[column].to_numpy()
+            for column in ['state', 'county', 'tract']
+        )
+        probs, matched = model.score_arrays(parts)
+        self._check_arrays(model, full, probs, matched)
+        geoids = full['state'] + full['county'] + full['tract']
+        probs, matched = model.score_arrays(geoids.to_numpy())
+        self._check_arrays(model, full, probs, matched)
+
+    @unittest.skipUnless(pyarrow, 'pyarrow is not installed')
+    def test_score_batches(self):
+        """Test scoring Arrow batches against the dataframe results"""
+        input_data = self._read_input('surgeo_input.csv')
+        model = SurgeoModel()
+        full = model.get_probabilities(input_data['name'], input_data['zcta5'])
+        table = pyarrow.Table.from_pandas(input_data, preserve_index=False)
+        batches = list(score_batches(
+            model,
+            table.to_batches(max_chunksize=2),
+            ['name', 'zcta5'],
+        ))
+        self.assertEqual(len(batches), (len(input_data) + 1) // 2)
+        result = pyarrow.Table.from_batches(batches)
+        self.assertEqual(result.column_names, model.races + ['matched'])
+        matched = result.column('matched').to_numpy()
+        probs = full[model.races].to_numpy()
+        for position, race in enumerate(model.races):
+            column = result.column(race)
+            # Unmatched rows are null rather than NaN
+            self.assertEqual(column.null_count, (~matched).sum())
+            np.testing.assert_array_equal(
+                column.to_numpy(zero_copy_only=False)[matched],
+                probs[matched, position],
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
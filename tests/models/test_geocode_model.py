@@ -35,6 +35,21 @@ class TestGeocodeModel(unittest.TestCase):
             result.equals(true_result)
         )
 
+    def test_get_probabilities_zip_formats(self):
+        """Test ints, floats, padded strings, and ZIP+4 find the same ZCTA"""
+        zips = pd.Series(
+            [63110, 63110.0, ' 63110', '63110-1234', '063110', 'will fail'],
+            dtype=object,
+        )
+        result = self._GEOCODE_MODEL.get_probabilities(zips)
+        probs = result.drop(columns='zcta5')
+        expected = probs.iloc[[0]].to_numpy()
+        for row in range(4):
+            np.testing.assert_array_equal(probs.iloc[[row]].to_numpy(), expected)
+        self.assertTrue(probs.iloc[4:].isnull().all().all())
+        # The normalized input is still reported alongside the probs
+        self.assertEqual(list(result.columns), ['zcta5'] + list(probs.columns))
+
     def test_get_probabilities_tract(self):
         """Test Geocode model versus known result with Tracts"""
         # Get our data and clean it
@@ -56,5 +71,27 @@ class TestGeocodeModel(unittest.TestCase):
             result.equals(true_result)
         )
 
+    def test_get_probabilities_tract_formats(self):
+        """Test int, string, and GEOID tract inputs give the same result"""
+        input_data = pd.read_csv(
+            self._DATA_FOLDER / 'tract_input.csv',
+            skip_blank_lines=False,
+            dtype=str,
+        )
+        strings = input_data[['state', 'county', 'tract']].iloc[:-1]
+        integers = strings.astype(int)
+        geoids = (strings['state'] + strings['county'] + strings['tract'])
+        expected = self._GEOCODE_MODEL_TRACT.get_probabilities_tract(strings)
+        for geo_df in [integers, geoids.astype(int), geoids.to_frame()]:
+            result = self._GEOCODE_MODEL_TRACT.get_probabilities_tract(geo_df)
+            pd.testing.assert_frame_equal(result, expected)
+        # Codes are zero-padded and unparseable codes find nothing
+        self.assertEqual(list(expected.iloc[0, :3]), ['01', '001', '020100'])
+        bad = self._GEOCODE_MODEL_TRACT.get_probabilities_tract(
+            input_data[['state', 'county', 'tract']].iloc[-1:]
+        )
+        self.assertTrue(bad.iloc[:, 3:].isnull().all().all())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from surgeo.models.kernels import combine_probabilities, top_race
+
+
+def _reference_probs(*factors):
+    """The DataFrame arithmetic the kernel replaced"""
+    numerator = pd.DataFrame(factors[0])
+    for factor in factors[1:]:
+        numerator = numerator * pd.DataFrame(factor)
+    denominator = numerator.sum(axis=1)
+    return numerator.div(denominator, axis=0).to_numpy()
+
+
+class TestKernels(unittest.TestCase):
+
+    def _random_factors(self, count, rows=5_000, seed=0):
+        """Random probabilities with zeros, missing values, and empty rows"""
+        generator = np.random.default_rng(seed)
+        factors = []
+        for _ in range(count):
+            factor = generator.random((rows, 6))
+            factor[generator.random((rows, 6)) < 0.1] = 0.0
+            factor[generator.random((rows, 6)) < 0.05] = np.nan
+            factor[generator.random(rows) < 0.05] = np.nan
+            factor[generator.random(rows) < 0.05] = 0.0
+            factors.append(factor)
+        return factors
+
+    def test_combine_probabilities(self):
+        """Test the kernel against DataFrame arithmetic"""
+        for count in [2, 3]:
+            factors = self._random_factors(count)
+            correct = _reference_probs(*factors)
+            for log_space in [False, True]:
+                result = combine_probabilities(factors, log_space=log_space)
+                np.testing.assert_array_equal(
+                    np.isnan(result),
+                    np.isnan(correct),
+                )
+                np.testing.assert_allclose(result, correct, rtol=0, atol=1e-12)
+
+    def test_out_buffer(self):
+        """Test writing into a preallocated buffer (which may be an input)"""
+        factors = self._random_factors(3)
+        correct = _reference_probs(*factors)
+        out = np.empty_like(factors[0])
+        self.assertIs(combine_probabilities(factors, out=out), out)
+        self.assertIs(combine_probabilities(factors, out=factors[0]), factors[0])
+        np.testing.assert_allclose(factors[0], correct, rtol=0, atol=1e-12)
+
+    def test_log_space_underflow(self):
+        """Test that log space survives products that underflow"""
+        factor = np.array([[1e-120, 1e-130, 1e-125, 0.0, 0.0, np.nan]])
+        linear = combine_probabilities([factor, factor, factor])
+        logged = combine_probabilities(
+            [factor, factor, factor],
+            log_space=True,
+        )
+        self.assertTrue(np.isnan(linear).all())
+        np.testing.assert_allclose(
+            logged,
+            [[1.0, 1e-30, 1e-15, 0.0, 0.0, np.nan]],
+            rtol=1e-12,
+        )
+
+    def test_top_race(self):
+        """Test the top race, its probability, and the entropy"""
+        probs = np.array([
+            [0.1, 0.6, 0.1, 0.1, 0.1, 0.0],
+            [np.nan, 0.2, 0.8, np.nan, 0.0, 0.0],
+            [0.0, 0.0, 0.0, 0.0, 1.0, 0.0],
+            [1 / 6] * 6,
+            [0.5, 0.5, 0.0, 0.0, 0.0, 0.0],
+            [np.nan] * 6,
+        ])
+        codes, top_probs, entropies = top_race(probs, entropy=True)
+        self.assertEqual(codes.dtype, np.int8)
+        np.testing.assert_array_equal(codes, [1, 2, 4, 0, 0, -1])
+        np.testing.assert_array_equal(
+            top_probs,
+            [0.6, 0.8, 1.0, 1 / 6, 0.5, np.nan],
+        )
+        # Entropy in nats of each row divided by log(6)
+        terms = np.where(probs > 0, probs * np.log(np.where(probs > 0, probs, 1)), 0)
+        correct = -np.nansum(terms, axis=1) / np.log(6)
+        correct[-1] = np.nan
+        np.testing.assert_allclose(entropies, correct, rtol=0, atol=1e-15)
+        self.assertEqual(entropies[2], 0.0)
+        self.assertAlmostEqual(entropies[3], 1.0)
+        self.assertIsNone(top_race(probs)[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+import pandas as pd
+
+import surgeo
+from surgeo.models.memory import MemoryPlanner
+from surgeo.models.memory import parse_bytes
+from surgeo.utility.surgeo_exception import SurgeoException
+
+
+class TestMemory(unittest.TestCase):
+
+    def test_memory_usage(self):
+        """Test that each table's memory is reported and shrinks with dtype"""
+        usage = surgeo.BIFSGModel().memory_usage()
+        self.assertEqual(
+            sorted(usage.index),
+            [
+                'prob_first_name_given_race_harvard.csv',
+                'prob_race_given_surname_2010.csv',
+                'prob_zcta_given_race_2010.csv',
+            ],
+        )
+        self.assertTrue((usage > 0).all())
+        quantized = surgeo.BIFSGModel(dtype='uint16').memory_usage()
+        self.assertTrue((quantized < usage).all())
+        cached = surgeo.SurgeoModel(cache_entries=10).memory_usage()
+        self.assertEqual(cached['result_cache'], 0)
+
+    def test_parse_bytes(self):
+        """Test reading sizes with and without units"""
+        self.assertEqual(parse_bytes('1000'), 1000)
+        self.assertEqual(parse_bytes('512M'), 512 * 2 ** 20)
+        self.assertEqual(parse_bytes('1.5gb'), 3 * 2 ** 29)
+        with self.assertRaises(SurgeoException):
+            parse_bytes('lots')
+
+    def test_planner(self):
+        """Test estimates and chunk sizes from a calibrated planner"""
+        model = surgeo.SurgeoModel()
+        planner = MemoryPlanner(model)
+        with self.assertRaises(SurgeoException):
+            planner.estimate(100)
+        names = pd.Series(['DIAZ', 'JOHNSON', 'WASHINGTON', None] * 500)
+        zctas = pd.Series(['65201', '63144', '63110', '99999'] * 500)
+        planner.calibrate(names, zctas)
+        self.assertGreater(planner.bytes_per_row, 0)
+        small = planner.estimate(1_000)
+        large = planner.estimate(1_000_000)
+        self.assertEqual(small['tables'], model.memory_usage().sum())
+        self.assertEqual(large['total'], large['tables'] + large['rows'])
+        self.assertGreater(large['rows'], 500 * small['rows'])
+        budget = large['rows'] + 10 ** 6
+        chunksize = planner.chunksize(budget, in_use=10 ** 6)
+        self.assertLessEqual(planner.estimate(chunksize)['rows'], budget)
+        with self.assertRaises(SurgeoException):
+            planner.chunksize(10 ** 6, in_use=10 ** 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import pathlib
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from surgeo.models.bifsg_model import BIFSGModel
+from surgeo.models.result_cache import ResultCache
+from surgeo.models.surgeo_model import SurgeoModel
+from surgeo.utility.surgeo_exception import SurgeoException
+
+
+class TestResultCache(unittest.TestCase):
+
+    _DATA_FOLDER = pathlib.Path(__file__).resolve().parents[1] / 'data'
+
+    def test_lru(self):
+        """Test lookups, least recently used eviction, and the counters"""
+        cache = ResultCache(max_entries=2)
+        rows = np.arange(18, dtype=np.float64).reshape(3, 6)
+        cache.store([('A', 1), ('B', 2)], rows[:2])
+        # Using A makes B the least recently used entry
+        found, hit_rows = cache.lookup([('A', 1), ('C', 3)], token=())
+        np.testing.assert_array_equal(found, [True, False])
+        np.testing.assert_array_equal(hit_rows[0], rows[0])
+        cache.store([('C', 3)], rows[2:])
+        found, _ = cache.lookup([('A', 1), ('B', 2), ('C', 3)], token=())
+        np.testing.assert_array_equal(found, [True, False, True])
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(
+            (cache.hits, cache.misses, cache.evictions),
+            (3, 2, 1),
+        )
+
+    def test_limits(self):
+        """Test the byte limit, invalidation, and bad limits"""
+        cache = ResultCache(max_bytes=1_000)
+        rows = np.zeros((100, 6))
+        cache.store([('NAME', position) for position in range(100)], rows)
+        self.assertLessEqual(cache.nbytes, 1_000)
+        self.assertGreater(len(cache), 0)
+        self.assertEqual(cache.evictions, 100 - len(cache))
+        cache.lookup([('NAME', 99)], token=('tables', 1))
+        self.assertEqual(cache.hits, 1)
+        # Other tables empty the cache
+        found, _ = cache.lookup([('NAME', 99)], token=('tables', 2))
+        self.assertFalse(found.any())
+        self.assertEqual((len(cache), cache.nbytes, cache.invalidations), (0, 0, 1))
+        for limit in [0, -1, 1.5]:
+            with self.assertRaises(SurgeoException):
+                ResultCache(max_entries=limit)
+
+    def test_models(self):
+        """Test that cached models match uncached models"""
+        input_data = pd.read_csv(
+            self._DATA_FOLDER / 'bifsg_input.csv',
+            skip_blank_lines=False,
+        )
+        # Repeat the rows so that later rows hit the cache
+        input_data = pd.concat([input_data] * 3, ignore_index=True)
+        inputs = (
+            input_data['first_name'],
+            input_data['surname'],
+            input_data['zcta5'],
+        )
+        for model_type, arguments in [
+            (SurgeoModel, inputs[1:]),
+            (BIFSGModel, inputs),
+        ]:
+            model = model_type()
+            cached_model = model_type(cache_entries=1_000)
+            correct = model.get_probabilities(*arguments)
+            for _ in range(2):
+                pd.testing.assert_frame_equal(
+                    cached_model.get_probabilities(*arguments),
+                    correct,
+                )
+            probs, matched = cached_model.score_arrays(*arguments)
+            np.testing.assert_array_equal(probs, correct[model.races])
+            np.testing.assert_array_equal(
+                matched,
+                model.score_arrays(*arguments)[1],
+            )
+            cache = cached_model.result_cache
+            # Each distinct key tuple is combined once per table
+            self.assertEqual(cache.misses, len(cache))
+            self.assertEqual(cache.hits, 2 * len(cache))
+            # Changing an option recomputes everything
+            cached_model.log_space = True
+            pd.testing.assert_frame_equal(
+                cached_model.get_probabilities(*arguments),
+                model_type(log_space=True).get_probabilities(*arguments),
+            )
+            self.assertEqual(cache.invalidations, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
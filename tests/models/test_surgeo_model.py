@@ -1,6 +1,7 @@
 import pathlib
 import unittest
 
+import numpy as np
 import pandas as pd
 
 from surgeo.models.surgeo_model import SurgeoModel
@@ -67,5 +68,83 @@ class TestSurgeoModel(unittest.TestCase):
             result.equals(true_result)
         )
 
+    def test_get_probabilities_float32(self):
+        """Test float32 tables and output against float64"""
+        input_data = pd.read_csv(
+            self._DATA_FOLDER / 'surgeo_input.csv',
+            skip_blank_lines=False,
+        )
+        result = SurgeoModel(dtype='float32').get_probabilities(
+            input_data['name'],
+            input_data['zcta5'],
+        )
+        true_result = self._SURGEO_MODEL.get_probabilities(
+            input_data['name'],
+            input_data['zcta5'],
+        )
+        races = true_result.columns[2:]
+        self.assertTrue((result[races].dtypes == 'float32').all())
+        np.testing.assert_allclose(
+            result[races].to_numpy(),
+            true_result[races].to_numpy(),
+            rtol=0,
+            atol=1e-6,
+        )
+
+    def test_get_probabilities_n_jobs(self):
+        """Test that scoring in worker processes matches a single process"""
+        input_data = pd.read_csv(
+            self._DATA_FOLDER / 'tract_input.csv',
+            skip_blank_lines=False,
+        )
+        model = SurgeoModel("TRACT")
+        try:
+            for _ in range(2):
+                result = model.get_probabilities(
+                    input_data['name'],
+                    input_data,
+                    n_jobs=2,
+                )
+                pd.testing.assert_frame_equal(
+                    result,
+                    model.get_probabilities(input_data['name'], input_data),
+                )
+        finally:
+            model.close()
+
+    def test_get_probabilities_top(self):
+        """Test that the top race output summarizes the full output"""
+        input_data = pd.read_csv(
+            self._DATA_FOLDER / 'surgeo_input.csv',
+            skip_blank_lines=False,
+        )
+        full = self._SURGEO_MODEL.get_probabilities(
+            input_data['name'],
+            input_data['zcta5'],
+        )
+        top = self._SURGEO_MODEL.get_probabilities(
+            input_data['name'],
+            input_data['zcta5'],
+            output='top',
+            entropy=True,
+        )
+        self.assertEqual(
+            list(top.columns),
+            ['zcta5', 'name', 'race', 'probability', 'entropy'],
+        )
+        races = full.columns[2:]
+        self.assertEqual(list(top['race'].cat.categories), list(races))
+        probs = full[races]
+        scored = probs.notna().any(axis=1)
+        self.assertTrue(top['race'][~scored].isna().all())
+        self.assertEqual(
+            list(top['race'][scored].astype(object)),
+            list(probs[scored].fillna(-1).idxmax(axis=1)),
+        )
+        np.testing.assert_array_equal(top['probability'], probs.max(axis=1))
+        self.assertTrue(((top['entropy'] >= 0) | ~scored).all())
+        self.assertTrue(((top['entropy'] <= 1) | ~scored).all())
+
+
 if __name__ == '__main__':
     unittest.main()
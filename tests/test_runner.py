@@ -6,24 +6,48 @@ from surgeo import models
 
 # Import test modules
 import app.test_cli
+import app.test_common_entry
 import app.test_gui
+import app.test_incremental
+import app.test_server
+import app.test_table_io
+import models.test_batches
+import models.test_async_scorer
 import models.test_base_model
 import models.test_bifsg_model
 import models.test_first_name_model
 import models.test_geocode_model
+import models.test_kernels
+import models.test_memory
+import models.test_result_cache
 import models.test_surgeo_model
 import models.test_surname_model
+import utility.test_normalize
+import utility.test_profiling
+import utility.test_table_cache
 
 # List test modules
 test_modules = [
     app.test_cli,
+    app.test_common_entry,
     app.test_gui,
+    app.test_incremental,
+    app.test_server,
+    app.test_table_io,
+    models.test_batches,
+    models.test_async_scorer,
     models.test_base_model,
     models.test_bifsg_model,
     models.test_first_name_model,
     models.test_geocode_model,
+    models.test_kernels,
+    models.test_memory,
+    models.test_result_cache,
     models.test_surgeo_model,
     models.test_surname_model,
+    utility.test_normalize,
+    utility.test_profiling,
+    utility.test_table_cache,
 ]
 
 # Create loader and suite
@@ -0,0 +1,89 @@
+import pathlib
+import random
+import string
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import surgeo
+from surgeo.utility import normalize
+
+
+def _reference_names(names: pd.Series) -> pd.Series:
+    """The chained pandas routine the normalizer replaced
+
+    The strings are kept as Python objects so that the pandas string
+    methods use Python semantics even when pyarrow is installed.
+    """
+    translation_table = str.maketrans(
+        '',
+        '',
+        string.digits + string.punctuation + string.whitespace,
+    )
+    output = (
+        names.fillna('')
+             .astype(str)
+             .astype(object)
+             .str.translate(translation_table)
+             .str.upper()
+             .str.replace(r'\s?J\.*?R\.*\s*?$', '', regex=True)
+             .str.replace(r'\s?S\.*?R\.*\s*?$', '', regex=True)
+             .str.replace(r'\s?III\s*?$',      '', regex=True)
+             .str.replace(r'\s?IV\s*?$',       '', regex=True)
+    )
+    return output
+
+
+class TestNormalize(unittest.TestCase):
+
+    _DATA_FOLDER = pathlib.Path(__file__).resolve().parents[1] / 'data'
+
+    # Characters likely to interact with the suffix rules
+    _FUZZ_ALPHABET = (
+        'IVJRSivjrs' + 'ADNaz' + ' .-\'\t' + '019' +
+        ' 　 \x1c' + 'ßéǰı'
+    )
+
+    def _assert_identical(self, values):
+        """Check the normalizer matches the reference routine exactly"""
+        series = pd.Series(values, dtype=object)
+        expected = _reference_names(series).tolist()
+        result = normalize.names(series).tolist()
+        self.assertEqual(result, expected)
+
+    def test_data_files(self):
+        """Test names from every input file in tests/data"""
+        for path in self._DATA_FOLDER.glob('*_input*.csv'):
+            input_data = pd.read_csv(path, skip_blank_lines=False)
+            for column in input_data.columns:
+                self._assert_identical(input_data[column].tolist())
+
+    def test_fuzzed_strings(self):
+        """Test random strings built from suffix-like characters"""
+        generator = random.Random(2007)
+        values = [
+            ''.join(
+                generator.choice(self._FUZZ_ALPHABET)
+                for _ in range(generator.randint(0, 12))
+            )
+            for _ in range(20_000)
+        ]
+        self._assert_identical(values)
+
+    def test_missing_and_non_strings(self):
+        """Test missing values, numbers, and the valid name "NAN" """
+        values = [None, np.nan, 'NAN', 12, 3.5, 'Davis Jr. ', ' Mapother IV']
+        self._assert_identical(values)
+        self.assertEqual(
+            list(surgeo.normalize.names(values)),
+            ['', '', 'NAN', '', '', 'DAVIS', 'MAPOTHER'],
+        )
+
+    def test_name(self):
+        """Test normalizing a single string"""
+        self.assertEqual(normalize.name('Dav 3idson Jr.'), 'DAVIDSON')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import surgeo
+from surgeo.utility.profiling import StageProfiler
+
+
+class TestStageProfiler(unittest.TestCase):
+
+    def test_stages(self):
+        """Test that nested stages are recorded with their rows and memory"""
+        ended = []
+        with StageProfiler(callback=ended.append, trace_memory=True) as profiler:
+            with profiler.stage('outer', 10):
+                with profiler.stage('inner') as record:
+                    values = np.ones(1_000_000)
+                    record['rows'] = 5
+                del values
+            with profiler.stage('inner', 7):
+                pass
+        self.assertEqual(
+            [(record['stage'], record['rows'], record['depth']) for record in ended],
+            [('inner', 5, 1), ('outer', 10, 0), ('inner', 7, 0)],
+        )
+        self.assertEqual(ended, profiler.records)
+        summary = profiler.summary()
+        self.assertEqual(list(summary), ['inner', 'outer'])
+        self.assertEqual(summary['inner']['calls'], 2)
+        self.assertEqual(summary['inner']['rows'], 12)
+        # The inner allocation counts towards the outer stage too
+        self.assertGreaterEqual(summary['inner']['allocated_bytes'], 8_000_000)
+        self.assertGreaterEqual(summary['outer']['allocated_bytes'], 8_000_000)
+        self.assertGreaterEqual(profiler.peak_bytes, 8_000_000)
+
+    def test_model_profile(self):
+        """Test that profiling records each stage without changing results"""
+        model = surgeo.SurgeoModel()
+        names = pd.Series(['DIAZ', 'JOHNSON', 'WASHINGTON', None])
+        zctas = pd.Series(['65201', '63144', '63110', '99999'])
+        expected = model.get_probabilities(names, zctas)
+        with model.profile() as profiler:
+            result = model.get_probabilities(names, zctas)
+        self.assertIsNone(model.profiler)
+        pd.testing.assert_frame_equal(result, expected)
+        self.assertEqual(
+            [record['stage'] for record in profiler.records],
+            [
+                'normalize_names',
+                'join_names',
+                'gather',
+                'normalize_zctas',
+                'join_zctas',
+                'gather',
+                'combine',
+                'adjust',
+            ],
+        )
+        self.assertTrue(
+            all(record['rows'] == 4 for record in profiler.records)
+        )
+        self.assertIsNone(profiler.records[0]['allocated_bytes'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import pathlib
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from surgeo.models.base_model import BaseModel
+from surgeo.utility import table_cache
+
+
+class TestTableCache(unittest.TestCase):
+
+    _BASE_MODEL = BaseModel()
+
+    _DATA_FOLDER = BaseModel()._package_root / 'data'
+
+    def setUp(self):
+        # Work on a private copy of a data file so bundles can be rebuilt
+        self._temp_dir = pathlib.Path(tempfile.mkdtemp())
+        self._csv_path = self._temp_dir / 'prob_race_given_zcta_2010.csv'
+        shutil.copy(
+            self._DATA_FOLDER / 'prob_race_given_zcta_2010.csv',
+            self._csv_path,
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self._temp_dir)
+
+    def _build(self):
+        return self._BASE_MODEL._read_zcta_csv(self._csv_path)
+
+    def test_round_trip(self):
+        """Check a compiled bundle loads back identically to the CSV"""
+        parsed = table_cache.load(self._csv_path, self._build)
+        bundle_paths = list(self._temp_dir.glob('*.npz'))
+        self.assertEqual(len(bundle_paths), 1)
+        # The second load must come from the bundle, not the CSV
+        cached = table_cache.load(self._csv_path, self.fail)
+        pd.testing.assert_frame_equal(cached, parsed, check_index_type=False)
+
+    def test_stale_bundle(self):
+        """Check a changed CSV invalidates its bundle"""
+        table_cache.load(self._csv_path, self._build)
+        with open(self._csv_path, 'a') as csv_file:
+            csv_file.write('99999,1.0,0.0,0.0,0.0,0.0,0.0\n')
+        reloaded = table_cache.load(self._csv_path, self._build)
+        self.assertIn('99999', reloaded.index)
+        # Touching the file without changing it keeps the bundle valid,
+        # and the bundle takes the new timestamp
+        os.utime(self._csv_path, ns=(0, 0))
+        table_cache.load(self._csv_path, self.fail)
+        bundle_path, = self._temp_dir.glob('*.npz')
+        with np.load(bundle_path) as bundle:
+            self.assertEqual(int(bundle['source_mtime_ns']), 0)
+
+    @unittest.skipIf(os.name == 'nt', 'Windows has no group or other modes')
+    def test_bundle_mode(self):
+        """Check bundles are readable by other users (within the umask)"""
+        table_cache.load(self._csv_path, self._build)
+        bundle_path, = self._temp_dir.glob('*.npz')
+        umask = os.umask(0)
+        os.umask(umask)
+        self.assertEqual(bundle_path.stat().st_mode & 0o777, 0o644 & ~umask)
+
+    def test_tables_match_csv(self):
+        """Check every bundled table matches a fresh CSV parse"""
+        loaders = {
+            'prob_race_given_zcta_2010.csv': self._BASE_MODEL._read_zcta_csv,
+            'prob_race_given_first_name_harvard.csv': self._BASE_MODEL._read_name_csv,
+            'prob_first_name_given_race_harvard.csv': self._BASE_MODEL._read_name_csv,
+        }
+        for file_name, read_csv in loaders.items():
+            cached = self._BASE_MODEL._load_table(file_name, read_csv)
+            parsed = read_csv(self._DATA_FOLDER / file_name)
+            pd.testing.assert_frame_equal(
+                cached,
+                parsed,
+                check_index_type=False,
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()